@@ -0,0 +1,269 @@
+"""BOI question pipeline configuration, shared by the Streamlit app and the agent service"""
+import os
+import threading
+
+from agent_core.agent import AgentPipeline, RoutedAnswer
+from agent_core.examples import ExampleStore, format_examples
+from agent_core.llm import SQLGenerator
+from agent_core.pipeline import QueryExecutor, SQLTranslator
+from agent_core.planner import QueryPlanner
+from agent_core.pool import ConnectionPool
+from agent_core.result_cache import ResultCache
+from agent_core.router import ComplexityClassifier, ModelRouter
+from agent_core.sql_cache import TranslationCache, fingerprint
+from agent_core.sql_guard import SQLGuard
+from country_index import CountryIndex, INDEX_TABLE, SCHEMA_COLUMNS, SCHEMA_JOINS, SCHEMA_NOTE
+from report_templates import TemplateRegistry
+from rollup_cube import MEASURE_RULES, MEASURES, CubeRouter, RollupCube
+from schema_index import SchemaIndex, question_terms
+
+BOI_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BOI_DIR, ".cache")
+
+# Database schema
+DATABASE_SCHEMA = """ This schema is private and intended solely for the internal use of the Board of Investment (BOI). """
+
+CONNECTION_STRING = (
+    "DRIVER={ODBC Driver 18 for SQL Server};"
+    "SERVER=xx.xx.xx.xx;"
+    "DATABASE=xxxxx;"
+    "UID=xxxxx;"
+    "PWD=xxxxx;"
+    "Encrypt=yes;"
+    "TrustServerCertificate=yes;"
+)
+
+LLM_BASE_URL = "https://openrouter.ai/api/v1"
+LLM_API_KEY = "xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+LLM_DEADLINE = 45
+
+# Every query has to finish within this many seconds (enforced by the driver and a watchdog)
+QUERY_DEADLINE = 120
+# A whole answer, SQL generation included
+ANSWER_DEADLINE = QUERY_DEADLINE + LLM_DEADLINE
+
+# Result size budgets - larger results are truncated (and can be saved to disk)
+MAX_RESULT_ROWS = 50_000
+MAX_RESULT_BYTES = 100 * 1024 * 1024
+FETCH_BATCH_SIZE = 2000
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports")
+
+# Truncated results get their summary statistics from one aggregate query over the full result
+STATS_PUSHDOWN = True
+# APPROX_PERCENTILE_CONT needs SQL Server 2022+; otherwise quartiles come from the fetched rows
+STATS_SERVER_QUANTILES = False
+
+# Compound questions ("FDI, exports and employment ...") run as one sub-query per measure on
+# separate connections, raced against the single generated query until one plan clearly wins
+PLAN_COMPOUND_QUESTIONS = True
+PLAN_WORKERS = 6
+
+# Nearest stored question -> SQL pairs that ran, added to each LLM prompt
+FEW_SHOT_EXAMPLES = 3
+
+# Per-table change markers used to invalidate cached results; the checksums catch in-place
+# revisions of measures and country codes that leave row counts unchanged
+TABLE_CHANGE_MARKERS = {
+    "General_Project_Detail": "SELECT COUNT_BIG(*), MAX(DraftedOn), MAX(Approval_Date) FROM General_Project_Detail",
+    "ShareHolders_Country": (
+        "SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(Reference_Number, Project_Type, Project_Category, "
+        + ", ".join(f"Country_Code{i}" for i in range(1, 16)) + ")) FROM ShareHolders_Country"
+    ),
+    "ANNUAT": ("SELECT COUNT_BIG(*), MAX(YEAR), CHECKSUM_AGG(BINARY_CHECKSUM("
+               "REFNO, PRJTYPE, PRJCAT, YEAR, FORINVANU, EXPVLUANU, EMPVLUANU)) FROM ANNUAT"),
+    INDEX_TABLE: f"SELECT COUNT_BIG(*) FROM {INDEX_TABLE}",
+}
+
+# Estimated plan cost (SQL Server cost units) above which queries are blocked / flagged
+MAX_QUERY_COST = 2000
+WARN_QUERY_COST = 200
+MAX_ESTIMATED_ROWS = 100_000_000
+
+SQL_MODEL = "deepseek/deepseek-chat:free"
+# Raced against SQL_MODEL when it is slow to answer
+FALLBACK_SQL_MODEL = "qwen/qwen-2.5-coder-32b-instruct:free"
+# Simple questions (one table, at most one aggregation) go to this faster, smaller model
+FAST_SQL_MODEL = "google/gemini-2.0-flash-exp:free"
+# Words implying each table, for the router's local complexity estimate
+ROUTER_TABLES = {
+    "ANNUAT": r"\bfdi\b|foreign|inflow|exports?\b|employ|\bjobs?\b|annual",
+    "General_Project_Detail": r"\bprojects?\b|\bsectors?\b|status|approv|enterprise|categor|section",
+    "ShareHolders_Country": r"countr|investors?\b|shareholder|nationalit",
+}
+
+SQL_PROMPT_TEMPLATE = """You are an expert SQL Server assistant for BOI Sri Lanka (Board of Investment). 
+Convert the following natural language question into a SQL Server query for investment project data.
+
+{schema}
+
+IMPORTANT RULES:
+
+This Data is private and intended solely for the internal use of the Board of Investment (BOI).
+
+Question: {question}
+
+SQL Query:"""
+
+# Offered in the sidebar and included in batch runs
+EXAMPLE_QUESTIONS = [
+    "Show all investment projects",
+    "List approved projects",
+    "Projects in IT sector",
+    "Export performance for 2023",
+    "Foreign investment statistics",
+    "Employment data by project",
+    "Top 10 projects by investment amount",
+    "Projects by investor country",
+]
+
+
+def connect_database():
+    """Connection pool for the BOI database"""
+    # Imported here so the configuration can be read where pyodbc isn't installed (benchmarks)
+    import pyodbc
+
+    return ConnectionPool(
+        lambda: pyodbc.connect(CONNECTION_STRING, autocommit=True),
+        min_size=2,
+        max_size=20,
+        checkout_timeout=10,
+        statement_timeout=QUERY_DEADLINE,
+    )
+
+
+def make_generator():
+    """Streaming SQL generation, routed to a fast or a strong model by question complexity"""
+    fast = SQLGenerator(
+        base_url=LLM_BASE_URL,
+        api_key=LLM_API_KEY,
+        model=FAST_SQL_MODEL,
+        fallback_model=SQL_MODEL,
+        temperature=0.0,
+        deadline=LLM_DEADLINE,
+        hedge_after=4,
+        max_retries=2,
+    )
+    strong = SQLGenerator(
+        base_url=LLM_BASE_URL,
+        api_key=LLM_API_KEY,
+        model=SQL_MODEL,
+        fallback_model=FALLBACK_SQL_MODEL,
+        deadline=LLM_DEADLINE,
+        hedge_after=8,
+        max_retries=2,
+    )
+    return ModelRouter(fast, strong, ComplexityClassifier(ROUTER_TABLES))
+
+
+def make_guard():
+    """Read-only, row-limited, cost-checked execution of generated SQL"""
+    return SQLGuard(max_rows=MAX_RESULT_ROWS, max_cost=MAX_QUERY_COST,
+                    warn_cost=WARN_QUERY_COST, max_estimated_rows=MAX_ESTIMATED_ROWS)
+
+
+def load_report_templates():
+    """The curated report templates (None if SQL_Schema_V2.txt is missing)"""
+    try:
+        return TemplateRegistry.from_directory(BOI_DIR)
+    except OSError:
+        return None
+
+
+class BOIAgent:
+    """The BOI pipeline: report templates, the rollup cube, then schema-retrieval prompts
+
+    Owns the background-refreshed country index and rollup cube, so one
+    process should build one agent.
+    """
+
+    name = "boi"
+
+    def __init__(self, db_pool, generator=None, guard=None, cache_dir=CACHE_DIR):
+        self.db_pool = db_pool
+        self.generator = generator or make_generator()
+        self.guard = guard or make_guard()
+        self.translation_cache = TranslationCache(os.path.join(cache_dir, "boi_sql_cache.json"))
+        self.result_cache = ResultCache(TABLE_CHANGE_MARKERS)
+        # Keep the normalized shareholder-country table up to date in the background
+        self.country_index = CountryIndex(db_pool)
+        # ANNUAT rollup cube, refreshed in the background as new years land
+        self.rollup_cube = RollupCube(db_pool, os.path.join(cache_dir, "annuat_cube.pkl"))
+        self.templates = load_report_templates()
+        self.cube_router = CubeRouter(self.rollup_cube, self.templates.filters if self.templates else {})
+        self._schema_indexes = {}
+        self._lock = threading.Lock()
+        # Indexed with the schema retrieval's synonyms, so "jobs" finds "employment" questions
+        self.examples = ExampleStore(os.path.join(cache_dir, "boi_examples.json"), terms=question_terms)
+        self.translator = SQLTranslator(self.generator, self.translation_cache, self.build_prompt,
+                                        self.prompt_version, examples=self.examples,
+                                        max_examples=FEW_SHOT_EXAMPLES)
+        self.executor = QueryExecutor(db_pool, self.guard, self.result_cache,
+                                      max_rows=MAX_RESULT_ROWS, max_bytes=MAX_RESULT_BYTES,
+                                      batch_size=FETCH_BATCH_SIZE)
+        self.planner = None
+        if PLAN_COMPOUND_QUESTIONS:
+            self.planner = QueryPlanner([(MEASURES[m], pattern) for m, pattern in MEASURE_RULES],
+                                        max_workers=PLAN_WORKERS)
+        self.pipeline = AgentPipeline(
+            self.name, self.translator, self.executor,
+            routes=[("template", self.template_route), ("cube", self.cube_route)],
+            # Seek the country index instead of scanning fifteen country columns
+            rewrite=self.country_index.rewrite,
+            prompt_note=self.prompt_note,
+            summarize=True, pushdown=STATS_PUSHDOWN, server_quantiles=STATS_SERVER_QUANTILES,
+            deadline=ANSWER_DEADLINE, planner=self.planner,
+        )
+
+    def schema_index(self):
+        """The schema retrieval index, including the country index table once it is ready"""
+        with_country_index = self.country_index.ready
+        with self._lock:
+            if with_country_index not in self._schema_indexes:
+                extras = {}
+                if with_country_index:
+                    extras = dict(extra_tables={INDEX_TABLE: SCHEMA_COLUMNS}, extra_joins=SCHEMA_JOINS,
+                                  extra_notes={INDEX_TABLE: SCHEMA_NOTE})
+                try:
+                    index = SchemaIndex.from_directory(BOI_DIR, **extras)
+                except OSError:
+                    index = None
+                self._schema_indexes[with_country_index] = index
+            return self._schema_indexes[with_country_index]
+
+    def prompt_version(self):
+        """Bumps automatically whenever the schema, prompt or model changes"""
+        schema_index = self.schema_index()
+        return fingerprint(DATABASE_SCHEMA, SQL_PROMPT_TEMPLATE, SQL_MODEL, FAST_SQL_MODEL,
+                           schema_index.version if schema_index else "")
+
+    def build_prompt(self, question, examples=()):
+        """Only the tables/columns relevant to the question, within a token budget, then examples"""
+        schema_index = self.schema_index()
+        schema = schema_index.context_for(question).text if schema_index else DATABASE_SCHEMA
+        return SQL_PROMPT_TEMPLATE.format(schema=schema + format_examples(examples), question=question)
+
+    def prompt_note(self, question):
+        schema_index = self.schema_index()
+        if schema_index is None:
+            return ""
+        context = schema_index.context_for(question)
+        return (f"Prompt schema: ~{context.tokens:,} tokens "
+                f"(full schema ~{context.full_tokens:,}, -{context.reduction:.0%})")
+
+    def template_route(self, question):
+        """Curated report questions are answered from templates without the AI"""
+        match = self.templates.match(question) if self.templates else None
+        if match is None:
+            return None
+        return RoutedAnswer("template", sql=match.sql, params=match.params,
+                            note=f"Answered from report template '{match.name}' "
+                                 f"with parameters {match.params} - no AI call needed")
+
+    def cube_route(self, question):
+        """Aggregate ANNUAT questions come straight from the rollup cube"""
+        answer = self.cube_router.match(question)
+        if answer is None:
+            return None
+        return RoutedAnswer("cube", frame=answer.frame,
+                            note=f"Answered from the ANNUAT rollup cube ({answer.description}) "
+                                 f"in {answer.seconds * 1000:.0f} ms - no SQL or AI call needed")
@@ -1,326 +1,509 @@
-import streamlit as st
-import pyodbc
-import pandas as pd
-from openai import OpenAI
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-import time
-
-# Page configuration
-st.set_page_config(
-    page_title="BOI Sri Lanka AI Assistant",
-    page_icon="🇱🇰",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS for BOI branding
-st.markdown("""
-<style>
-    .main-header {
-        background: linear-gradient(90deg, #1E3A8A 0%, #3B82F6 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background: #F8FAFC;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #3B82F6;
-    }
-    .query-box {
-        background: #F1F5F9;
-        padding: 1rem;
-        border-radius: 8px;
-        border: 1px solid #E2E8F0;
-    }
-    .success-message {
-        background: #10B981;
-        color: white;
-        padding: 0.5rem;
-        border-radius: 5px;
-        margin: 0.5rem 0;
-    }
-    .error-message {
-        background: #EF4444;
-        color: white;
-        padding: 0.5rem;
-        border-radius: 5px;
-        margin: 0.5rem 0;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Database schema
-DATABASE_SCHEMA = """ This schema is private and intended solely for the internal use of the Board of Investment (BOI). """
-
-
-
-@st.cache_resource
-def init_openai_client():
-    """Initialize OpenAI client"""
-    return OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key="xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
-    )
-
-@st.cache_resource
-def init_database_connection():
-    """Initialize database connection"""
-    try:
-        conn = pyodbc.connect(
-            "DRIVER={ODBC Driver 18 for SQL Server};"
-            "SERVER=xx.xx.xx.xx;"
-            "DATABASE=xxxxx;"
-            "UID=xxxxx;"
-            "PWD=xxxxx;"
-            "Encrypt=yes;"
-            "TrustServerCertificate=yes;"
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Database connection failed: {e}")
-        return None
-
-def generate_sql_query(question, client):
-    """Convert natural language to SQL using AI"""
-    prompt = f"""You are an expert SQL Server assistant for BOI Sri Lanka (Board of Investment). 
-Convert the following natural language question into a SQL Server query for investment project data.
-
-{DATABASE_SCHEMA}
-
-IMPORTANT RULES:
-
-This Data is private and intended solely for the internal use of the Board of Investment (BOI).
-
-Question: {question}
-
-SQL Query:"""
-
-    try:
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-chat:free",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1
-        )
-        
-        sql_query = response.choices[0].message.content.strip()
-        # Clean up the response
-        if sql_query.startswith("```sql"):
-            sql_query = sql_query[6:]
-        if sql_query.endswith("```"):
-            sql_query = sql_query[:-3]
-        
-        return sql_query.strip()
-    
-    except Exception as e:
-        st.error(f"Error calling AI API: {e}")
-        return None
-
-def execute_query(sql_query, conn):
-    """Execute SQL query and return results"""
-    try:
-        df = pd.read_sql(sql_query, conn)
-        return df, None
-    except Exception as e:
-        return None, str(e)
-
-def create_visualizations(df):
-    """Create visualizations based on the data"""
-    if df is None or df.empty:
-        return
-    
-    # Check for common financial columns
-    financial_cols = [col for col in df.columns if any(keyword in col.upper() for keyword in 
-                     ['INVESTMENT', 'EXPORT', 'VALUE', 'AMOUNT', 'EQUITY', 'LOAN'])]
-    
-    date_cols = [col for col in df.columns if any(keyword in col.upper() for keyword in 
-                ['DATE', 'YEAR'])]
-    
-    # Create visualizations if we have appropriate data
-    if financial_cols and len(df) > 1:
-        st.subheader("📊 Data Visualizations")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if len(financial_cols) >= 1:
-                # Bar chart for financial data
-                fig = px.bar(df.head(20), y=df.columns[0], x=financial_cols[0], 
-                           title=f"{financial_cols[0]} by {df.columns[0]}")
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            if len(financial_cols) >= 2:
-                # Scatter plot for two financial columns
-                fig = px.scatter(df, x=financial_cols[0], y=financial_cols[1],
-                               title=f"{financial_cols[1]} vs {financial_cols[0]}")
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
-
-def main():
-    # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🇱🇰 BOI Sri Lanka AI Investment Assistant</h1>
-        <p>Intelligent Database Query System for Investment Project Analysis</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Initialize connections
-    client = init_openai_client()
-    conn = init_database_connection()
-    
-    if conn is None:
-        st.error("❌ Cannot connect to database. Please check connection settings.")
-        return
-    
-    # Sidebar
-    with st.sidebar:
-        st.header("🔧 Query Assistant")
-        
-        st.markdown("### 💡 Example Questions:")
-        example_questions = [
-            "Show all investment projects",
-            "List approved projects",
-            "Projects in IT sector", 
-            "Export performance for 2023",
-            "Foreign investment statistics",
-            "Employment data by project",
-            "Top 10 projects by investment amount",
-            "Projects by investor country"
-        ]
-        
-        for question in example_questions:
-            if st.button(question, key=f"example_{question}"):
-                st.session_state.user_question = question
-        
-        st.markdown("---")
-        st.markdown("### 📊 Database Info")
-        st.info("""
-        **Main Tables:**
-        - General_Project_Detail
-        - ShareHolders_Country  
-        - ANNUAT2024 (Performance Data)
-        
-        **Key Metrics:**
-        - Investment amounts
-        - Export performance
-        - Employment data
-        - Project approvals
-        """)
-    
-    # Main content area
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        st.subheader("💬 Ask Your Question")
-        
-        # Get user question
-        user_question = st.text_input(
-            "Enter your question about BOI investment data:",
-            value=st.session_state.get('user_question', ''),
-            placeholder="e.g., Show me all approved projects in the IT sector"
-        )
-        
-        col_query, col_clear = st.columns([1, 1])
-        with col_query:
-            query_button = st.button("🔍 Generate & Execute Query", type="primary")
-        with col_clear:
-            if st.button("🗑️ Clear"):
-                st.session_state.user_question = ""
-                st.rerun()
-    
-    with col2:
-        st.subheader("📈 Quick Stats")
-        
-        # Get some quick stats
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM General_Project_Detail")
-            total_projects = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(DISTINCT NewSector) FROM General_Project_Detail WHERE NewSector IS NOT NULL")
-            total_sectors = cursor.fetchone()[0]
-
-
-            
-            st.metric("Total Projects", f"{total_projects:,}")
-            st.metric("Active Sectors", f"{total_sectors}")
-            
-        except Exception as e:
-            st.warning("Could not load quick stats")
-    
-    # Process query
-    if query_button and user_question:
-        with st.spinner("🤖 AI is analyzing your question..."):
-            # Generate SQL query
-            sql_query = generate_sql_query(user_question, client)
-            
-            if sql_query:
-                st.subheader("🔍 Generated SQL Query")
-                st.markdown('<div class="query-box">', unsafe_allow_html=True)
-                st.code(sql_query, language="sql")
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # Execute query
-                with st.spinner("📊 Executing query..."):
-                    df, error = execute_query(sql_query, conn)
-                    
-                    if error:
-                        st.markdown('<div class="error-message">', unsafe_allow_html=True)
-                        st.error(f"❌ Query Error: {error}")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                    else:
-                        st.markdown('<div class="success-message">', unsafe_allow_html=True)
-                        st.success(f"✅ Query executed successfully! Found {len(df)} results.")
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        if not df.empty:
-                            # Show results
-                            st.subheader("📋 Results")
-                            
-                            # Add download button
-                            csv = df.to_csv(index=False)
-                            st.download_button(
-                                label="📥 Download Results as CSV",
-                                data=csv,
-                                file_name=f"boi_query_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                mime="text/csv"
-                            )
-                            
-                            # Display data
-                            st.dataframe(df, use_container_width=True, height=400)
-                            
-                            # Show summary statistics for numerical columns
-                            numeric_cols = df.select_dtypes(include=['number']).columns
-                            if len(numeric_cols) > 0:
-                                st.subheader("📊 Summary Statistics")
-                                st.dataframe(df[numeric_cols].describe(), use_container_width=True)
-                            
-                            # Create visualizations
-                            create_visualizations(df)
-                        else:
-                            st.info("No results found for your query.")
-            else:
-                st.error("❌ Failed to generate SQL query. Please try rephrasing your question.")
-    
-    # Footer
-    st.markdown("---")
-    st.markdown("""
-    <div style='text-align: center; color: #64748B;'>
-        <p>🇱🇰 BOI Sri Lanka AI Investment Assistant | Powered by dyrexx.ai</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-if __name__ == "__main__":
-    # Initialize session state
-    if 'user_question' not in st.session_state:
-        st.session_state.user_question = ""
-    
-    main()
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+import time
+import os
+import sys
+import uuid
+from contextlib import nullcontext
+
+# Shared agent modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core.agent import Answer
+from agent_core.charts import financial_charts
+from agent_core.export import EXPORT_FORMATS, ExportCache, stream_query_to_file
+from agent_core.kpi import KpiSnapshot
+from agent_core.query_runner import QueryCancelled, QueryRunner, wait
+from agent_core.service import ServiceBusy, ServiceClient
+from agent_core.tracing import Tracer
+from boi_agent import (ANSWER_DEADLINE, EXAMPLE_QUESTIONS, EXPORT_DIR, FETCH_BATCH_SIZE, BOIAgent,
+                       connect_database, make_guard)
+
+# Page configuration
+st.set_page_config(
+    page_title="BOI Sri Lanka AI Assistant",
+    page_icon="🇱🇰",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Custom CSS for BOI branding
+st.markdown("""
+<style>
+    .main-header {
+        background: linear-gradient(90deg, #1E3A8A 0%, #3B82F6 100%);
+        padding: 1rem;
+        border-radius: 10px;
+        color: white;
+        text-align: center;
+        margin-bottom: 2rem;
+    }
+    .metric-card {
+        background: #F8FAFC;
+        padding: 1rem;
+        border-radius: 8px;
+        border-left: 4px solid #3B82F6;
+    }
+    .query-box {
+        background: #F1F5F9;
+        padding: 1rem;
+        border-radius: 8px;
+        border: 1px solid #E2E8F0;
+    }
+    .success-message {
+        background: #10B981;
+        color: white;
+        padding: 0.5rem;
+        border-radius: 5px;
+        margin: 0.5rem 0;
+    }
+    .error-message {
+        background: #EF4444;
+        color: white;
+        padding: 0.5rem;
+        border-radius: 5px;
+        margin: 0.5rem 0;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# Questions are answered by the agent service (python agent_service.py) when this is set,
+# otherwise by the same pipeline running in this process
+AGENT_SERVICE_URL = os.environ.get("AGENT_SERVICE_URL")
+
+@st.cache_resource
+def init_database_connection():
+    """Initialize the database connection pool shared by all sessions"""
+    try:
+        return connect_database()
+    except Exception as e:
+        st.error(f"Database connection failed: {e}")
+        return None
+
+@st.cache_resource
+def init_sql_guard():
+    """Read-only, row-limited, cost-checked execution of generated SQL"""
+    return make_guard()
+
+@st.cache_resource
+def init_agent(_db_pool):
+    """Templates, rollup cube, country index and the LLM pipeline, shared by all sessions"""
+    return BOIAgent(_db_pool, guard=init_sql_guard())
+
+@st.cache_resource
+def init_service_client():
+    """Client for the agent service, or None to answer questions in this process"""
+    return ServiceClient(AGENT_SERVICE_URL) if AGENT_SERVICE_URL else None
+
+@st.cache_resource
+def init_query_runner():
+    """Worker threads that answer questions so the script thread can offer a Cancel button"""
+    return QueryRunner(max_workers=20, default_deadline=ANSWER_DEADLINE)
+
+def cancel_running_query():
+    """Cancel button callback - stops the statement on the server"""
+    job = st.session_state.get('running_query')
+    if job is not None and job.cancel():
+        st.session_state.query_cancelled = True
+
+# All quick stats in a single round trip
+KPI_SQL = """
+SELECT
+    COUNT(*) AS TotalProjects,
+    COUNT(DISTINCT NewSector) AS ActiveSectors
+FROM General_Project_Detail
+"""
+
+@st.cache_resource
+def init_kpi_snapshot(_db_pool):
+    """Start the background-refreshed quick stats snapshot"""
+    return KpiSnapshot(_db_pool, KPI_SQL, interval=300)
+
+def ask_agent(db_pool, question, trace):
+    """Answer a question on a worker thread or the agent service; the user can cancel it meanwhile
+
+    Returns an agent.Answer. A failed answer also closes the trace; a
+    successful one is closed once it has been rendered.
+    """
+    service = init_service_client()
+    if service is not None:
+        job = service.submit("boi", question, tenant=st.session_state.session_id,
+                             deadline=ANSWER_DEADLINE)
+    else:
+        # Streamlit caches are resolved here; worker threads have no script context
+        pipeline = init_agent(db_pool).pipeline
+        job = init_query_runner().submit(lambda job: pipeline.answer(question, job, trace),
+                                         deadline=pipeline.deadline)
+    st.session_state.running_query = job
+    cancel_slot = st.empty()
+    cancel_slot.button("⏹️ Cancel query", key=f"cancel_query_{job.id}", on_click=cancel_running_query)
+    progress = st.empty()
+    try:
+        with trace.stage("service") if service is not None else nullcontext():
+            answer = wait(job, on_tick=lambda elapsed: progress.caption(
+                f"⏳ Running for {elapsed:.0f}s (deadline {job.deadline}s)"))
+    except QueryCancelled as e:
+        answer = Answer(question, "timeout" if e.reason == "timeout" else "cancelled", str(e))
+    except ServiceBusy as e:
+        answer = Answer(question, "error", f"The agent service is busy, try again in {e.retry_after or 1}s")
+    except Exception as e:
+        answer = Answer(question, "error", str(e))
+    finally:
+        # A rerun interrupted the wait: nobody will read the result, so stop it
+        if not job.done():
+            job.cancel()
+        st.session_state.running_query = None
+        cancel_slot.empty()
+        progress.empty()
+    trace.annotate(route=answer.route)
+    if not answer.ok:
+        trace.finish(answer.status, answer.error)
+    return answer
+
+def save_full_result(sql_query, db_pool, params=None, fmt="csv"):
+    """Stream the complete result of a query to a CSV/Parquet/Excel file on the server"""
+    path = os.path.join(EXPORT_DIR, f"boi_full_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                                    f".{EXPORT_FORMATS[fmt].extension}")
+    try:
+        # Still read-only, but without the row limit
+        sql_query = init_sql_guard().check(sql_query, limit=False).sql
+        rows = stream_query_to_file(db_pool, sql_query, path, batch_size=FETCH_BATCH_SIZE,
+                                    params=params)
+        return path, rows, None
+    except Exception as e:
+        return None, 0, str(e)
+
+@st.cache_resource
+def init_export_cache():
+    """Encoded downloads shared by all sessions, built only when someone asks for them"""
+    return ExportCache()
+
+def show_download(result_key, df, file_prefix):
+    """Export format picker; the file is encoded on request and then served from the export cache"""
+    fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"export_format_{result_key}",
+                       format_func=lambda f: EXPORT_FORMATS[f].label)
+    export = EXPORT_FORMATS[fmt]
+    prepared = st.session_state.setdefault("prepared_exports", set())
+    if (result_key, fmt) not in prepared:
+        if not st.button(f"📦 Prepare {export.label} file", key=f"prepare_{result_key}_{fmt}"):
+            return
+        prepared.add((result_key, fmt))
+    try:
+        data = init_export_cache().get(result_key, fmt, df)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    st.download_button(
+        label=f"📥 Download {export.label}",
+        data=data,
+        file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export.extension}",
+        mime=export.mime,
+        key=f"download_{result_key}_{fmt}"
+    )
+
+@st.cache_resource
+def init_tracer():
+    """Per-question stage traces shared by all sessions, exported under .cache/traces"""
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+    return Tracer(capacity=500, export_dir=os.path.join(cache_dir, "traces"))
+
+def show_diagnostics():
+    """Recent question traces, per-stage percentiles and metric exports"""
+    tracer = init_tracer()
+    traces = tracer.recent(limit=20)
+    if not traces:
+        st.caption("No questions traced yet")
+        return
+    st.dataframe(pd.DataFrame([{
+        "time": datetime.fromtimestamp(t.started_at).strftime("%H:%M:%S"),
+        "question": t.question_hash[:8],
+        "route": t.attrs.get("route", ""),
+        "status": t.status,
+        "total ms": round(t.elapsed * 1000),
+        **{name: round(seconds * 1000) for name, seconds in t.items()},
+    } for t in traces]), use_container_width=True)
+    st.dataframe(pd.DataFrame(
+        [(name, count, round(p50), round(p95), round(peak))
+         for name, (count, p50, p95, peak) in tracer.stage_summary().items()],
+        columns=["stage", "count", "p50 ms", "p95 ms", "max ms"]), use_container_width=True)
+    if st.button("📤 Export metrics", key="export_traces"):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        prom = tracer.write_prometheus(os.path.join(tracer.export_dir, f"metrics_{stamp}.prom"))
+        jsonl = tracer.write_jsonl(os.path.join(tracer.export_dir, f"traces_{stamp}.jsonl"))
+        st.success(f"Wrote {prom} and {jsonl}")
+
+def create_visualizations(df):
+    """Create visualizations based on the data"""
+    figures = financial_charts(df)
+    if not figures:
+        return
+    
+    st.subheader("📊 Data Visualizations")
+    for column, fig in zip(st.columns(2), figures):
+        with column:
+            st.plotly_chart(fig, use_container_width=True)
+
+def main():
+    # Header
+    st.markdown("""
+    <div class="main-header">
+        <h1>🇱🇰 BOI Sri Lanka AI Investment Assistant</h1>
+        <p>Intelligent Database Query System for Investment Project Analysis</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Initialize connections
+    db_pool = init_database_connection()
+    
+    if db_pool is None:
+        st.error("❌ Cannot connect to database. Please check connection settings.")
+        return
+    
+    # Sidebar
+    with st.sidebar:
+        st.header("🔧 Query Assistant")
+        
+        st.markdown("### 💡 Example Questions:")
+        for question in EXAMPLE_QUESTIONS:
+            if st.button(question, key=f"example_{question}"):
+                st.session_state.user_question = question
+        
+        service = init_service_client()
+        if service is not None:
+            try:
+                service_stats = service.stats()
+                st.caption(
+                    f"🛰️ Agent service: {service_stats['running']} running, {service_stats['queued']} queued, "
+                    f"{service_stats['coalesced']} coalesced, "
+                    f"{service_stats['rejected_busy'] + service_stats['rejected_tenant']} turned away"
+                )
+            except Exception:
+                st.caption("🛰️ Agent service unreachable")
+        else:
+            agent = init_agent(db_pool)
+            cache_stats = agent.translation_cache.stats()
+            st.caption(
+                f"⚡ SQL cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} stored"
+            )
+            example_stats = agent.examples.stats()
+            st.caption(
+                f"📚 Examples: {example_stats['entries']} learned, added to "
+                f"{example_stats['served']} of {example_stats['lookups']} prompts"
+            )
+            result_stats = agent.result_cache.stats()
+            st.caption(
+                f"🗄️ Result cache: {result_stats['hits']} hits / {result_stats['misses']} misses, "
+                f"{result_stats['entries']} results ({result_stats['bytes'] / 1e6:.1f} MB), "
+                f"{result_stats['invalidations']} invalidated"
+            )
+            llm_stats = agent.generator.stats()
+            st.caption(
+                f"🤖 LLM: {llm_stats['calls']} calls, avg {llm_stats['avg_latency']:.1f}s "
+                f"(first token {llm_stats['avg_first_token']:.1f}s), "
+                f"{llm_stats['hedges']} hedged ({llm_stats['hedge_wins']} won), "
+                f"{llm_stats['retries']} retries, {llm_stats['timeouts']} timeouts"
+            )
+            if "tiers" in llm_stats:
+                st.caption("🧭 Model router: " + ", ".join(
+                    f"{tier} ({health['model']}) {llm_stats['routed'][tier]} routed, "
+                    f"{health['latency']:.1f}s, {health['error_rate']:.0%} errors"
+                    for tier, health in llm_stats["tiers"].items()
+                ))
+        pool_stats = db_pool.metrics()
+        st.caption(
+            f"🔌 Pool: {pool_stats['in_use']}/{pool_stats['max_size']} in use, "
+            f"{pool_stats['idle']} idle, {pool_stats['checkouts']} checkouts, "
+            f"{pool_stats['waits']} waits, {pool_stats['timeouts']} timeouts, "
+            f"{pool_stats['connect_failures'] + pool_stats['health_check_failures']} failures"
+        )
+        runner_stats = init_query_runner().stats()
+        st.caption(
+            f"⏱️ Queries: {runner_stats['running']} running, {runner_stats['completed']} done, "
+            f"{runner_stats['cancelled']} cancelled, {runner_stats['timed_out']} timed out"
+        )
+        guard_stats = init_sql_guard().stats()
+        st.caption(
+            f"🛡️ SQL guard: {guard_stats['rejected']} rejected, {guard_stats['limited']} row-limited, "
+            f"{guard_stats['blocked_by_cost']} blocked by cost"
+        )
+        export_stats = init_export_cache().stats()
+        st.caption(
+            f"📥 Exports: {export_stats['entries']} files cached ({export_stats['bytes'] / 1e6:.1f} MB), "
+            f"{export_stats['hits']} served from cache, {export_stats['misses']} encoded"
+        )
+        if service is None:
+            country_index = agent.country_index
+            if country_index.ready:
+                st.caption(
+                    f"🌍 Country index: refreshed {time.strftime('%H:%M', time.localtime(country_index.last_refresh))}, "
+                    f"{country_index.last_changed} projects changed"
+                )
+            elif country_index.last_error:
+                st.caption("🌍 Country index unavailable - using direct country filters")
+            cube = agent.rollup_cube
+            if cube.ready:
+                st.caption(
+                    f"🧊 ANNUAT cube: {len(cube.year_signatures)} years, "
+                    f"{len(cube.base):,} cells"
+                    + (f", reloaded {', '.join(cube.last_reloaded_years)}" if cube.last_reloaded_years else "")
+                )
+            elif cube.last_error:
+                st.caption("🧊 ANNUAT cube unavailable - aggregates run against the base tables")
+        
+        with st.expander("🩺 Diagnostics"):
+            show_diagnostics()
+        
+        st.markdown("---")
+        st.markdown("### 📊 Database Info")
+        st.info("""
+        **Main Tables:**
+        - General_Project_Detail
+        - ShareHolders_Country  
+        - ANNUAT2024 (Performance Data)
+        
+        **Key Metrics:**
+        - Investment amounts
+        - Export performance
+        - Employment data
+        - Project approvals
+        """)
+    
+    # Main content area
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.subheader("💬 Ask Your Question")
+        
+        # Get user question
+        user_question = st.text_input(
+            "Enter your question about BOI investment data:",
+            value=st.session_state.get('user_question', ''),
+            placeholder="e.g., Show me all approved projects in the IT sector"
+        )
+        
+        col_query, col_clear = st.columns([1, 1])
+        with col_query:
+            query_button = st.button("🔍 Generate & Execute Query", type="primary")
+        with col_clear:
+            if st.button("🗑️ Clear"):
+                st.session_state.user_question = ""
+                st.rerun()
+    
+    with col2:
+        st.subheader("📈 Quick Stats")
+        
+        # Quick stats come from the background snapshot, not a query per rerun
+        try:
+            kpis = init_kpi_snapshot(db_pool)
+            if not kpis.available:
+                raise RuntimeError(kpis.last_error)
+            
+            st.metric("Total Projects", f"{kpis.get('TotalProjects', 0):,}")
+            st.metric("Active Sectors", f"{kpis.get('ActiveSectors', 0)}")
+            st.caption(f"🕒 {kpis.describe_age()}")
+            
+        except Exception as e:
+            st.warning("Could not load quick stats")
+    
+    if st.session_state.pop('query_cancelled', False):
+        st.info("⏹️ The running query was cancelled on the server.")
+    
+    # Process query
+    if query_button and user_question:
+        st.session_state.last_result = None
+        trace = init_tracer().start("boi", st.session_state.session_id, user_question)
+        # Report templates and the rollup cube answer what they can without the AI
+        with st.spinner("🤖 AI is analyzing your question..."):
+            answer = ask_agent(db_pool, user_question, trace)
+        
+        if answer.sql or answer.route == "cube":
+            if answer.route == "cube":
+                st.caption(f"⚡ {answer.note}")
+            else:
+                st.subheader("🔍 Generated SQL Query")
+                st.markdown('<div class="query-box">', unsafe_allow_html=True)
+                st.code(answer.sql, language="sql")
+                st.markdown('</div>', unsafe_allow_html=True)
+                if answer.note:
+                    st.caption(f"{'🧩' if answer.route == 'llm' else '⚡'} {answer.note}")
+            
+            if not answer.ok:
+                st.markdown('<div class="error-message">', unsafe_allow_html=True)
+                st.error(f"❌ Query Error: {answer.error}")
+                st.markdown('</div>', unsafe_allow_html=True)
+            else:
+                df = answer.frame
+                st.markdown('<div class="success-message">', unsafe_allow_html=True)
+                st.success(f"✅ Query executed successfully! Found {len(df)} results.")
+                st.markdown('</div>', unsafe_allow_html=True)
+                
+                for warning in answer.warnings:
+                    st.warning(f"⚠️ {warning}")
+                if answer.truncated:
+                    st.warning(f"⚠️ Large result: showing the first {len(df):,} rows only.")
+                    # A merged parallel plan has no single query to re-run in full
+                    if answer.route != "plan":
+                        st.session_state.last_truncated_query = (answer.sql, answer.params)
+                
+                if not df.empty:
+                    # Show results
+                    st.subheader("📋 Results")
+                    
+                    # Kept for the export section below; files are only encoded on request
+                    st.session_state.last_result = (uuid.uuid4().hex, df)
+                    
+                    # Display data
+                    st.dataframe(df, use_container_width=True, height=400)
+                    
+                    # Summary statistics for numerical columns, accumulated while the rows were fetched
+                    if answer.summary is not None and len(answer.summary.columns) > 0:
+                        st.subheader("📊 Summary Statistics")
+                        if answer.summary_note:
+                            st.caption(answer.summary_note)
+                        st.dataframe(answer.summary, use_container_width=True)
+                    
+                    # Create visualizations
+                    with trace.stage("visualization"):
+                        create_visualizations(df)
+                else:
+                    st.info("No results found for your query.")
+                trace.finish()
+        else:
+            st.error(f"❌ Failed to generate SQL query. Please try rephrasing your question. ({answer.error})")
+    
+    # Exports of the last result (survive the reruns caused by the clicks)
+    last_result = st.session_state.get('last_result')
+    if last_result is not None:
+        st.subheader("📥 Export Results")
+        show_download(*last_result, "boi_query_results")
+    
+    # Full export of the last truncated result (survives the rerun caused by the click)
+    if st.session_state.get('last_truncated_query'):
+        if st.button("💾 Save full result of the last large query to disk"):
+            truncated_sql, truncated_params = st.session_state.last_truncated_query
+            fmt = st.session_state.get(f"export_format_{last_result[0]}", "csv") if last_result else "csv"
+            path, row_count, save_error = save_full_result(truncated_sql, db_pool, truncated_params, fmt)
+            if save_error:
+                st.error(f"❌ Export failed: {save_error}")
+            else:
+                st.success(f"✅ Saved {row_count:,} rows to {path}")
+                st.session_state.last_truncated_query = None
+    
+    # Footer
+    st.markdown("---")
+    st.markdown("""
+    <div style='text-align: center; color: #64748B;'>
+        <p>🇱🇰 BOI Sri Lanka AI Investment Assistant | Powered by dyrexx.ai</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+if __name__ == "__main__":
+    # Initialize session state
+    if 'user_question' not in st.session_state:
+        st.session_state.user_question = ""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex[:12]
+    
+    main()
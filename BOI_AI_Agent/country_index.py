@@ -0,0 +1,222 @@
+"""Unpivoted (project, country, position) side table for ShareHolders_Country lookups"""
+import re
+import threading
+import time
+
+from agent_core.background import PeriodicTask
+
+
+INDEX_TABLE = "ShareHolder_Country_Index"
+STATE_TABLE = "ShareHolder_Country_Index_State"
+
+_COUNTRY_COLUMNS = ", ".join(f"S.Country_Code{i}" for i in range(1, 16))
+_UNPIVOT_VALUES = ",\n        ".join(f"(S.Country_Code{i}, {i})" for i in range(1, 16))
+_KEY_JOIN = ("{a}.Reference_Number = {b}.Reference_Number "
+             "AND {a}.Project_Type = {b}.Project_Type "
+             "AND {a}.Project_Category = {b}.Project_Category")
+# A project can have several ShareHolders_Country rows (one per Application_Level)
+_ROW_JOIN = (_KEY_JOIN + " AND ({a}.Application_Level = {b}.Application_Level "
+             "OR ({a}.Application_Level IS NULL AND {b}.Application_Level IS NULL))")
+
+# Column types are copied from ShareHolders_Country via SELECT TOP (0) ... INTO. A side
+# table from before Application_Level was kept is rebuilt from scratch
+CREATE_SQL = f"""
+IF OBJECT_ID('dbo.{INDEX_TABLE}') IS NOT NULL AND COL_LENGTH('dbo.{INDEX_TABLE}', 'Application_Level') IS NULL
+BEGIN
+    DROP TABLE dbo.{INDEX_TABLE};
+    DROP TABLE IF EXISTS dbo.{STATE_TABLE};
+END;
+
+IF OBJECT_ID('dbo.{INDEX_TABLE}') IS NULL
+BEGIN
+    SELECT TOP (0) S.Reference_Number, S.Project_Type, S.Project_Category, S.Application_Level,
+           S.Country_Code1 AS Country_Code, CAST(0 AS tinyint) AS Position
+    INTO dbo.{INDEX_TABLE}
+    FROM dbo.ShareHolders_Country S;
+
+    CREATE CLUSTERED INDEX CIX_{INDEX_TABLE}_Country
+        ON dbo.{INDEX_TABLE} (Country_Code, Reference_Number, Project_Type, Project_Category, Application_Level);
+    CREATE NONCLUSTERED INDEX IX_{INDEX_TABLE}_Project
+        ON dbo.{INDEX_TABLE} (Reference_Number, Project_Type, Project_Category)
+        INCLUDE (Application_Level, Country_Code);
+END;
+
+IF OBJECT_ID('dbo.{STATE_TABLE}') IS NULL
+BEGIN
+    SELECT TOP (0) S.Reference_Number, S.Project_Type, S.Project_Category,
+           CAST(0 AS int) AS Row_Checksum
+    INTO dbo.{STATE_TABLE}
+    FROM dbo.ShareHolders_Country S;
+
+    CREATE UNIQUE CLUSTERED INDEX CIX_{STATE_TABLE}
+        ON dbo.{STATE_TABLE} (Reference_Number, Project_Type, Project_Category);
+END;
+"""
+
+# Only projects whose country columns changed (by checksum) are re-unpivoted. The
+# temp tables are dropped at both ends: pooled sessions outlive the batch, and one
+# that failed half-way still holds them
+REFRESH_SQL = f"""
+SET NOCOUNT ON;
+SET XACT_ABORT ON;
+
+DROP TABLE IF EXISTS #current;
+DROP TABLE IF EXISTS #changed;
+
+SELECT S.Reference_Number, S.Project_Type, S.Project_Category,
+       CHECKSUM_AGG(BINARY_CHECKSUM(S.Application_Level, {_COUNTRY_COLUMNS})) AS Row_Checksum
+INTO #current
+FROM dbo.ShareHolders_Country S
+GROUP BY S.Reference_Number, S.Project_Type, S.Project_Category;
+
+SELECT C.Reference_Number, C.Project_Type, C.Project_Category
+INTO #changed
+FROM #current C
+LEFT JOIN dbo.{STATE_TABLE} X ON {_KEY_JOIN.format(a="X", b="C")}
+WHERE X.Reference_Number IS NULL OR X.Row_Checksum <> C.Row_Checksum
+UNION ALL
+SELECT X.Reference_Number, X.Project_Type, X.Project_Category
+FROM dbo.{STATE_TABLE} X
+LEFT JOIN #current C ON {_KEY_JOIN.format(a="X", b="C")}
+WHERE C.Reference_Number IS NULL;
+
+BEGIN TRANSACTION;
+
+DELETE I
+FROM dbo.{INDEX_TABLE} I
+JOIN #changed CH ON {_KEY_JOIN.format(a="I", b="CH")};
+
+INSERT INTO dbo.{INDEX_TABLE} (Reference_Number, Project_Type, Project_Category, Application_Level,
+                               Country_Code, Position)
+SELECT DISTINCT S.Reference_Number, S.Project_Type, S.Project_Category, S.Application_Level,
+       V.Country_Code, V.Position
+FROM dbo.ShareHolders_Country S
+JOIN #changed CH ON {_KEY_JOIN.format(a="S", b="CH")}
+CROSS APPLY (VALUES
+        {_UNPIVOT_VALUES}
+    ) V (Country_Code, Position)
+WHERE V.Country_Code IS NOT NULL AND LTRIM(RTRIM(V.Country_Code)) <> '';
+
+DELETE X
+FROM dbo.{STATE_TABLE} X
+JOIN #changed CH ON {_KEY_JOIN.format(a="X", b="CH")};
+
+INSERT INTO dbo.{STATE_TABLE} (Reference_Number, Project_Type, Project_Category, Row_Checksum)
+SELECT C.Reference_Number, C.Project_Type, C.Project_Category, C.Row_Checksum
+FROM #current C
+JOIN #changed CH ON {_KEY_JOIN.format(a="C", b="CH")};
+
+COMMIT TRANSACTION;
+
+DECLARE @changed int = (SELECT COUNT(*) FROM #changed);
+DROP TABLE IF EXISTS #current;
+DROP TABLE IF EXISTS #changed;
+
+SELECT @changed AS Changed_Projects;
+"""
+
+# What the SQL generator is told about the side table
+SCHEMA_COLUMNS = {
+    "Reference_Number": "Project key (joins General_Project_Detail)",
+    "Project_Type": "Project key",
+    "Project_Category": "Project key",
+    "Application_Level": "Shareholder row of the project (ShareHolders_Country.Application_Level)",
+    "Country_Code": "Investor country code, one row per shareholder country",
+    "Position": "Shareholder slot 1-15",
+}
+SCHEMA_JOINS = [
+    f"General_Project_Detail.{key} = {INDEX_TABLE}.{key}"
+    for key in ("Reference_Number", "Project_Type", "Project_Category")
+]
+SCHEMA_NOTE = (
+    f"For investor-country filters or 'by country' breakdowns use {INDEX_TABLE} "
+    "joined on (Reference_Number, Project_Type, Project_Category) and filter/group on "
+    "Country_Code - never test Country_Code1..Country_Code15 one by one"
+)
+
+_IN_FORM = re.compile(
+    r"('[A-Za-z]{2}'|\?)\s+IN\s*\(\s*"
+    + r"\s*,\s*".join(rf"\[?(\w+)\]?\.\[?Country_Code{i}\]?" for i in range(1, 16))
+    + r"\s*\)",
+    re.IGNORECASE,
+)
+_OR_FORM = re.compile(
+    r"\s+OR\s+".join(rf"\[?(\w+)\]?\.\[?Country_Code{i}\]?\s*=\s*('[A-Za-z]{{2}}'|\?)"
+                      for i in range(1, 16)),
+    re.IGNORECASE,
+)
+
+
+def _exists_clause(alias, value):
+    return (f"EXISTS (SELECT 1 FROM dbo.{INDEX_TABLE} CI "
+            f"WHERE {_ROW_JOIN.format(a='CI', b=alias)} AND CI.Country_Code = {value})")
+
+
+def rewrite_country_filters(sql):
+    """Turn 15-column country tests into seeks on the side table
+
+    Only rewrites predicates that test all fifteen Country_Code columns of a
+    single alias against one value. The subquery is correlated on the
+    shareholder row, not just the project, so the rewrite is exact when a
+    project has several ShareHolders_Country rows.
+    """
+    def from_in(match):
+        aliases = set(match.groups()[1:])
+        if len(aliases) != 1:
+            return match.group(0)
+        return _exists_clause(aliases.pop(), match.group(1))
+
+    def from_or(match):
+        groups = match.groups()
+        aliases, values = set(groups[0::2]), set(groups[1::2])
+        if len(aliases) != 1 or len(values) != 1:
+            return match.group(0)
+        return _exists_clause(aliases.pop(), values.pop())
+
+    sql = _IN_FORM.sub(from_in, sql)
+    return _OR_FORM.sub(from_or, sql)
+
+
+class CountryIndex:
+    """Maintains the side table in the background and rewrites queries to use it
+
+    ready is False until the table exists and has been filled once (or when
+    the login lacks DDL rights); callers then keep the original SQL.
+    """
+
+    def __init__(self, db_pool, interval=900):
+        self.db_pool = db_pool
+        self.ready = False
+        self.last_error = None
+        self.last_refresh = None
+        self.last_changed = 0
+        self._lock = threading.Lock()
+        self._task = PeriodicTask("country-index", self.refresh, interval)
+        self._task.trigger()
+        self._task.start()
+
+    def refresh(self):
+        """Create the tables if needed and apply incremental changes"""
+        with self._lock:
+            try:
+                with self.db_pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(CREATE_SQL)
+                    while cursor.nextset():
+                        pass
+                    cursor.execute(REFRESH_SQL)
+                    # Skip to the final SELECT of the batch
+                    while cursor.description is None and cursor.nextset():
+                        pass
+                    row = cursor.fetchone() if cursor.description else None
+                    cursor.close()
+            except Exception as e:
+                self.last_error = e
+                raise
+            self.last_changed = row[0] if row else 0
+            self.last_refresh = time.time()
+            self.last_error = None
+            self.ready = True
+
+    def rewrite(self, sql):
+        return rewrite_country_filters(sql) if self.ready else sql
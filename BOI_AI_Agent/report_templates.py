@@ -0,0 +1,256 @@
+"""Parameterized report templates from SQL_Schema_V2.txt plus an intent matcher"""
+import ast
+import os
+import re
+
+
+COUNTRY_CODES = {
+    "india": "IN", "china": "CN", "japan": "JP", "united states": "US", "usa": "US",
+    "america": "US", "united kingdom": "GB", "uk": "GB", "britain": "GB",
+    "singapore": "SG", "hong kong": "HK", "germany": "DE", "france": "FR",
+    "netherlands": "NL", "australia": "AU", "malaysia": "MY", "thailand": "TH",
+    "south korea": "KR", "korea": "KR", "taiwan": "TW", "uae": "AE",
+    "united arab emirates": "AE", "saudi arabia": "SA", "switzerland": "CH",
+    "sweden": "SE", "italy": "IT", "canada": "CA", "maldives": "MV",
+    "pakistan": "PK", "bangladesh": "BD", "indonesia": "ID", "belgium": "BE",
+    "denmark": "DK", "norway": "NO", "russia": "RU", "sri lanka": "LK",
+}
+
+_COUNTRY_PREDICATE = re.compile(
+    r"AND\s+'(\w{2})'\s+IN\s*\(\s*(S\.Country_Code1\b.*?S\.Country_Code15)\s*\)",
+    re.IGNORECASE | re.DOTALL,
+)
+_YEAR_PREDICATE = re.compile(r"A\.YEAR\s*(<=|>=|=|<|>)\s*'(\d{4})'", re.IGNORECASE)
+_STATUS_PREDICATE = re.compile(r"G\.Project_Status\s+IN\s*\(([^)]*)\)", re.IGNORECASE)
+_FIXED_STATUS = re.compile(r"\bWHERE\s+G\.Project_Status\s*=\s*'(\w+)'", re.IGNORECASE)
+_SECTION_CASE = re.compile(r"(CASE\s+WHEN\s+G\.Project_Category.*?END)\s+AS\s+Section\b",
+                           re.IGNORECASE | re.DOTALL)
+
+
+class ReportTemplate:
+    """One curated query whose country, year, section and status can be rebound"""
+
+    def __init__(self, name, sql, filters):
+        self.name = name
+        self.sql = self._expand_group_by_alias(sql.strip())
+        self.filters = filters
+        year = _YEAR_PREDICATE.search(self.sql)
+        self.default_year = year.group(2) if year else None
+
+    def render(self, country=None, year=None, year_op=None, section=None, status=None):
+        """Return (sql, params) for the requested parameters"""
+        sql = self.sql
+        params = []
+        # Placeholders must be added in textual order; the country filter always
+        # comes after the year filter in these templates
+        if _YEAR_PREDICATE.search(sql):
+            match = _YEAR_PREDICATE.search(sql)
+            op = year_op or match.group(1)
+            bound_year = str(year or self.default_year)
+            sql = sql[:match.start()] + f"A.YEAR {op} ?" + sql[match.end():]
+            params.append(bound_year)
+            # Keep year-suffixed aliases (Exports_2025) honest
+            sql = re.sub(r"\bAS\s+(\w+?)_\d{4}\b", rf"AS \1_{bound_year}", sql)
+
+        if status:
+            codes = self._status_codes(status)
+            sql = _STATUS_PREDICATE.sub(
+                "G.Project_Status IN (" + ",".join(f"'{c}'" for c in codes) + ")", sql, count=1)
+
+        if section:
+            categories = self.filters.get(f"section_{section}_categories")
+            if categories:
+                # A predicate of its own: the Section CASE in the select list names categories too
+                listed = ",".join(str(c) for c in categories)
+                sql = self._add_predicate(sql, f"G.Project_Category IN ({listed})")
+
+        match = _COUNTRY_PREDICATE.search(sql)
+        if match:
+            if country:
+                sql = sql[:match.start()] + f"AND ? IN ({match.group(2)})" + sql[match.end():]
+                params.append(country)
+            else:
+                sql = sql[:match.start()].rstrip() + sql[match.end():]
+        return sql, params
+
+    def unsupported(self, bindings):
+        """The bound filters this template has no slot for; rendering would silently drop them"""
+        missing = []
+        if "year" in bindings and not _YEAR_PREDICATE.search(self.sql):
+            missing.append("year")
+        if "status" in bindings and not _STATUS_PREDICATE.search(self.sql):
+            # sector_breakdown is fixed to commercial projects, which is fine when that's what was asked
+            fixed = _FIXED_STATUS.search(self.sql)
+            if not fixed or [fixed.group(1)] != self._status_codes(bindings["status"]):
+                missing.append("status")
+        if "section" in bindings and not self.filters.get(f"section_{bindings['section']}_categories"):
+            missing.append("section")
+        if "country" in bindings and not _COUNTRY_PREDICATE.search(self.sql):
+            missing.append("country")
+        return missing
+
+    def _status_codes(self, status):
+        valid = list(self.filters.get("valid_statuses", []))
+        if status == "commercial":
+            return ["E1"]
+        if status == "pipeline":
+            return [c for c in valid if c != "E1"]
+        return valid
+
+    @staticmethod
+    def _add_predicate(sql, predicate):
+        group = re.search(r"\bGROUP\s+BY\b", sql, re.IGNORECASE)
+        if group:
+            return sql[:group.start()].rstrip() + f"\n  AND {predicate}\n" + sql[group.start():]
+        return sql.rstrip() + f"\n  AND {predicate}"
+
+    @staticmethod
+    def _expand_group_by_alias(sql):
+        # SQL Server can't GROUP BY a select-list alias; use the CASE expression
+        case = _SECTION_CASE.search(sql)
+        group = re.search(r"\bGROUP\s+BY\b(.*)$", sql, re.IGNORECASE | re.DOTALL)
+        if not case or not group:
+            return sql
+        items = split_top_level(group.group(1))
+        if not any(item.strip() == "Section" for item in items):
+            return sql
+        items = [case.group(1) if item.strip() == "Section" else item.strip() for item in items]
+        return sql[:group.start(1)] + " " + ", ".join(items)
+
+
+def split_top_level(text):
+    """Split on commas that are not inside parentheses"""
+    items, depth, current = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            items.append(current)
+            current = ""
+        else:
+            current += ch
+    items.append(current)
+    return items
+
+
+class TemplateMatch:
+    def __init__(self, template, sql, params, bindings):
+        self.template = template
+        self.sql = sql
+        self.params = params
+        self.bindings = bindings
+
+    @property
+    def name(self):
+        return self.template.name
+
+
+# Breakdowns a question can ask for
+GROUPING_RULES = {
+    "year": r"\b(by|per|each) year\b|yearly|annually|\btrend|over (the )?years|year[- ]wise",
+    "sector": r"\b(by|per|each) sector\b|sector[- ]wise|across sectors|sector (breakdown|summary|pivot)",
+    "section": r"\b(by|per|each) section\b|section[- ]wise",
+    "status": r"\b(by|per|each) (project )?status\b|status[- ]wise",
+    "country": r"\b(by|per|each) (investor |source )?country\b|country[- ]wise",
+}
+# The breakdowns each template returns; asking for another one means no match
+TEMPLATE_GROUPINGS = {
+    "exports_and_employment": set(),
+    "sector_summary_pivot": {"sector", "section"},
+    "sector_breakdown": {"sector", "section"},
+    "project_counts_by_section": {"section", "status"},
+    "fdi_inflow": set(),
+}
+# Templates can't filter on a sector, so questions naming one go to the cube or the LLM
+_SECTOR_NAME = re.compile(r"\b(manufacturing|apparel|garments?|infrastructure|knowledge services|tourism|"
+                          r"leisure|utilities|agricultur\w*|information technology)\b")
+# Matched case-sensitively so "it" the pronoun doesn't count
+_SECTOR_ACRONYM = re.compile(r"\b(IT|ICT|BPO)\b")
+
+# (template, phrases that must all match) - first hit wins, most specific first
+INTENT_RULES = [
+    ("exports_and_employment", [r"export", r"employ|jobs?\b|workers"]),
+    ("sector_summary_pivot", [r"sector (summary|pivot)|pivot"]),
+    ("sector_breakdown", [r"sector (breakdown|wise)|by sector|per sector", r"project|count|section"]),
+    ("project_counts_by_section", [r"section", r"project|count|status|number|pipeline|commercial"]),
+    ("fdi_inflow", [r"\bfdi\b|foreign direct investment|investment inflow|fdi inflow"]),
+]
+
+
+class TemplateRegistry:
+    """All report templates plus rules mapping questions onto them"""
+
+    def __init__(self, templates, filters=None):
+        self.templates = templates
+        self.filters = filters or {}
+
+    @classmethod
+    def from_directory(cls, directory):
+        with open(os.path.join(directory, "SQL_Schema_V2.txt"), encoding="utf-8") as f:
+            spec = f.read()
+        return cls.from_spec(spec)
+
+    @classmethod
+    def from_spec(cls, spec):
+        filters = {}
+        block = re.search(r'"filters"\s*:\s*(\{.*?\})', spec, re.DOTALL)
+        if block:
+            filters = ast.literal_eval(block.group(1))
+        queries = spec[spec.find('"queries"'):]
+        templates = {}
+        for name, sql in re.findall(r'"(\w+)"\s*:\s*(SELECT\b.*?)(?:;|\Z)', queries, re.DOTALL):
+            templates[name] = ReportTemplate(name, sql, filters)
+        return cls(templates, filters)
+
+    def match(self, question):
+        """Return a TemplateMatch when the question maps onto a curated report"""
+        text = question.lower()
+        if _SECTOR_NAME.search(text) or _SECTOR_ACRONYM.search(question):
+            return None
+        groupings = {name for name, pattern in GROUPING_RULES.items() if re.search(pattern, text)}
+        for name, patterns in INTENT_RULES:
+            if name not in self.templates:
+                continue
+            if all(re.search(p, text) for p in patterns):
+                if groupings - TEMPLATE_GROUPINGS.get(name, set()):
+                    return None
+                bindings = extract_bindings(text)
+                if self.templates[name].unsupported(bindings):
+                    return None
+                sql, params = self.templates[name].render(**bindings)
+                return TemplateMatch(self.templates[name], sql, params, bindings)
+        return None
+
+
+def extract_bindings(text):
+    """Country, year, section and status mentioned in a (lower-case) question"""
+    bindings = {}
+    for country, code in sorted(COUNTRY_CODES.items(), key=lambda kv: -len(kv[0])):
+        if re.search(rf"\b{re.escape(country)}\b", text):
+            bindings["country"] = code
+            break
+    else:
+        code = re.search(r"country code\s+([a-z]{2})\b", text)
+        if code:
+            bindings["country"] = code.group(1).upper()
+
+    year = re.search(r"\b(19|20)\d{2}\b", text)
+    if year:
+        bindings["year"] = year.group(0)
+        if re.search(r"\b(up to|upto|until|till|through|by|before|cumulative)\s+(the end of\s+)?"
+                     + year.group(0), text):
+            bindings["year_op"] = "<="
+        elif re.search(r"\b(in|for|during|of)\s+" + year.group(0), text):
+            bindings["year_op"] = "="
+
+    section = re.search(r"section\s*(16|17)\b", text)
+    if section:
+        bindings["section"] = section.group(1)
+
+    if "pipeline" in text:
+        bindings["status"] = "pipeline"
+    elif "commercial" in text or "operational" in text:
+        bindings["status"] = "commercial"
+    return bindings
@@ -0,0 +1,342 @@
+"""In-memory ANNUAT rollup cube with incremental per-year refresh and a question router"""
+import os
+import pickle
+import re
+import threading
+import time
+
+import pandas as pd
+
+from agent_core.background import PeriodicTask
+from agent_core.columnar import ColumnBuilder
+from report_templates import extract_bindings
+
+MEASURES = {
+    "FORINVANU": "Foreign_Investment",
+    "EXPVLUANU": "Exports",
+    "EMPVLUANU": "Employment",
+}
+GRAIN = ["YEAR", "NewSector", "Project_Status", "Project_Category"]
+COUNTRY_GRAIN = ["YEAR", "Country_Code", "NewSector", "Project_Status", "Project_Category"]
+
+_PROJECT_JOIN = ("JOIN General_Project_Detail G ON A.REFNO = G.Reference_Number "
+                 "AND A.PRJTYPE = G.Project_Type AND A.PRJCAT = G.Project_Category")
+_SUMS = ", ".join(f"SUM(A.{m}) AS {m}" for m in MEASURES)
+_COUNTRY_VALUES = ", ".join(f"(S.Country_Code{i})" for i in range(1, 16))
+
+BASE_SQL = f"""
+SELECT A.YEAR, G.NewSector, G.Project_Status, G.Project_Category, {_SUMS},
+       COUNT(DISTINCT G.Reference_Number) AS Projects
+FROM ANNUAT A
+{_PROJECT_JOIN}
+{{where}}
+GROUP BY A.YEAR, G.NewSector, G.Project_Status, G.Project_Category
+"""
+
+# One row per distinct (project, country) so multi-slot shareholders count once
+COUNTRY_SQL = f"""
+SELECT A.YEAR, C.Country_Code, G.NewSector, G.Project_Status, G.Project_Category, {_SUMS},
+       COUNT(DISTINCT G.Reference_Number) AS Projects
+FROM ANNUAT A
+{_PROJECT_JOIN}
+JOIN (
+    SELECT DISTINCT S.Reference_Number, S.Project_Type, S.Project_Category, V.Country_Code
+    FROM ShareHolders_Country S
+    CROSS APPLY (VALUES {_COUNTRY_VALUES}) AS V(Country_Code)
+    WHERE V.Country_Code IS NOT NULL AND V.Country_Code <> ''
+) C ON C.Reference_Number = G.Reference_Number AND C.Project_Type = G.Project_Type
+   AND C.Project_Category = G.Project_Category
+{{where}}
+GROUP BY A.YEAR, C.Country_Code, G.NewSector, G.Project_Status, G.Project_Category
+"""
+
+# Per-year signature of ANNUAT; a year is reloaded only when its signature moves
+YEAR_SIGNATURE_SQL = """
+SELECT YEAR, COUNT_BIG(*),
+       CHECKSUM_AGG(BINARY_CHECKSUM(REFNO, PRJTYPE, PRJCAT, FORINVANU, EXPVLUANU, EMPVLUANU))
+FROM ANNUAT
+GROUP BY YEAR
+"""
+
+# Changes to the dimension tables affect every year, so they force a full rebuild
+DIMENSION_SIGNATURE_SQL = f"""
+SELECT
+    (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(Reference_Number, Project_Type, Project_Category,
+                                         Project_Status, NewSector))
+     FROM General_Project_Detail),
+    (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(Reference_Number, Project_Type, Project_Category,
+                                         {", ".join(f"Country_Code{i}" for i in range(1, 16))}))
+     FROM ShareHolders_Country)
+"""
+
+
+def section_of(categories, filters):
+    """Section label for each Project_Category value"""
+    sections = pd.Series("Other", index=categories.index)
+    for section in ("16", "17"):
+        listed = filters.get(f"section_{section}_categories", [])
+        sections[categories.isin(listed)] = f"Section {section}"
+    return sections
+
+
+class RollupCube:
+    """SUM(FORINVANU/EXPVLUANU/EMPVLUANU) pre-aggregated per year, sector, status and category
+
+    A second frame adds investor country to the grain. Both are kept in
+    memory, persisted to a pickle so restarts are instant, and refreshed in
+    the background: only ANNUAT years whose row count/checksum changed are
+    re-aggregated.
+    """
+
+    def __init__(self, db_pool, path, interval=600, batch_size=5000):
+        self.db_pool = db_pool
+        self.path = path
+        self.batch_size = batch_size
+        self.base = None
+        self.by_country = None
+        self.year_signatures = {}
+        self.dimension_signature = None
+        self.last_refresh = None
+        self.last_reloaded_years = []
+        self._lock = threading.Lock()
+        self._load()
+        self._task = PeriodicTask("annuat-cube", self.refresh, interval)
+        self._task.trigger()
+        self._task.start()
+
+    @property
+    def ready(self):
+        return self.base is not None
+
+    @property
+    def last_error(self):
+        return self._task.last_error
+
+    def refresh(self):
+        """Re-aggregate new or changed years; returns the years reloaded"""
+        with self._lock:
+            with self.db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(YEAR_SIGNATURE_SQL)
+                signatures = {str(row[0]): (row[1], row[2]) for row in cursor.fetchall()}
+                cursor.execute(DIMENSION_SIGNATURE_SQL)
+                dimension_signature = tuple(cursor.fetchone())
+
+                if not self.ready or dimension_signature != self.dimension_signature:
+                    changed = sorted(signatures)
+                    base, by_country = None, None
+                else:
+                    changed = sorted(y for y, s in signatures.items()
+                                     if self.year_signatures.get(y) != s)
+                    base, by_country = self.base, self.by_country
+                removed = set(self.year_signatures) - set(signatures)
+                if not changed and not removed and self.ready:
+                    self.last_refresh = time.time()
+                    self.last_reloaded_years = []
+                    return []
+
+                fresh_base = self._aggregate(cursor, BASE_SQL, changed)
+                fresh_country = self._aggregate(cursor, COUNTRY_SQL, changed)
+                cursor.close()
+
+            stale = set(changed) | removed
+            base = self._replace_years(base, fresh_base, stale)
+            by_country = self._replace_years(by_country, fresh_country, stale)
+            # Swap in the new frames atomically; readers never see a half-built cube
+            self.base, self.by_country = base, by_country
+            self.year_signatures = signatures
+            self.dimension_signature = dimension_signature
+            self.last_refresh = time.time()
+            self.last_reloaded_years = changed
+            self._save()
+            return changed
+
+    def query(self, measures, group_by=(), year=None, year_op="=", country=None,
+              sectors=None, statuses=None, categories=None, exclude_categories=None,
+              filters=None):
+        """Aggregate the cube like the equivalent GROUP BY over the base tables"""
+        use_country = country is not None or "Country_Code" in group_by
+        frame = self.by_country if use_country else self.base
+        if frame is None:
+            raise RuntimeError("Rollup cube is not loaded yet")
+
+        mask = pd.Series(True, index=frame.index)
+        if year is not None:
+            years = frame["YEAR"].astype(str)
+            ops = {"=": years.eq, "<=": years.le, ">=": years.ge, "<": years.lt, ">": years.gt}
+            mask &= ops[year_op](str(year))
+        if country is not None:
+            mask &= frame["Country_Code"] == country
+        if sectors:
+            mask &= frame["NewSector"].str.lower().isin([s.lower() for s in sectors])
+        if statuses:
+            mask &= frame["Project_Status"].isin(statuses)
+        if categories:
+            mask &= frame["Project_Category"].isin(categories)
+        if exclude_categories:
+            mask &= ~frame["Project_Category"].isin(exclude_categories)
+        selected = frame[mask]
+
+        if "Section" in group_by:
+            selected = selected.assign(Section=section_of(selected["Project_Category"], filters or {}))
+        columns = list(measures)
+        # Distinct project counts only add up within a single year
+        if "YEAR" in group_by or (year is not None and year_op == "="):
+            columns.append("Projects")
+        if group_by:
+            result = selected.groupby(list(group_by), dropna=False)[columns].sum().reset_index()
+        else:
+            result = selected[columns].sum().to_frame().T
+        if "Projects" in result.columns:
+            # The sum of a float frame row (and of an empty selection) comes back as float
+            result["Projects"] = result["Projects"].astype("int64")
+        return result.rename(columns=MEASURES)
+
+    def _aggregate(self, cursor, sql, years):
+        if not years:
+            return None
+        where = "WHERE A.YEAR IN (" + ", ".join("?" for _ in years) + ")"
+        cursor.execute(sql.format(where=where), years)
+        builder = ColumnBuilder(cursor.description)
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            builder.append(rows)
+        frame = builder.to_frame()
+        frame["YEAR"] = frame["YEAR"].astype(str)
+        return frame
+
+    @staticmethod
+    def _replace_years(frame, fresh, years):
+        if frame is not None and len(frame):
+            frame = frame[~frame["YEAR"].isin(years)]
+        parts = [f for f in (frame, fresh) if f is not None and len(f)]
+        if not parts:
+            return fresh if fresh is not None else frame
+        return pd.concat(parts, ignore_index=True)
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        self.base = state["base"]
+        self.by_country = state["by_country"]
+        self.year_signatures = state["year_signatures"]
+        self.dimension_signature = state["dimension_signature"]
+        self.last_refresh = state.get("saved_at")
+
+    def _save(self):
+        state = {
+            "base": self.base,
+            "by_country": self.by_country,
+            "year_signatures": self.year_signatures,
+            "dimension_signature": self.dimension_signature,
+            "saved_at": self.last_refresh,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+class CubeAnswer:
+    def __init__(self, frame, description, seconds):
+        self.frame = frame
+        self.description = description
+        self.seconds = seconds
+
+
+# Question phrases -> cube measures
+MEASURE_RULES = [
+    ("FORINVANU", r"\bfdi\b|foreign (direct )?investment|investment inflow"),
+    ("EXPVLUANU", r"\bexports?\b|export (performance|value|earnings)"),
+    ("EMPVLUANU", r"employ|\bjobs?\b|workers"),
+]
+GROUP_RULES = [
+    ("YEAR", r"\b(by|per|each) year\b|yearly|annual(ly)?\b|trend|over (the )?years|year[- ]wise"),
+    ("NewSector", r"\b(by|per|each) sector\b|sector[- ]wise|across sectors"),
+    ("Project_Status", r"\b(by|per) (project )?status\b|status[- ]wise"),
+    ("Section", r"\b(by|per) section\b|section[- ]wise"),
+    ("Country_Code", r"\b(by|per) (investor |source )?country\b|country[- ]wise"),
+]
+# Questions about individual projects need the base tables
+NOT_AGGREGATE = re.compile(
+    r"\b(list|show all|which|names?|top|details?|each project|per project|projects? (named|called)|"
+    r"reference|officer|enterprise|product|approval date)\b"
+)
+
+
+class CubeRouter:
+    """Answers aggregate ANNUAT questions from the cube instead of SQL"""
+
+    def __init__(self, cube, filters):
+        self.cube = cube
+        self.filters = filters
+
+    def match(self, question):
+        if not self.cube.ready:
+            return None
+        text = question.lower()
+        if NOT_AGGREGATE.search(text):
+            return None
+        measures = [m for m, pattern in MEASURE_RULES if re.search(pattern, text)]
+        if not measures:
+            return None
+        group_by = [dim for dim, pattern in GROUP_RULES if re.search(pattern, text)]
+        if len(set(re.findall(r"\b(?:19|20)\d{2}\b", text))) > 1:
+            # "2023 and 2024" or "from 2020 to 2023" - bindings hold only one year
+            return None
+        bindings = extract_bindings(text)
+        if not group_by and "year" not in bindings:
+            # "Foreign investment statistics" - show the series over time
+            group_by = ["YEAR"]
+
+        statuses = list(self.filters.get("valid_statuses", []))
+        if bindings.get("status") == "commercial":
+            statuses = ["E1"]
+        elif bindings.get("status") == "pipeline":
+            statuses = [s for s in statuses if s != "E1"]
+        categories = None
+        if "section" in bindings:
+            categories = self.filters.get(f"section_{bindings['section']}_categories")
+        # Acronyms (IT) are matched case-sensitively so the pronoun "it" doesn't select a sector
+        sectors = [s for s in self._sectors()
+                   if (re.search(rf"\b{re.escape(s)}\b", question) if s.isupper()
+                       else re.search(rf"\b{re.escape(s.lower())}\b", text))]
+        if len(sectors) > 1 and "NewSector" not in group_by:
+            # "IT vs apparel" - one row per sector, not their sum
+            group_by.append("NewSector")
+
+        started = time.perf_counter()
+        frame = self.cube.query(
+            measures, group_by,
+            year=bindings.get("year"), year_op=bindings.get("year_op", "="),
+            country=bindings.get("country"), sectors=sectors or None,
+            statuses=statuses or None, categories=categories,
+            exclude_categories=self.filters.get("exclude_categories"), filters=self.filters,
+        )
+        seconds = time.perf_counter() - started
+
+        parts = [", ".join(MEASURES[m] for m in measures)]
+        if group_by:
+            parts.append("by " + ", ".join(group_by))
+        if "year" in bindings:
+            parts.append(f"YEAR {bindings.get('year_op', '=')} {bindings['year']}")
+        for label, value in (("country", bindings.get("country")), ("section", bindings.get("section")),
+                             ("status", bindings.get("status")), ("sector", ", ".join(sectors))):
+            if value:
+                parts.append(f"{label} {value}")
+        return CubeAnswer(frame, "; ".join(parts), seconds)
+
+    def _sectors(self):
+        base = self.cube.base
+        if base is None or not len(base):
+            return []
+        return [s for s in base["NewSector"].dropna().unique() if isinstance(s, str) and s.strip()]
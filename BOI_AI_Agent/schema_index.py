@@ -0,0 +1,297 @@
+"""Lexical retrieval index over the BOI schema for compact, question-specific prompts"""
+import ast
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from agent_core.sql_cache import fingerprint
+
+
+# Abbreviations used in BOI column names and the words analysts use for them
+ABBREVIATIONS = {
+    "for": "foreign", "loc": "local", "est": "estimated", "emp": "employment",
+    "exp": "export", "inv": "investment", "eqty": "equity", "imp": "import",
+    "vlu": "value", "anu": "annual", "prj": "project", "cat": "category",
+    "ref": "reference", "no": "number", "rm": "raw material", "cg": "capital goods",
+    "ig": "intermediate goods", "ceo": "chief executive", "co": "contact",
+    "gics": "industry classification", "isic": "industry classification",
+}
+
+QUESTION_SYNONYMS = {
+    "fdi": "foreign investment",
+    "jobs": "employment", "employees": "employment", "workers": "employment",
+    "employ": "employment", "staff": "employment", "manpower": "employment",
+    "exports": "export", "exporting": "export", "revenue": "export value",
+    "investor": "shareholder country", "investors": "shareholder country",
+    "country": "country code", "countries": "country code",
+    "sector": "newsector", "sectors": "newsector", "industry": "newsector gics",
+    "approved": "status approval", "approval": "approval date status",
+    "active": "status", "pipeline": "status", "commercial": "status commercial operation",
+    "section": "category section", "category": "category section",
+    "year": "year", "annual": "annual year", "company": "project name enterprise",
+    "companies": "project name enterprise", "name": "name", "product": "product description",
+}
+
+STOPWORDS = {
+    "the", "a", "an", "of", "in", "for", "by", "to", "and", "or", "show", "me", "list",
+    "all", "what", "which", "how", "many", "is", "are", "with", "from", "on", "per",
+    "top", "give", "get", "find", "data", "please", "total", "number",
+}
+
+
+def split_identifier(name):
+    """Split a column name like Est_Total_Investment_For into lowercase words"""
+    words = []
+    for part in re.split(r"[_\W]+", name):
+        part = re.sub(r"\d+", " ", part)
+        words.extend(w.lower() for w in re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[A-Z]+", part))
+    expanded = []
+    for word in words:
+        expanded.append(word)
+        if word in ABBREVIATIONS:
+            expanded.extend(ABBREVIATIONS[word].split())
+    # BOI packs abbreviations together, e.g. EXPVLUANU / FORINVANU
+    if name.isupper() and "_" not in name:
+        rest = name.lower()
+        for abbr in sorted(ABBREVIATIONS, key=len, reverse=True):
+            if len(abbr) > 2 and abbr in rest:
+                expanded.extend(ABBREVIATIONS[abbr].split())
+                rest = rest.replace(abbr, " ")
+    return expanded
+
+
+def stem(word):
+    for suffix in ("ing", "ies", "es", "s", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def question_terms(question):
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    terms = []
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        terms.append(word)
+        if word in QUESTION_SYNONYMS:
+            terms.extend(QUESTION_SYNONYMS[word].split())
+    return [stem(t) for t in terms]
+
+
+def compress_columns(columns):
+    """Collapse numbered column families, e.g. Country_Code1..15 -> Country_CodeN (N=1..15)"""
+    groups = defaultdict(list)
+    order = []
+    for column in columns:
+        pattern = re.sub(r"\d+", "#", column)
+        if pattern not in groups:
+            order.append(pattern)
+        groups[pattern].append(column)
+
+    rendered = []
+    for pattern in order:
+        members = groups[pattern]
+        if len(members) == 1:
+            rendered.append(members[0])
+            continue
+        numbers = [list(map(int, re.findall(r"\d+", m))) for m in members]
+        letters = "NMK"
+        name = pattern
+        ranges = []
+        for pos in range(pattern.count("#")):
+            values = [n[pos] for n in numbers]
+            letter = letters[pos] if pos < len(letters) else f"X{pos}"
+            name = name.replace("#", letter, 1)
+            ranges.append(f"{letter}={min(values)}..{max(values)}")
+        rendered.append(f"{name} ({', '.join(ranges)})")
+    return rendered
+
+
+class SchemaContext:
+    """Schema text selected for one question plus token accounting"""
+
+    def __init__(self, text, tokens, full_tokens, tables):
+        self.text = text
+        self.tokens = tokens
+        self.full_tokens = full_tokens
+        self.tables = tables
+
+    @property
+    def reduction(self):
+        return 1 - self.tokens / self.full_tokens if self.full_tokens else 0.0
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class SchemaIndex:
+    """BM25 index over tables, columns, joins and filter definitions
+
+    Built from Schema.txt (tables/columns with their comments) and the
+    report_sql_schema in SQL_Schema_V1.txt (core columns, joins, filters).
+    context_for(question) returns only the relevant tables and columns,
+    always keeping join keys and core report columns, within a token budget.
+    """
+
+    def __init__(self, schema_text, report_schema=None, extra_tables=None,
+                 extra_joins=None, extra_notes=None):
+        self.tables = self._parse_tables(schema_text)
+        report_schema = report_schema or {}
+        self.core_columns = dict(report_schema.get("tables", {}))
+        self.joins = list(report_schema.get("joins", []))
+        self.filters = report_schema.get("filters", {})
+        self.notes = {"ShareHolders_Country": self._parse_notes(schema_text)}
+        # Helper tables maintained by the agent itself (e.g. the country index)
+        for table, columns in (extra_tables or {}).items():
+            self.tables[table] = dict(columns)
+            self.core_columns[table] = list(columns)
+        self.joins += list(extra_joins or [])
+        for table, note in (extra_notes or {}).items():
+            self.notes.setdefault(table, []).append(note)
+        self.version = fingerprint(schema_text, repr(report_schema), repr(extra_tables),
+                                   repr(extra_joins), repr(extra_notes))
+
+        # One document per column; table names and comments are part of it
+        self._docs = []
+        for table, columns in self.tables.items():
+            for column, comment in columns.items():
+                terms = split_identifier(column) + split_identifier(table)
+                terms += re.findall(r"[a-z]+", comment.lower())
+                self._docs.append((table, column, Counter(stem(t) for t in terms)))
+        self._avg_len = sum(sum(d[2].values()) for d in self._docs) / max(len(self._docs), 1)
+        doc_freq = Counter()
+        for _, _, terms in self._docs:
+            doc_freq.update(terms.keys())
+        n = len(self._docs)
+        self._idf = {t: math.log(1 + (n - df + 0.5) / (df + 0.5)) for t, df in doc_freq.items()}
+        # Baseline: the whole schema block as it used to be pasted into prompts
+        block = re.search(r'database_schema\s*=\s*"""(.*?)"""', schema_text, re.S)
+        self.full_text = block.group(1) if block else schema_text
+        self.full_tokens = estimate_tokens(self.full_text)
+
+    @classmethod
+    def from_directory(cls, directory, **extras):
+        """Load Schema.txt and SQL_Schema_V1.txt from the BOI agent folder"""
+        with open(os.path.join(directory, "Schema.txt"), encoding="utf-8") as f:
+            schema_text = f.read()
+        report_schema = None
+        try:
+            with open(os.path.join(directory, "SQL_Schema_V1.txt"), encoding="utf-8") as f:
+                source = f.read()
+            report_schema = ast.literal_eval(source.split("=", 1)[1].strip())
+        except (OSError, ValueError, SyntaxError, IndexError):
+            pass
+        return cls(schema_text, report_schema, **extras)
+
+    def score_columns(self, question):
+        terms = question_terms(question)
+        scores = {}
+        k1, b = 1.2, 0.75
+        for table, column, doc in self._docs:
+            length = sum(doc.values())
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    score += self._idf[term] * tf * (k1 + 1) / (
+                        tf + k1 * (1 - b + b * length / self._avg_len))
+            if score > 0:
+                scores[(table, column)] = score
+        return scores
+
+    def context_for(self, question, token_budget=900, min_score=1.0, table_ratio=0.6):
+        """Schema text restricted to what the question needs"""
+        scores = self.score_columns(question)
+        table_scores = defaultdict(float)
+        for (table, _), score in scores.items():
+            table_scores[table] = max(table_scores[table], score)
+        # A table must match on its own merits, not just on generic words like "project"
+        threshold = max(min_score, table_ratio * max(table_scores.values(), default=0))
+        selected_tables = [t for t in self.tables if table_scores.get(t, 0) >= threshold]
+        if not selected_tables:
+            selected_tables = list(self.tables)
+        # Project details anchor every BOI answer
+        if "General_Project_Detail" in self.tables and "General_Project_Detail" not in selected_tables:
+            selected_tables.insert(0, "General_Project_Detail")
+
+        selection = {
+            table: [c for c in self.tables[table] if c in self.core_columns.get(table, [])]
+            for table in selected_tables
+        }
+        ranked = sorted(
+            ((score, table, column) for (table, column), score in scores.items()
+             if table in selection and score >= min_score),
+            reverse=True,
+        )
+        filters = self._relevant_filters(question)
+        for score, table, column in ranked:
+            if column in selection[table]:
+                continue
+            selection[table].append(column)
+            if estimate_tokens(self._render(selection, filters)) > token_budget:
+                selection[table].pop()
+                break
+
+        # Keep columns in schema order
+        for table in selection:
+            order = list(self.tables[table])
+            selection[table].sort(key=order.index)
+        text = self._render(selection, filters)
+        return SchemaContext(text, estimate_tokens(text), self.full_tokens, list(selection))
+
+    def _relevant_filters(self, question):
+        terms = set(question_terms(question))
+        relevant = []
+        for name in self.filters:
+            name_terms = {stem(t) for t in split_identifier(name)}
+            if name in ("valid_statuses", "exclude_categories") or terms & name_terms:
+                relevant.append(name)
+        return relevant
+
+    def _render(self, selection, filters):
+        lines = ["DATABASE SCHEMA (relevant tables and columns only):", ""]
+        for i, (table, columns) in enumerate(selection.items(), 1):
+            rendered = []
+            for column in compress_columns(columns):
+                comment = self.tables[table].get(column, "")
+                rendered.append(f"{column} -- {comment}" if comment else column)
+            lines.append(f"{i}. {table}({', '.join(rendered)})")
+        joins = [j for j in self.joins
+                 if all(part.split(".")[0].strip() in selection for part in j.split("="))]
+        if joins:
+            lines += ["", "JOINS:"] + [f"- {j}" for j in joins]
+        if filters:
+            lines += ["", "FILTERS:"]
+            for name in filters:
+                lines.append(f"- {name}: {self.filters[name]}")
+        notes = [note for table in selection for note in self.notes.get(table, [])]
+        if notes:
+            lines += ["", "NOTES:"] + [f"- {note}" for note in notes]
+        return "\n".join(lines)
+
+    @staticmethod
+    def _parse_tables(schema_text):
+        tables = {}
+        for match in re.finditer(r"^\s*\d+\.\s*(\w+)\((.*?)^\s*\)", schema_text, re.M | re.S):
+            columns = {}
+            for line in match.group(2).splitlines():
+                body, _, comment = line.partition("--")
+                for column in body.split(","):
+                    column = column.strip()
+                    if re.fullmatch(r"\w+", column):
+                        columns[column] = comment.strip()
+            tables[match.group(1)] = columns
+        return tables
+
+    @staticmethod
+    def _parse_notes(schema_text):
+        notes = []
+        if re.search(r"Country_Code1\] = 'XX' OR", schema_text):
+            notes.append("Investor country filter: 'XX' IN (S.Country_Code1, ..., S.Country_Code15)")
+        if "Section is derived from Project_Category" in schema_text:
+            notes.append("Section from Project_Category: 21 = Section 17, 24 = Non BOI, "
+                         "61-64 = Section 16, 71-74 = Section 17")
+        return notes
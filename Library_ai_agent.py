@@ -1,379 +1,570 @@
-import streamlit as st
-import pyodbc
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from openai import OpenAI
-import json
-from datetime import datetime, timedelta
-import io
-
-# Page configuration
-st.set_page_config(
-    page_title="Library Analytics Dashboard",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS for better styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #1f77b4;
-    }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-        border-left: 4px solid #2196f3;
-    }
-    .assistant-message {
-        background-color: #f3e5f5;
-        border-left: 4px solid #9c27b0;
-    }
-    .sql-code {
-        background-color: #2d3748;
-        color: #e2e8f0;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        font-family: 'Courier New', monospace;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Initialize session state
-if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
-if 'db_connected' not in st.session_state:
-    st.session_state.db_connected = False
-
-# Database configuration
-@st.cache_resource
-def init_database():
-    """Initialize database connection"""
-    try:
-        conn = pyodbc.connect(
-            "DRIVER={ODBC Driver 18 for SQL Server};"
-            "SERVER=localhost\\SQLEXPRESS;"
-            "DATABASE=LibraryManagementDB;"
-            "Trusted_Connection=yes;"
-            "Encrypt=no;"
-            "TrustServerCertificate=yes;"
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Database connection failed: {e}")
-        return None
-
-@st.cache_resource
-def init_openai():
-    """Initialize OpenAI client"""
-    return OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key="sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx",  # Replace with your key
-    )
-
-# Database schema
-DATABASE_SCHEMA = """
-DATABASE SCHEMA - LibraryManagementDB:
-
-1. Authors(AuthorID, FirstName, LastName, BirthDate, Nationality, Email, CreatedDate)
-2. Categories(CategoryID, CategoryName, Description, CreatedDate)  
-3. Books(BookID, Title, ISBN, AuthorID, CategoryID, PublicationYear, Publisher, TotalCopies, AvailableCopies, Price, CreatedDate)
-4. Members(MemberID, FirstName, LastName, Email, Phone, Address, JoinDate, MembershipType, IsActive, CreatedDate)
-5. BorrowingRecords(RecordID, MemberID, BookID, BorrowDate, DueDate, ReturnDate, Fine, Status, CreatedDate)
-
-RELATIONSHIPS:
-- Books.AuthorID → Authors.AuthorID
-- Books.CategoryID → Categories.CategoryID  
-- BorrowingRecords.MemberID → Members.MemberID
-- BorrowingRecords.BookID → Books.BookID
-"""
-
-def generate_sql_query(question, client):
-    """Generate SQL query from natural language"""
-    prompt = f"""You are an expert SQL Server assistant for library management analytics.
-    Convert the following question into a SQL Server query.
-
-    {DATABASE_SCHEMA}
-
-    IMPORTANT RULES:
-    1. Use SQL Server syntax
-    2. Use proper JOINs when needed
-    3. Use GETDATE() for current date
-    4. Return ONLY the SQL query
-    5. Focus on analytics and insights for directors/policy makers
-
-    Question: {question}
-
-    SQL Query:"""
-
-    try:
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-chat:free",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1
-        )
-        
-        sql_query = response.choices[0].message.content.strip()
-        # Clean up the response
-        if sql_query.startswith("```sql"):
-            sql_query = sql_query[6:]
-        if sql_query.endswith("```"):
-            sql_query = sql_query[:-3]
-        
-        return sql_query.strip()
-    except Exception as e:
-        st.error(f"Error generating SQL: {e}")
-        return None
-
-def execute_query(conn, query):
-    """Execute SQL query and return results"""
-    try:
-        cursor = conn.cursor()
-        cursor.execute(query)
-        
-        if query.strip().upper().startswith('SELECT'):
-            columns = [column[0] for column in cursor.description]
-            rows = cursor.fetchall()
-            df = pd.DataFrame.from_records(rows, columns=columns)
-            cursor.close()
-            return df, None
-        else:
-            conn.commit()
-            cursor.close()
-            return None, "Query executed successfully"
-            
-    except Exception as e:
-        return None, f"Error: {e}"
-
-def create_visualization(df, query_text):
-    """Create appropriate visualization based on data"""
-    if df is None or df.empty:
-        return None
-    
-    # Simple heuristics for chart type selection
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'string']).columns.tolist()
-    
-    if len(numeric_cols) >= 1 and len(categorical_cols) >= 1:
-        # Bar chart
-        fig = px.bar(df, x=categorical_cols[0], y=numeric_cols[0], 
-                     title=f"Analysis: {query_text[:50]}...")
-        return fig
-    elif len(numeric_cols) >= 2:
-        # Scatter plot
-        fig = px.scatter(df, x=numeric_cols[0], y=numeric_cols[1],
-                        title=f"Analysis: {query_text[:50]}...")
-        return fig
-    
-    return None
-
-# Sidebar
-with st.sidebar:
-    st.image("https://via.placeholder.com/200x100/1f77b4/white?text=Library+AI", width=200)
-    st.title("🤖 Library Analytics AI")
-    
-    # Connection status
-    conn = init_database()
-    if conn:
-        st.success("🟢 Database Connected")
-        st.session_state.db_connected = True
-    else:
-        st.error("🔴 Database Disconnected")
-        st.session_state.db_connected = False
-    
-    st.markdown("---")
-    
-    # Quick Analytics Buttons
-    st.subheader("📊 Quick Analytics")
-    
-    quick_queries = {
-        "📚 Total Books": "SELECT COUNT(*) as TotalBooks FROM Books",
-        "👥 Active Members": "SELECT COUNT(*) as ActiveMembers FROM Members WHERE IsActive = 1",
-        "📖 Currently Borrowed": "SELECT COUNT(*) as BorrowedBooks FROM BorrowingRecords WHERE Status = 'Borrowed'",
-        "⚠️ Overdue Books": "SELECT COUNT(*) as OverdueBooks FROM BorrowingRecords WHERE Status = 'Overdue'",
-        "💰 Total Fines": "SELECT SUM(Fine) as TotalFines FROM BorrowingRecords WHERE Fine > 0"
-    }
-    
-    for label, query in quick_queries.items():
-        if st.button(label, key=f"quick_{label}"):
-            if st.session_state.db_connected:
-                df, error = execute_query(conn, query)
-                if df is not None and not df.empty:
-                    value = df.iloc[0, 0]
-                    st.metric(label, value)
-    
-    st.markdown("---")
-    
-    # Sample Questions
-    st.subheader("💡 Sample Questions")
-    sample_questions = [
-        "Show me monthly borrowing trends",
-        "Which books are most popular?",
-        "What's the average fine amount?",
-        "Show member demographics",
-        "List overdue books with member details"
-    ]
-    
-    for question in sample_questions:
-        if st.button(f"💬 {question}", key=f"sample_{question}"):
-            st.session_state.current_question = question
-
-# Main Content
-st.markdown('<h1 class="main-header">📊 Library Management Analytics Dashboard</h1>', unsafe_allow_html=True)
-
-# Dashboard Overview
-if st.session_state.db_connected:
-    col1, col2, col3, col4 = st.columns(4)
-    
-    # Quick metrics
-    with col1:
-        df, _ = execute_query(conn, "SELECT COUNT(*) as count FROM Books")
-        total_books = df.iloc[0, 0] if df is not None else 0
-        st.metric("📚 Total Books", total_books)
-    
-    with col2:
-        df, _ = execute_query(conn, "SELECT COUNT(*) as count FROM Members WHERE IsActive = 1")
-        active_members = df.iloc[0, 0] if df is not None else 0
-        st.metric("👥 Active Members", active_members)
-    
-    with col3:
-        df, _ = execute_query(conn, "SELECT COUNT(*) as count FROM BorrowingRecords WHERE Status = 'Borrowed'")
-        borrowed = df.iloc[0, 0] if df is not None else 0
-        st.metric("📖 Currently Borrowed", borrowed)
-    
-    with col4:
-        df, _ = execute_query(conn, "SELECT SUM(Fine) as total FROM BorrowingRecords WHERE Fine > 0")
-        total_fines = df.iloc[0, 0] if df is not None and df.iloc[0, 0] is not None else 0
-        st.metric("💰 Total Fines", f"${total_fines:.2f}")
-
-# Chat Interface
-st.markdown("---")
-st.subheader("💬 Ask Questions About Your Library Data")
-
-# Initialize OpenAI client
-client = init_openai()
-
-# Chat input
-user_question = st.text_input(
-    "Ask a question about your library data:",
-    placeholder="e.g., Show me the most borrowed books this month",
-    key="user_input"
-)
-
-if hasattr(st.session_state, 'current_question'):
-    user_question = st.session_state.current_question
-    delattr(st.session_state, 'current_question')
-
-if user_question and st.session_state.db_connected:
-    # Add user message to chat history
-    st.session_state.chat_history.append({
-        "role": "user",
-        "content": user_question,
-        "timestamp": datetime.now()
-    })
-    
-    with st.spinner("🤖 Analyzing your question..."):
-        # Generate SQL query
-        sql_query = generate_sql_query(user_question, client)
-        
-        if sql_query:
-            # Execute query
-            df, error = execute_query(conn, sql_query)
-            
-            # Add assistant response to chat history
-            if df is not None:
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": f"Here's the analysis for: {user_question}",
-                    "sql_query": sql_query,
-                    "data": df,
-                    "timestamp": datetime.now()
-                })
-            else:
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": f"Error: {error}",
-                    "sql_query": sql_query,
-                    "timestamp": datetime.now()
-                })
-
-# Display chat history
-if st.session_state.chat_history:
-    st.markdown("### 💬 Conversation History")
-    
-    for i, message in enumerate(reversed(st.session_state.chat_history[-10:])):  # Show last 10 messages
-        if message["role"] == "user":
-            st.markdown(f"""
-            <div class="chat-message user-message">
-                <strong>👤 You:</strong> {message["content"]}<br>
-                <small>🕒 {message["timestamp"].strftime("%H:%M:%S")}</small>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        else:
-            st.markdown(f"""
-            <div class="chat-message assistant-message">
-                <strong>🤖 AI Assistant:</strong> {message["content"]}<br>
-                <small>🕒 {message["timestamp"].strftime("%H:%M:%S")}</small>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Show SQL query
-            if "sql_query" in message:
-                with st.expander("🔍 View Generated SQL Query"):
-                    st.code(message["sql_query"], language="sql")
-            
-            # Show data and visualization
-            if "data" in message and message["data"] is not None:
-                df = message["data"]
-                
-                col1, col2 = st.columns([2, 1])
-                
-                with col1:
-                    st.dataframe(df, use_container_width=True)
-                
-                with col2:
-                    # Download button
-                    csv = df.to_csv(index=False)
-                    st.download_button(
-                        label="📥 Download CSV",
-                        data=csv,
-                        file_name=f"library_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
-                    )
-                
-                # Create visualization
-                fig = create_visualization(df, message.get("content", ""))
-                if fig:
-                    st.plotly_chart(fig, use_container_width=True)
-        
-        st.markdown("---")
-
-# Clear chat button
-if st.session_state.chat_history:
-    if st.button("🗑️ Clear Chat History"):
-        st.session_state.chat_history = []
-        st.experimental_rerun()
-
-# Footer
-st.markdown("---")
-st.markdown("""
-<div style="text-align: center; color: #666;">
-    <p>📊 Library Analytics Dashboard | Powered by AI & SQL Server</p>
-</div>
-""", unsafe_allow_html=True)
+import streamlit as st
+import pandas as pd
+import json
+from datetime import datetime, timedelta
+import io
+import os
+import uuid
+from contextlib import nullcontext
+
+from agent_core.agent import Answer
+from agent_core.charts import FigureCache, category_chart
+from agent_core.export import EXPORT_FORMATS, ExportCache, stream_query_to_file
+from agent_core.history_store import HistoryStore
+from agent_core.kpi import KpiSnapshot
+from agent_core.pipeline import StageTimings
+from agent_core.query_runner import QueryCancelled, QueryRunner, wait
+from agent_core.service import ServiceBusy, ServiceClient
+from agent_core.tracing import Tracer
+from library_agent import (ANSWER_DEADLINE, EXPORT_DIR, FETCH_BATCH_SIZE, SAMPLE_QUESTIONS,
+                           LibraryAgent, connect_database, make_guard)
+
+# Page configuration
+st.set_page_config(
+    page_title="Library Analytics Dashboard",
+    page_icon="📊",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Custom CSS for better styling
+st.markdown("""
+<style>
+    .main-header {
+        font-size: 2.5rem;
+        color: #1f77b4;
+        text-align: center;
+        margin-bottom: 2rem;
+    }
+    .metric-card {
+        background-color: #f0f2f6;
+        padding: 1rem;
+        border-radius: 0.5rem;
+        border-left: 4px solid #1f77b4;
+    }
+    .chat-message {
+        padding: 1rem;
+        border-radius: 0.5rem;
+        margin-bottom: 1rem;
+    }
+    .user-message {
+        background-color: #e3f2fd;
+        border-left: 4px solid #2196f3;
+    }
+    .assistant-message {
+        background-color: #f3e5f5;
+        border-left: 4px solid #9c27b0;
+    }
+    .sql-code {
+        background-color: #2d3748;
+        color: #e2e8f0;
+        padding: 1rem;
+        border-radius: 0.5rem;
+        font-family: 'Courier New', monospace;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# Initialize session state
+if 'chat_history' not in st.session_state:
+    st.session_state.chat_history = []
+if 'db_connected' not in st.session_state:
+    st.session_state.db_connected = False
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex[:12]
+
+# Questions are answered by the agent service (python agent_service.py) when this is set,
+# otherwise by the same pipeline running in this process
+AGENT_SERVICE_URL = os.environ.get("AGENT_SERVICE_URL")
+
+@st.cache_resource
+def init_database():
+    """Initialize the database connection pool shared by all sessions"""
+    try:
+        return connect_database()
+    except Exception as e:
+        st.error(f"Database connection failed: {e}")
+        return None
+
+@st.cache_resource
+def init_sql_guard():
+    """Read-only, row-limited, cost-checked execution of generated SQL"""
+    return make_guard()
+
+@st.cache_resource
+def init_agent(_db_pool):
+    """The question pipeline with its translation and result caches, shared by all sessions"""
+    return LibraryAgent(_db_pool, guard=init_sql_guard())
+
+@st.cache_resource
+def init_service_client():
+    """Client for the agent service, or None to answer questions in this process"""
+    return ServiceClient(AGENT_SERVICE_URL) if AGENT_SERVICE_URL else None
+
+@st.cache_resource
+def init_query_runner():
+    """Worker threads that answer questions so the script thread can offer a Cancel button"""
+    return QueryRunner(max_workers=20, default_deadline=ANSWER_DEADLINE)
+
+def cancel_running_query():
+    """Cancel button callback - stops the statement on the server"""
+    job = st.session_state.get('running_query')
+    if job is not None and job.cancel():
+        st.session_state.query_cancelled = True
+
+# Chat history keeps metadata only; result frames live in the history store
+MAX_HISTORY_MESSAGES = 100
+HISTORY_SESSION_BUDGET = 32 * 1024 * 1024
+HISTORY_GLOBAL_BUDGET = 512 * 1024 * 1024
+
+@st.cache_resource
+def init_history_store():
+    """Chat result frames for all sessions, spilled to .cache/history beyond the memory budgets"""
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+    return HistoryStore(os.path.join(cache_dir, "history"), session_budget=HISTORY_SESSION_BUDGET,
+                        global_budget=HISTORY_GLOBAL_BUDGET)
+
+def add_to_history(message):
+    """Append a chat message, dropping (and deleting the results of) the oldest beyond the cap"""
+    history = st.session_state.chat_history
+    history.append(message)
+    trimmed = history[:-MAX_HISTORY_MESSAGES]
+    if trimmed:
+        del history[:-MAX_HISTORY_MESSAGES]
+        init_history_store().discard([m["result_key"] for m in trimmed if "result_key" in m])
+
+# All dashboard KPIs in a single round trip
+KPI_SQL = """
+SELECT
+    (SELECT COUNT(*) FROM Books) AS TotalBooks,
+    (SELECT COUNT(*) FROM Members WHERE IsActive = 1) AS ActiveMembers,
+    (SELECT COUNT(*) FROM BorrowingRecords WHERE Status = 'Borrowed') AS BorrowedBooks,
+    (SELECT COUNT(*) FROM BorrowingRecords WHERE Status = 'Overdue') AS OverdueBooks,
+    (SELECT SUM(Fine) FROM BorrowingRecords WHERE Fine > 0) AS TotalFines
+"""
+
+@st.cache_resource
+def init_kpi_snapshot(_db_pool):
+    """Start the background-refreshed KPI snapshot"""
+    return KpiSnapshot(_db_pool, KPI_SQL, interval=60)
+
+def ask_agent(db_pool, question, trace):
+    """Answer a question on a worker thread or the agent service; the user can cancel it meanwhile
+
+    Returns an agent.Answer. A failed answer also closes the trace; a
+    successful one is closed once it has been rendered.
+    """
+    service = init_service_client()
+    if service is not None:
+        job = service.submit("library", question, tenant=st.session_state.session_id,
+                             deadline=ANSWER_DEADLINE)
+    else:
+        # Streamlit caches are resolved here; worker threads have no script context
+        pipeline = init_agent(db_pool).pipeline
+        job = init_query_runner().submit(lambda job: pipeline.answer(question, job, trace),
+                                         deadline=pipeline.deadline)
+    st.session_state.running_query = job
+    cancel_slot = st.empty()
+    cancel_slot.button("⏹️ Cancel query", key=f"cancel_query_{job.id}", on_click=cancel_running_query)
+    progress = st.empty()
+    try:
+        with trace.stage("service") if service is not None else nullcontext():
+            answer = wait(job, on_tick=lambda elapsed: progress.caption(
+                f"⏳ Running for {elapsed:.0f}s (deadline {job.deadline}s)"))
+    except QueryCancelled as e:
+        answer = Answer(question, "timeout" if e.reason == "timeout" else "cancelled", str(e))
+    except ServiceBusy as e:
+        answer = Answer(question, "error", f"The agent service is busy, try again in {e.retry_after or 1}s")
+    except Exception as e:
+        answer = Answer(question, "error", f"Error: {e}")
+    finally:
+        # A rerun interrupted the wait: nobody will read the result, so stop it
+        if not job.done():
+            job.cancel()
+        st.session_state.running_query = None
+        cancel_slot.empty()
+        progress.empty()
+    trace.annotate(route=answer.route)
+    if not answer.ok:
+        trace.finish(answer.status, answer.error)
+    return answer
+
+def save_full_result(db_pool, query, fmt="csv"):
+    """Stream the complete result of a query to a CSV/Parquet/Excel file on the server"""
+    path = os.path.join(EXPORT_DIR, f"library_full_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                                    f".{EXPORT_FORMATS[fmt].extension}")
+    try:
+        # Still read-only, but without the row limit
+        query = init_sql_guard().check(query, limit=False).sql
+        rows = stream_query_to_file(db_pool, query, path, batch_size=FETCH_BATCH_SIZE)
+        return path, rows, None
+    except Exception as e:
+        return None, 0, f"Error: {e}"
+
+@st.cache_resource
+def init_export_cache():
+    """Encoded downloads shared by all sessions, built only when someone asks for them"""
+    return ExportCache()
+
+def show_download(result_key, df, file_prefix):
+    """Export format picker; the file is encoded on request and then served from the export cache"""
+    fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"export_format_{result_key}",
+                       format_func=lambda f: EXPORT_FORMATS[f].label)
+    export = EXPORT_FORMATS[fmt]
+    prepared = st.session_state.setdefault("prepared_exports", set())
+    if (result_key, fmt) not in prepared:
+        if not st.button(f"📦 Prepare {export.label} file", key=f"prepare_{result_key}_{fmt}"):
+            return
+        prepared.add((result_key, fmt))
+    try:
+        data = init_export_cache().get(result_key, fmt, df)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    st.download_button(
+        label=f"📥 Download {export.label}",
+        data=data,
+        file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export.extension}",
+        mime=export.mime,
+        key=f"download_{result_key}_{fmt}"
+    )
+
+@st.cache_resource
+def init_tracer():
+    """Per-question stage traces shared by all sessions, exported under .cache/traces"""
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+    return Tracer(capacity=500, export_dir=os.path.join(cache_dir, "traces"))
+
+def show_diagnostics():
+    """Recent question traces, per-stage percentiles and metric exports"""
+    tracer = init_tracer()
+    traces = tracer.recent(limit=20)
+    if not traces:
+        st.caption("No questions traced yet")
+        return
+    st.dataframe(pd.DataFrame([{
+        "time": datetime.fromtimestamp(t.started_at).strftime("%H:%M:%S"),
+        "question": t.question_hash[:8],
+        "status": t.status,
+        "total ms": round(t.elapsed * 1000),
+        **{name: round(seconds * 1000) for name, seconds in t.items()},
+    } for t in traces]), use_container_width=True)
+    st.dataframe(pd.DataFrame(
+        [(name, count, round(p50), round(p95), round(peak))
+         for name, (count, p50, p95, peak) in tracer.stage_summary().items()],
+        columns=["stage", "count", "p50 ms", "p95 ms", "max ms"]), use_container_width=True)
+    if st.button("📤 Export metrics", key="export_traces"):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        prom = tracer.write_prometheus(os.path.join(tracer.export_dir, f"metrics_{stamp}.prom"))
+        jsonl = tracer.write_jsonl(os.path.join(tracer.export_dir, f"traces_{stamp}.jsonl"))
+        st.success(f"Wrote {prom} and {jsonl}")
+
+@st.cache_resource
+def init_figure_cache():
+    """Charts already built for chat results, shared by all sessions"""
+    return FigureCache(max_entries=200)
+
+def create_visualization(df, query_text, result_key):
+    """Create appropriate visualization based on data (built once per result)"""
+    return init_figure_cache().get(
+        (result_key, "category"), lambda: category_chart(df, f"Analysis: {query_text[:50]}..."))
+
+# Sidebar
+with st.sidebar:
+    st.image("https://via.placeholder.com/200x100/1f77b4/white?text=Library+AI", width=200)
+    st.title("🤖 Library Analytics AI")
+    
+    # Connection status
+    db_pool = init_database()
+    if db_pool:
+        st.success("🟢 Database Connected")
+        st.session_state.db_connected = True
+    else:
+        st.error("🔴 Database Disconnected")
+        st.session_state.db_connected = False
+    
+    st.markdown("---")
+    
+    # Quick Analytics Buttons
+    st.subheader("📊 Quick Analytics")
+    
+    # Served from the KPI snapshot - no query per click
+    quick_metrics = {
+        "📚 Total Books": "TotalBooks",
+        "👥 Active Members": "ActiveMembers",
+        "📖 Currently Borrowed": "BorrowedBooks",
+        "⚠️ Overdue Books": "OverdueBooks",
+        "💰 Total Fines": "TotalFines"
+    }
+    
+    kpis = init_kpi_snapshot(db_pool) if st.session_state.db_connected else None
+    for label, metric in quick_metrics.items():
+        if st.button(label, key=f"quick_{label}"):
+            if kpis is not None and kpis.available:
+                st.metric(label, kpis.get(metric, 0))
+                st.caption(kpis.describe_age())
+    
+    st.markdown("---")
+    
+    # Sample Questions
+    st.subheader("💡 Sample Questions")
+    for question in SAMPLE_QUESTIONS:
+        if st.button(f"💬 {question}", key=f"sample_{question}"):
+            st.session_state.current_question = question
+
+    st.markdown("---")
+
+    # Cache stats
+    service = init_service_client()
+    if service is not None:
+        try:
+            service_stats = service.stats()
+            st.caption(
+                f"🛰️ Agent service: {service_stats['running']} running, {service_stats['queued']} queued, "
+                f"{service_stats['coalesced']} coalesced, "
+                f"{service_stats['rejected_busy'] + service_stats['rejected_tenant']} turned away"
+            )
+        except Exception:
+            st.caption("🛰️ Agent service unreachable")
+    elif db_pool:
+        agent = init_agent(db_pool)
+        cache_stats = agent.translation_cache.stats()
+        st.caption(
+            f"⚡ SQL cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} stored"
+        )
+        example_stats = agent.examples.stats()
+        st.caption(
+            f"📚 Examples: {example_stats['entries']} learned, added to "
+            f"{example_stats['served']} of {example_stats['lookups']} prompts"
+        )
+        result_stats = agent.result_cache.stats()
+        st.caption(
+            f"🗄️ Result cache: {result_stats['hits']} hits / {result_stats['misses']} misses, "
+            f"{result_stats['entries']} results ({result_stats['bytes'] / 1e6:.1f} MB), "
+            f"{result_stats['invalidations']} invalidated"
+        )
+        llm_stats = agent.generator.stats()
+        st.caption(
+            f"🤖 LLM: {llm_stats['calls']} calls, avg {llm_stats['avg_latency']:.1f}s "
+            f"(first token {llm_stats['avg_first_token']:.1f}s), "
+            f"{llm_stats['hedges']} hedged ({llm_stats['hedge_wins']} won), "
+            f"{llm_stats['retries']} retries, {llm_stats['timeouts']} timeouts"
+        )
+        if "tiers" in llm_stats:
+            st.caption("🧭 Model router: " + ", ".join(
+                f"{tier} ({health['model']}) {llm_stats['routed'][tier]} routed, "
+                f"{health['latency']:.1f}s, {health['error_rate']:.0%} errors"
+                for tier, health in llm_stats["tiers"].items()
+            ))
+    if db_pool:
+        pool_stats = db_pool.metrics()
+        st.caption(
+            f"🔌 Pool: {pool_stats['in_use']}/{pool_stats['max_size']} in use, "
+            f"{pool_stats['idle']} idle, {pool_stats['checkouts']} checkouts, "
+            f"{pool_stats['waits']} waits, {pool_stats['timeouts']} timeouts, "
+            f"{pool_stats['connect_failures'] + pool_stats['health_check_failures']} failures"
+        )
+    runner_stats = init_query_runner().stats()
+    st.caption(
+        f"⏱️ Queries: {runner_stats['running']} running, {runner_stats['completed']} done, "
+        f"{runner_stats['cancelled']} cancelled, {runner_stats['timed_out']} timed out"
+    )
+    guard_stats = init_sql_guard().stats()
+    st.caption(
+        f"🛡️ SQL guard: {guard_stats['rejected']} rejected, {guard_stats['limited']} row-limited, "
+        f"{guard_stats['blocked_by_cost']} blocked by cost"
+    )
+    export_stats = init_export_cache().stats()
+    st.caption(
+        f"📥 Exports: {export_stats['entries']} files cached ({export_stats['bytes'] / 1e6:.1f} MB), "
+        f"{export_stats['hits']} served from cache, {export_stats['misses']} encoded"
+    )
+    history_stats = init_history_store().stats()
+    st.caption(
+        f"🗂️ Chat results: {history_stats['in_memory']}/{history_stats['results']} in memory "
+        f"({history_stats['bytes'] / 1e6:.1f} MB), {history_stats['spills']} spilled to disk, "
+        f"{history_stats['loads']} reloaded"
+    )
+
+    with st.expander("🩺 Diagnostics"):
+        show_diagnostics()
+
+# Main Content
+st.markdown('<h1 class="main-header">📊 Library Management Analytics Dashboard</h1>', unsafe_allow_html=True)
+
+# Dashboard Overview
+if st.session_state.db_connected:
+    kpis = init_kpi_snapshot(db_pool)
+    col1, col2, col3, col4 = st.columns(4)
+    
+    # Quick metrics (read from the background snapshot)
+    with col1:
+        st.metric("📚 Total Books", kpis.get("TotalBooks", 0))
+    
+    with col2:
+        st.metric("👥 Active Members", kpis.get("ActiveMembers", 0))
+    
+    with col3:
+        st.metric("📖 Currently Borrowed", kpis.get("BorrowedBooks", 0))
+    
+    with col4:
+        total_fines = kpis.get("TotalFines", 0)
+        st.metric("💰 Total Fines", f"${total_fines:.2f}")
+    
+    col_age, col_refresh = st.columns([4, 1])
+    with col_age:
+        if kpis.last_error is not None:
+            st.caption(f"⚠️ Metrics {kpis.describe_age()} (last refresh failed: {kpis.last_error})")
+        else:
+            st.caption(f"🕒 Metrics {kpis.describe_age()}")
+    with col_refresh:
+        if st.button("🔄 Refresh metrics"):
+            kpis.refresh_now()
+
+# Chat Interface
+st.markdown("---")
+st.subheader("💬 Ask Questions About Your Library Data")
+
+if st.session_state.pop('query_cancelled', False):
+    st.info("⏹️ The running query was cancelled on the server.")
+
+def submit_question():
+    """Take the question out of the input so later reruns (Cancel, Refresh) don't ask it again"""
+    st.session_state.current_question = st.session_state.user_input.strip()
+    st.session_state.user_input = ""
+
+# Chat input
+st.text_input(
+    "Ask a question about your library data:",
+    placeholder="e.g., Show me the most borrowed books this month",
+    key="user_input",
+    on_change=submit_question
+)
+
+user_question = None
+if hasattr(st.session_state, 'current_question'):
+    user_question = st.session_state.current_question
+    delattr(st.session_state, 'current_question')
+
+if user_question and st.session_state.db_connected:
+    # Add user message to chat history
+    add_to_history({
+        "role": "user",
+        "content": user_question,
+        "timestamp": datetime.now()
+    })
+    
+    trace = init_tracer().start("library", st.session_state.session_id, user_question)
+    with st.spinner("🤖 Analyzing your question..."):
+        # Generate and execute the SQL query
+        answer = ask_agent(db_pool, user_question, trace)
+        
+        # Add assistant response to chat history
+        if answer.ok:
+            add_to_history({
+                "role": "assistant",
+                "content": f"Here's the analysis for: {user_question}",
+                "sql_query": answer.sql,
+                "result_key": init_history_store().put(st.session_state.session_id, answer.frame),
+                "rows": len(answer.frame),
+                # Finished once the answer has been rendered below
+                "trace": trace,
+                "timestamp": datetime.now()
+            })
+        elif answer.sql is None:
+            st.error(answer.error)
+        else:
+            add_to_history({
+                "role": "assistant",
+                "content": f"Error: {answer.error}",
+                "sql_query": answer.sql,
+                "timestamp": datetime.now()
+            })
+
+# Display chat history
+if st.session_state.chat_history:
+    st.markdown("### 💬 Conversation History")
+    
+    for i, message in enumerate(reversed(st.session_state.chat_history[-10:])):  # Show last 10 messages
+        if message["role"] == "user":
+            st.markdown(f"""
+            <div class="chat-message user-message">
+                <strong>👤 You:</strong> {message["content"]}<br>
+                <small>🕒 {message["timestamp"].strftime("%H:%M:%S")}</small>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        else:
+            st.markdown(f"""
+            <div class="chat-message assistant-message">
+                <strong>🤖 AI Assistant:</strong> {message["content"]}<br>
+                <small>🕒 {message["timestamp"].strftime("%H:%M:%S")}</small>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # Show SQL query
+            if "sql_query" in message:
+                with st.expander("🔍 View Generated SQL Query"):
+                    st.code(message["sql_query"], language="sql")
+            
+            # Show data and visualization; spilled results are only read back on request
+            df = None
+            if "result_key" in message:
+                history_store = init_history_store()
+                if history_store.in_memory(message["result_key"]) or st.toggle(
+                        f"📂 Show result ({message['rows']:,} rows)", key=f"show_{message['result_key']}"):
+                    df = history_store.get(message["result_key"])
+                    if df is None:
+                        st.caption("This result is no longer available - ask the question again.")
+            if df is not None:
+                trace = message.pop("trace", None)
+                timings = trace if trace is not None else StageTimings()
+                
+                for warning in df.attrs.get("guard_warnings", []):
+                    st.warning(f"⚠️ {warning}")
+                if df.attrs.get("truncated"):
+                    st.warning(f"⚠️ Large result: showing the first {len(df):,} rows only.")
+                    if st.button("💾 Save full result to disk (in the chosen export format)",
+                                 key=f"save_full_{message['timestamp'].timestamp()}"):
+                        fmt = st.session_state.get(f"export_format_{message['result_key']}", "csv")
+                        path, row_count, save_error = save_full_result(db_pool, message["sql_query"], fmt)
+                        if save_error:
+                            st.error(save_error)
+                        else:
+                            st.success(f"Saved {row_count:,} rows to {path}")
+                
+                col1, col2 = st.columns([2, 1])
+                
+                with col1:
+                    st.dataframe(df, use_container_width=True)
+                
+                with col2:
+                    # Files are only encoded when asked for, once per result and format
+                    with timings.stage("export"):
+                        show_download(message["result_key"], df, "library_data")
+                
+                # Create visualization
+                with timings.stage("visualization"):
+                    fig = create_visualization(df, message.get("content", ""), message["result_key"])
+                    if fig:
+                        st.plotly_chart(fig, use_container_width=True, key=f"chart_{message['result_key']}")
+                if trace is not None:
+                    trace.finish()
+        
+        st.markdown("---")
+
+# Clear chat button
+if st.session_state.chat_history:
+    if st.button("🗑️ Clear Chat History"):
+        st.session_state.chat_history = []
+        init_history_store().drop_session(st.session_state.session_id)
+        st.experimental_rerun()
+
+# Footer
+st.markdown("---")
+st.markdown("""
+<div style="text-align: center; color: #666;">
+    <p>📊 Library Analytics Dashboard | Powered by AI & SQL Server</p>
+</div>
+""", unsafe_allow_html=True)
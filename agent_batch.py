@@ -0,0 +1,87 @@
+"""Answer a file of questions in one run and write the results plus a combined report
+
+    python agent_batch.py questions.jsonl --out .cache/batch
+    python agent_batch.py --include-samples --format xlsx
+
+See agent_core/batch.py for the JSONL format. --include-samples adds the
+apps' sidebar questions and every V2 report template (unfiltered).
+"""
+import argparse
+import os
+import sys
+import time
+
+from agent_service import AGENTS, REPO_DIR
+from agent_core.batch import BatchItem, BatchRunner, load_items, timing_summary, write_outputs
+from agent_core.export import EXPORT_FORMATS
+import boi_agent
+import library_agent
+
+
+def sample_items(apps):
+    """The apps' example questions and the V2 report queries"""
+    items = []
+    if "library" in apps:
+        items += [BatchItem("library", question) for question in library_agent.SAMPLE_QUESTIONS]
+    if "boi" in apps:
+        items += [BatchItem("boi", question) for question in boi_agent.EXAMPLE_QUESTIONS]
+        templates = boi_agent.load_report_templates()
+        for name, template in (templates.templates.items() if templates else ()):
+            sql, params = template.render()
+            items.append(BatchItem("boi", f"V2 report: {name}", name=name, sql=sql, params=params))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", nargs="?", help="JSONL file of questions")
+    parser.add_argument("--out", default=os.path.join(REPO_DIR, ".cache", "batch", time.strftime("%Y%m%d-%H%M%S")))
+    parser.add_argument("--format", default="parquet", choices=[f for f in EXPORT_FORMATS if f != "csv"],
+                        help="format of the per-question result files")
+    parser.add_argument("--include-samples", action="store_true")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="SQL generations at once")
+    parser.add_argument("--query-concurrency", type=int, default=8, help="queries at once")
+    args = parser.parse_args()
+
+    items = load_items(args.questions) if args.questions else []
+    apps = {item.app for item in items}
+    if args.include_samples:
+        apps |= set(AGENTS)
+    pipelines = {}
+    for app in sorted(apps):
+        connect, agent_class = AGENTS[app]
+        try:
+            pipelines[app] = agent_class(connect()).pipeline
+        except Exception as e:
+            print(f"Skipping {app}: {e}")
+    if args.include_samples:
+        items += sample_items(pipelines)
+    skipped = [item for item in items if item.app not in pipelines]
+    items = [item for item in items if item.app in pipelines]
+    if skipped:
+        print(f"Skipping {len(skipped)} question(s) for unavailable apps")
+    if not items:
+        return 1
+
+    def report(result):
+        print(f"[{result.total:7.2f}s] {result.answer.status:<9} {result.item.app:<8} {result.item.name}")
+
+    started = time.monotonic()
+    runner = BatchRunner(pipelines, llm_concurrency=args.llm_concurrency,
+                         query_concurrency=args.query_concurrency)
+    results = runner.run(items, on_result=report)
+    wall = time.monotonic() - started
+    path = write_outputs(results, args.out, args.format)
+    summary = timing_summary(results)
+    summary.to_csv(os.path.join(args.out, "summary.csv"), index=False)
+
+    ok = sum(result.answer.ok for result in results)
+    serial = sum(result.resolve_seconds + result.execute_seconds for result in results)
+    print(f"{ok}/{len(results)} answered in {wall:.1f}s "
+          f"(one at a time: ~{serial:.1f}s, {serial / wall if wall else 0:.1f}x)")
+    print(f"Report: {path}")
+    return 0 if ok == len(results) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Shared building blocks for the Library and BOI AI agents"""
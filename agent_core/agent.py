@@ -0,0 +1,197 @@
+"""One agent's whole question -> answer pipeline, shared by the apps, the service and batch runs"""
+from agent_core.pipeline import StageTimings
+from agent_core.query_runner import QueryCancelled
+from agent_core.sql_guard import GuardError
+from agent_core.stats import StreamingStats
+
+
+class RoutedAnswer:
+    """What a route returns for a question it can answer without the LLM
+
+    Either sql (plus params) to run instead of generated SQL, or a ready frame.
+    """
+
+    def __init__(self, route, sql=None, params=None, frame=None, note=""):
+        self.route = route
+        self.sql = sql
+        self.params = params
+        self.frame = frame
+        self.note = note
+
+
+class Answer:
+    """Outcome of one question
+
+    status is ok, error, blocked, cancelled or timeout; sql is None when no
+    SQL was generated. summary is a describe()-style frame when the pipeline
+    summarizes results.
+    """
+
+    def __init__(self, question, status="ok", error=None, route="llm", sql=None, params=None,
+                 frame=None, note="", summary=None, summary_note=""):
+        self.question = question
+        self.status = status
+        self.error = error
+        self.route = route
+        self.sql = sql
+        self.params = params
+        self.frame = frame
+        self.note = note
+        self.summary = summary
+        self.summary_note = summary_note
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    @property
+    def truncated(self):
+        return self.frame is not None and bool(self.frame.attrs.get("truncated"))
+
+    @property
+    def warnings(self):
+        return list(self.frame.attrs.get("guard_warnings", [])) if self.frame is not None else []
+
+
+class AgentPipeline:
+    """Routes, then translation, SQL rewrite, guarded execution and summary statistics
+
+    routes is a list of (name, func) tried in order; func(question) returns a
+    RoutedAnswer or None. rewrite(sql) adjusts generated SQL before it runs and
+    prompt_note(question) describes the prompt of LLM answers. With summarize
+    the answer carries streaming summary statistics; with pushdown those are
+    recomputed by the database for truncated results. deadline is the time an
+    answer may take on a QueryRunner, translation included. planner (a
+    planner.QueryPlanner) answers compound questions, ahead of the routes.
+    """
+
+    def __init__(self, name, translator, executor, routes=(), rewrite=None, prompt_note=None,
+                 summarize=False, pushdown=False, server_quantiles=False, deadline=60, planner=None):
+        self.name = name
+        self.translator = translator
+        self.executor = executor
+        self.routes = list(routes)
+        self.rewrite = rewrite
+        self.prompt_note = prompt_note
+        self.summarize = summarize
+        self.pushdown = pushdown
+        self.server_quantiles = server_quantiles
+        self.deadline = deadline
+        self.planner = planner
+
+    def route(self, question, timings):
+        for name, func in self.routes:
+            with timings.stage(f"route_{name}"):
+                routed = func(question)
+            if routed is not None:
+                return routed
+        return None
+
+    def answer(self, question, job=None, trace=None):
+        """Answer a question; failures come back as an Answer with a status, never raised
+
+        job is the QueryJob when this runs on a QueryRunner (deadline and
+        cancellation); trace is a StageTimings/tracing.Trace to fill.
+        """
+        timings = StageTimings() if trace is None else trace
+        if self.planner is not None:
+            # Before the routes: a route matching a compound question answers only part of it
+            planned = self.planner.answer(self, question, job, timings)
+            if planned is not None:
+                return planned
+        answer = self.routed(question, timings)
+        if answer is None:
+            answer = self.translate(question, timings)
+        if not answer.ok:
+            return answer
+        return self.execute(answer, job, timings)
+
+    def resolve(self, question, timings=None):
+        """Routes, then translation and rewrite: an Answer with sql (or a routed frame) to execute"""
+        timings = StageTimings() if timings is None else timings
+        return self.routed(question, timings) or self.translate(question, timings)
+
+    def routed(self, question, timings):
+        """The Answer of the first route that matches, or None"""
+        routed = self.route(question, timings)
+        if routed is None:
+            return None
+        return Answer(question, route=routed.route, sql=routed.sql, params=routed.params,
+                      frame=routed.frame, note=routed.note)
+
+    def translate(self, question, timings):
+        """LLM translation and rewrite, skipping the routes"""
+        try:
+            sql = self.translator.translate(question, timings)
+        except Exception as e:
+            return Answer(question, status="error", error=f"Error generating SQL: {e}")
+        if not sql:
+            return Answer(question, status="error", error="The model returned no SQL")
+        answer = Answer(question, sql=sql, note=self.prompt_note(question) if self.prompt_note else "")
+        if self.rewrite is not None:
+            with timings.stage("rewrite"):
+                answer.sql = self.rewrite(answer.sql)
+        return answer
+
+    def execute(self, answer, job=None, timings=None):
+        """Run a resolved answer's SQL (unless a route already produced the frame) and summarize it"""
+        timings = StageTimings() if timings is None else timings
+        stats = StreamingStats() if self.summarize else None
+        if answer.frame is not None:
+            if stats is not None:
+                stats.update_frame(answer.frame)
+            return self._finish(answer, stats, timings, job)
+        try:
+            answer.frame = self.executor.execute(answer.sql, answer.params, job=job,
+                                                 timings=timings, stats=stats)
+        except QueryCancelled as e:
+            self._fail(answer, e.reason, job)
+        except GuardError as e:
+            answer.status, answer.error = "blocked", f"Blocked: {e}"
+        except Exception as e:
+            if job is not None and job.cancelled:
+                # The driver reports a cancelled statement as an ordinary error
+                self._fail(answer, job.reason, job)
+            else:
+                answer.status, answer.error = "error", str(e)
+        if answer.status in ("error", "blocked") and answer.route == "llm":
+            # Don't keep serving a translation that doesn't run
+            self.translator.discard(answer.question)
+        if not answer.ok:
+            return answer
+        if answer.route == "llm":
+            # Empty results are often a wrong filter, so only answers with rows become examples
+            self.translator.learn(answer.question, answer.sql, len(answer.frame))
+        return self._finish(answer, stats, timings, job)
+
+    @staticmethod
+    def _fail(answer, reason, job):
+        if reason == "timeout":
+            answer.status = "timeout"
+            answer.error = f"Query timed out after {job.deadline}s and was cancelled"
+        else:
+            answer.status, answer.error = "cancelled", "Query cancelled"
+
+    def _finish(self, answer, stats, timings, job):
+        if stats is None:
+            return answer
+        with timings.stage("describe"):
+            answer.summary = stats.to_frame()
+        if not len(answer.summary.columns) or not answer.truncated:
+            return answer
+        if not (self.pushdown and answer.sql):
+            answer.summary_note = f"Over the first {len(answer.frame):,} rows only"
+            return answer
+        try:
+            with timings.stage("summary_pushdown"):
+                total_rows, full = self.executor.summarize(
+                    answer.sql, list(answer.frame.columns), stats.numeric_columns, answer.params,
+                    job=job, quantiles=self.server_quantiles)
+        except Exception:
+            answer.summary_note = f"Over the first {len(answer.frame):,} rows only"
+            return answer
+        # Quartiles the server didn't compute come from the fetched rows
+        answer.summary = full.fillna(answer.summary)
+        answer.summary_note = f"Over all {total_rows:,} rows (computed by SQL Server)" + (
+            "" if self.server_quantiles else f"; quartiles estimated from the first {len(answer.frame):,} rows")
+        return answer
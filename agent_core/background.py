@@ -0,0 +1,53 @@
+"""Tiny helper for periodic background work"""
+import threading
+import time
+
+
+class PeriodicTask:
+    """Run a function on a daemon thread every `interval` seconds
+
+    Exceptions are caught and kept in last_error so a failing refresh never
+    kills the thread. trigger() wakes the thread for an immediate run.
+    """
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.runs = 0
+        self.last_run = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Ask the background thread to run as soon as possible"""
+        self._wake.set()
+
+    def run_once(self):
+        try:
+            self.func()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+        self.runs += 1
+        self.last_run = time.time()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            self.run_once()
@@ -0,0 +1,220 @@
+"""Answer a list of questions in one run: bounded LLM concurrency, parallel execution, one report
+
+Questions are read from JSONL, one object per line:
+
+    {"app": "library", "question": "Which books are most popular?"}
+    {"app": "boi", "name": "fdi_inflow", "sql": "SELECT ...", "params": ["2025"]}
+
+name is optional; items with sql skip translation. SQL resolution (routes
+and the LLM) runs on llm_concurrency threads and every resolved item is
+handed straight to a QueryRunner with query_concurrency workers, so
+queries start while later questions are still being translated.
+"""
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from agent_core.agent import Answer
+from agent_core.export import EXCEL_MAX_ROWS, EXPORT_FORMATS, encode_frame
+from agent_core.pipeline import StageTimings
+from agent_core.query_runner import QueryCancelled, QueryRunner
+
+# Excel limits sheet names to 31 characters
+SHEET_NAME_LENGTH = 31
+
+
+class BatchItem:
+    def __init__(self, app, question, name=None, sql=None, params=None):
+        self.app = app
+        self.question = question
+        self.name = name or question
+        self.sql = sql
+        self.params = params
+
+
+class BatchResult:
+    """One item's answer and where its time went
+
+    queued is the time a resolved item waited for a query worker.
+    """
+
+    def __init__(self, item, answer, timings, resolve_seconds, queued, execute_seconds, total):
+        self.item = item
+        self.answer = answer
+        self.timings = timings
+        self.resolve_seconds = resolve_seconds
+        self.queued = queued
+        self.execute_seconds = execute_seconds
+        self.total = total
+        self.path = None
+
+
+def load_items(path):
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                data = json.loads(line)
+                items.append(BatchItem(data["app"], data.get("question") or data.get("name", ""),
+                                       name=data.get("name"), sql=data.get("sql"),
+                                       params=data.get("params")))
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+    return items
+
+
+class BatchRunner:
+    """Answers BatchItems with the apps' AgentPipelines (pipelines maps app -> pipeline)"""
+
+    def __init__(self, pipelines, llm_concurrency=4, query_concurrency=8):
+        self.pipelines = pipelines
+        self.llm_concurrency = llm_concurrency
+        self.query_concurrency = query_concurrency
+
+    def run(self, items, on_result=None):
+        """Answer every item; on_result(result) is called as each one finishes"""
+        runner = QueryRunner(max_workers=self.query_concurrency)
+        results = [None] * len(items)
+        pending = threading.Semaphore(0)
+        lock = threading.Lock()
+        started = time.monotonic()
+
+        def finish(index, result):
+            with lock:
+                if results[index] is not None:
+                    return
+                results[index] = result
+            if on_result is not None:
+                on_result(result)
+            pending.release()
+
+        def resolve(index, item):
+            timings = StageTimings()
+            resolve_start = time.monotonic()
+            try:
+                self._submit(runner, index, item, timings, resolve_start, started, finish)
+            except Exception as e:
+                # Whatever went wrong, the item must finish or run() waits for it forever
+                end = time.monotonic()
+                finish(index, BatchResult(item, Answer(item.question, status="error", error=str(e)), timings,
+                                          end - resolve_start, 0.0, 0.0, end - started))
+
+        with ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix="batch-llm") as llm:
+            for index, item in enumerate(items):
+                llm.submit(resolve, index, item)
+        for _ in items:
+            pending.acquire()
+        return results
+
+    def _submit(self, runner, index, item, timings, resolve_start, started, finish):
+        """Resolve an item's SQL and queue it on runner, or finish it when it has none"""
+        pipeline = self.pipelines[item.app]
+        if item.sql:
+            answer = Answer(item.question, route="report", sql=item.sql, params=item.params)
+        else:
+            answer = pipeline.resolve(item.question, timings)
+        resolved = time.monotonic()
+        if not answer.ok:
+            finish(index, BatchResult(item, answer, timings, resolved - resolve_start, 0.0, 0.0,
+                                      resolved - started))
+            return
+
+        def execute(job):
+            execute_start = time.monotonic()
+            done = pipeline.execute(answer, job, timings)
+            end = time.monotonic()
+            finish(index, BatchResult(item, done, timings, resolved - resolve_start,
+                                      execute_start - resolved, end - execute_start, end - started))
+
+        job = runner.submit(execute, deadline=pipeline.deadline)
+        job.future.add_done_callback(lambda future: self._failed(future, index, item, answer, timings,
+                                                                 resolved - resolve_start, started, finish))
+
+    @staticmethod
+    def _failed(future, index, item, answer, timings, resolve_seconds, started, finish):
+        """Report a job that failed outside execute() (cancelled or timed out while queued)"""
+        error = future.exception()
+        if error is None:
+            return
+        if isinstance(error, QueryCancelled):
+            answer.status = "timeout" if error.reason == "timeout" else "cancelled"
+        else:
+            answer.status = "error"
+        answer.error = str(error)
+        finish(index, BatchResult(item, answer, timings, resolve_seconds, 0.0, 0.0,
+                                  time.monotonic() - started))
+
+
+def timing_summary(results):
+    """One row per item: outcome, rows and seconds per phase and stage"""
+    rows = []
+    for number, result in enumerate(results, 1):
+        answer, timings = result.answer, result.timings
+        rows.append({
+            "#": number,
+            "app": result.item.app,
+            "name": result.item.name,
+            "route": answer.route,
+            "status": answer.status,
+            "rows": len(answer.frame) if answer.frame is not None else 0,
+            "truncated": answer.truncated,
+            "resolve s": round(result.resolve_seconds, 3),
+            "llm s": round(timings.get("llm", 0.0), 3),
+            "queued s": round(result.queued, 3),
+            "execute s": round(result.execute_seconds, 3),
+            "db s": round(timings.get("db_execute", 0.0) + timings.get("fetch", 0.0), 3),
+            "finished at s": round(result.total, 3),
+            "file": result.path or "",
+            "error": answer.error or "",
+        })
+    return pd.DataFrame(rows)
+
+
+def _slug(text, length=40):
+    return re.sub(r"[^\w]+", "_", text).strip("_")[:length] or "result"
+
+
+def _sheet_names(results):
+    names, seen = [], set()
+    for number, result in enumerate(results, 1):
+        name = f"{number:02d} {_slug(result.item.name)}"[:SHEET_NAME_LENGTH]
+        while name in seen:
+            name = name[:SHEET_NAME_LENGTH - 1] + "_"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def write_outputs(results, directory, fmt="parquet"):
+    """One file per successful result plus report.xlsx (summary sheet, then one sheet per result)
+
+    Returns the report path. Sheets stop at Excel's row limit; the per-result
+    files always hold every fetched row.
+    """
+    os.makedirs(directory, exist_ok=True)
+    extension = EXPORT_FORMATS[fmt].extension
+    for number, result in enumerate(results, 1):
+        if result.answer.ok and result.answer.frame is not None:
+            result.path = os.path.join(directory, f"{number:02d}_{_slug(result.item.name)}.{extension}")
+            with open(result.path, "wb") as f:
+                f.write(encode_frame(result.answer.frame, fmt))
+    summary = timing_summary(results)
+    report = os.path.join(directory, "report.xlsx")
+    with pd.ExcelWriter(report, engine="openpyxl") as writer:
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+        for result, sheet in zip(results, _sheet_names(results)):
+            answer = result.answer
+            if not answer.ok or answer.frame is None:
+                continue
+            header = pd.DataFrame({"": [answer.question, answer.sql or answer.note]})
+            header.to_excel(writer, sheet_name=sheet, index=False, header=False)
+            answer.frame.head(EXCEL_MAX_ROWS - 3).to_excel(writer, sheet_name=sheet, index=False, startrow=3)
+    return report
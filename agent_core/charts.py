@@ -0,0 +1,163 @@
+"""Plotly figure builders used by the apps (no Streamlit calls, so they can be benchmarked)
+
+Large results are reduced server-side before they reach Plotly: bars keep
+the top categories plus an "Other" bar, time series are downsampled with
+LTTB and big scatters switch to WebGL or, beyond that, a binned heatmap.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+FINANCIAL_KEYWORDS = ['INVESTMENT', 'EXPORT', 'VALUE', 'AMOUNT', 'EQUITY', 'LOAN']
+
+# Above these sizes the data is aggregated or downsampled before plotting
+MAX_BAR_CATEGORIES = 25
+MAX_LINE_POINTS = 2000
+WEBGL_SCATTER_POINTS = 2000
+MAX_SCATTER_POINTS = 50_000
+HEATMAP_BINS = 60
+OTHER_LABEL = "Other"
+
+
+def top_n_with_other(df, category, value, n=MAX_BAR_CATEGORIES):
+    """Sum value per category, keep the n-1 largest and fold the rest into "Other" """
+    totals = df.groupby(category, sort=False, dropna=False)[value].sum().sort_values(ascending=False)
+    if len(totals) > n:
+        rest = totals.iloc[n - 1:].sum()
+        totals = pd.concat([totals.iloc[:n - 1], pd.Series({OTHER_LABEL: rest})])
+    return totals.rename_axis(category).reset_index(name=value)
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of threshold points that keep the line's shape
+
+    x must be sorted ascending and numeric.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # First and last points are always kept; the rest is split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the next bucket is the third triangle corner
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                       - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def _line(df, x, y, title):
+    data = df[[x, y]].dropna().sort_values(x)
+    if len(data) > MAX_LINE_POINTS:
+        numeric_x = data[x].astype("int64") if pd.api.types.is_datetime64_any_dtype(data[x]) else data[x]
+        data = data.iloc[lttb_indices(numeric_x.to_numpy(), data[y].to_numpy(), MAX_LINE_POINTS)]
+        title = f"{title} (downsampled to {MAX_LINE_POINTS:,} points)"
+    return px.line(data, x=x, y=y, title=title)
+
+
+def _scatter(df, x, y, title):
+    if len(df) > MAX_SCATTER_POINTS:
+        # Too many points to ship to the browser: show where they are instead
+        return px.density_heatmap(df, x=x, y=y, nbinsx=HEATMAP_BINS, nbinsy=HEATMAP_BINS,
+                                  title=f"{title} ({len(df):,} points, binned)")
+    render_mode = "webgl" if len(df) > WEBGL_SCATTER_POINTS else "svg"
+    return px.scatter(df, x=x, y=y, title=title, render_mode=render_mode)
+
+
+def category_chart(df, title):
+    """Bar chart for category/number results, line for time series, scatter for two numbers, else None"""
+    if df is None or df.empty:
+        return None
+
+    # Simple heuristics for chart type selection
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    categorical_cols = df.select_dtypes(include=['object', 'string']).columns.tolist()
+    datetime_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns.tolist()
+
+    if len(numeric_cols) >= 1 and len(categorical_cols) >= 1:
+        # Bar chart
+        category, value = categorical_cols[0], numeric_cols[0]
+        if len(df) > MAX_BAR_CATEGORIES:
+            return px.bar(top_n_with_other(df, category, value), x=category, y=value,
+                          title=f"{title} (top {MAX_BAR_CATEGORIES - 1} + {OTHER_LABEL})")
+        return px.bar(df, x=category, y=value, title=title)
+    elif len(numeric_cols) >= 1 and len(datetime_cols) >= 1:
+        # Line chart over time
+        return _line(df, datetime_cols[0], numeric_cols[0], title)
+    elif len(numeric_cols) >= 2:
+        # Scatter plot
+        return _scatter(df, numeric_cols[0], numeric_cols[1], title)
+
+    return None
+
+
+def financial_charts(df):
+    """Bar (and scatter) figures for results with investment/export style columns"""
+    if df is None or df.empty:
+        return []
+
+    # Check for common financial columns
+    financial_cols = [col for col in df.columns
+                      if any(keyword in col.upper() for keyword in FINANCIAL_KEYWORDS)]
+    if not financial_cols or len(df) <= 1:
+        return []
+
+    figures = []
+    # Bar chart for financial data (largest 19 + Other when there are more than 20 rows)
+    category, value = df.columns[0], financial_cols[0]
+    bars = df
+    if len(df) > 20 and category != value and pd.api.types.is_numeric_dtype(df[value]):
+        bars = top_n_with_other(df, category, value, n=20)
+    fig = px.bar(bars.head(20), y=category, x=value, title=f"{value} by {category}")
+    fig.update_layout(height=400)
+    figures.append(fig)
+    if len(financial_cols) >= 2:
+        # Scatter plot for two financial columns
+        fig = _scatter(df, financial_cols[0], financial_cols[1],
+                       f"{financial_cols[1]} vs {financial_cols[0]}")
+        fig.update_layout(height=400)
+        figures.append(fig)
+    return figures
+
+
+class FigureCache:
+    """Built figures per (result key, chart) so history reruns don't rebuild them"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Cached figure(s) for key, calling build() on a miss (None results are cached too)"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        figure = build()
+        with self._lock:
+            self._entries[key] = figure
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return figure
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,139 @@
+"""Columnar conversion of DB-API rows into typed pandas columns"""
+import datetime
+import decimal
+
+import numpy as np
+import pandas as pd
+
+
+def _kind_for(type_code):
+    """Map a cursor.description type code (a Python type for pyodbc) to a column kind"""
+    if type_code is bool:
+        return "bool"
+    if type_code is int:
+        return "int"
+    if type_code is float:
+        return "float"
+    if type_code is decimal.Decimal:
+        return "decimal"
+    if type_code is datetime.datetime:
+        return "datetime"
+    if type_code is datetime.date:
+        return "date"
+    if type_code is str:
+        return "str"
+    if type_code is None:
+        # Drivers without type info (e.g. sqlite3) - decide from the data
+        return "infer"
+    return "object"
+
+
+def _nullable(values, dtype, fill):
+    n = len(values)
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=n)
+    data = np.fromiter((fill if v is None else v for v in values), dtype=dtype, count=n)
+    return data, mask
+
+
+def _convert(values, kind):
+    """Convert one batch of a column; returns a chunk for ColumnBuilder"""
+    if kind == "int":
+        return _nullable(values, np.int64, 0)
+    if kind == "bool":
+        return _nullable(values, np.bool_, False)
+    if kind == "float":
+        return np.array(values, dtype=np.float64)
+    if kind == "decimal":
+        return np.fromiter((np.nan if v is None else float(v) for v in values),
+                           dtype=np.float64, count=len(values))
+    if kind == "datetime":
+        return np.array(values, dtype="datetime64[us]")
+    if kind == "date":
+        return np.array(values, dtype="datetime64[s]")
+    return np.array(values, dtype=object)
+
+
+class ColumnBuilder:
+    """Accumulate fetched batches as typed column chunks
+
+    Each batch of row tuples is transposed and converted straight into
+    NumPy buffers (nullable ints/bools keep a separate mask), so the row
+    tuples can be dropped right away and pandas never has to re-infer
+    dtypes from object columns. Decimals become float64 and dates become
+    datetime64.
+    """
+
+    def __init__(self, description):
+        self.columns = [column[0] for column in description]
+        self.kinds = [_kind_for(column[1]) for column in description]
+        self.row_count = 0
+        self._chunks = [[] for _ in self.columns]
+
+    def append(self, rows):
+        if not rows:
+            return
+        for i, values in enumerate(zip(*rows)):
+            kind = self.kinds[i]
+            if kind == "infer":
+                self._chunks[i].append(np.array(values, dtype=object))
+                continue
+            try:
+                self._chunks[i].append(_convert(values, kind))
+            except (TypeError, ValueError, OverflowError):
+                # Unexpected values for the declared type: fall back to object
+                self._demote(i)
+                self._chunks[i].append(np.array(values, dtype=object))
+        self.row_count += len(rows)
+
+    def to_frame(self):
+        data = {i: self._column(i) for i in range(len(self.columns))}
+        df = pd.DataFrame(data, index=pd.RangeIndex(self.row_count))
+        df.columns = self.columns
+        return df
+
+    def _demote(self, i):
+        chunks = []
+        for chunk in self._chunks[i]:
+            if isinstance(chunk, tuple):
+                data, mask = chunk
+                chunk = data.astype(object)
+                chunk[mask] = None
+            else:
+                chunk = chunk.astype(object)
+            chunks.append(chunk)
+        self._chunks[i] = chunks
+        self.kinds[i] = "object"
+
+    def _column(self, i):
+        kind = self.kinds[i]
+        chunks = self._chunks[i]
+        if kind in ("int", "bool"):
+            dtype = np.int64 if kind == "int" else np.bool_
+            if not chunks:
+                return np.array([], dtype=dtype)
+            data = np.concatenate([c[0] for c in chunks])
+            mask = np.concatenate([c[1] for c in chunks])
+            if not mask.any():
+                return data
+            if kind == "int":
+                return pd.arrays.IntegerArray(data, mask)
+            return pd.arrays.BooleanArray(data, mask)
+        if not chunks:
+            empty_dtypes = {
+                "float": np.float64,
+                "decimal": np.float64,
+                "datetime": "datetime64[us]",
+                "date": "datetime64[s]",
+            }
+            return np.array([], dtype=empty_dtypes.get(kind, object))
+        values = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+        if kind == "infer":
+            return pd.Series(values).infer_objects().array
+        return values
+
+
+def frame_from_cursor_rows(description, rows):
+    """Convenience wrapper for already-fetched rows"""
+    builder = ColumnBuilder(description)
+    builder.append(rows)
+    return builder.to_frame()
@@ -0,0 +1,164 @@
+"""Few-shot examples: question -> SQL pairs that ran successfully, retrieved by similarity"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from agent_core.sql_cache import normalize_question
+
+STOPWORDS = {
+    "the", "a", "an", "of", "in", "for", "by", "to", "and", "or", "show", "me", "list",
+    "all", "what", "which", "how", "is", "are", "with", "from", "on", "per", "give",
+    "get", "find", "please", "s", "do", "does", "i", "we", "our",
+}
+
+
+def default_terms(question):
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", question.lower()):
+        if word in STOPWORDS:
+            continue
+        for suffix in ("ing", "ies", "es", "s", "ed"):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+                break
+        terms.append(word)
+    return terms
+
+
+def format_examples(examples):
+    """Prompt text for (question, sql) pairs, appended to the schema block ("" for none)"""
+    if not examples:
+        return ""
+    lines = ["", "", "Examples of questions answered correctly on this database:"]
+    for question, sql in examples:
+        lines += ["", f"Question: {question}", f"SQL Query: {sql}"]
+    return "\n".join(lines)
+
+
+class ExampleStore:
+    """Thread-safe store of question -> SQL pairs with a BM25 index, persisted to a JSON file
+
+    add() is called once a translation has run and returned rows, remove()
+    when it later fails. nearest() returns the most similar stored pairs to
+    show the model how questions map onto the real column names. terms is
+    the tokenizer (e.g. with domain synonyms); the least-recently-used pairs
+    go first once max_entries is reached.
+    """
+
+    def __init__(self, path, terms=None, max_entries=2000, min_score=0.5):
+        self.path = path
+        self.terms = terms or default_terms
+        self.max_entries = max_entries
+        self.min_score = min_score
+        self.lookups = 0
+        self.served = 0
+        self._entries = OrderedDict()
+        self._docs = {}
+        self._postings = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def add(self, question, sql):
+        """Remember a pair that ran; the question's previous SQL is replaced"""
+        if not sql:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["sql"] == sql:
+                entry["uses"] += 1
+                self._entries.move_to_end(key)
+                return
+            self._drop(key)
+            self._insert(key, {"question": question, "sql": sql, "created": time.time(), "uses": 1})
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._save()
+
+    def remove(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            if self._drop(key):
+                self._save()
+
+    def nearest(self, question, k=3):
+        """Up to k (question, sql) pairs most similar to the question, best first"""
+        terms = set(self.terms(question))
+        with self._lock:
+            self.lookups += 1
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            k1, b = 1.2, 0.75
+            avg_length = self._total_length / n
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term, ())
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key in postings:
+                    doc = self._docs[key]
+                    tf = doc[term]
+                    length = sum(doc.values())
+                    scores[key] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+            best = [key for key, score in scores.most_common(k) if score >= self.min_score]
+            if best:
+                self.served += 1
+            return [(self._entries[key]["question"], self._entries[key]["sql"]) for key in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "served": self.served,
+                "serve_rate": self.served / self.lookups if self.lookups else 0.0,
+            }
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        doc = Counter(self.terms(entry["question"]))
+        self._docs[key] = doc
+        self._total_length += sum(doc.values())
+        for term in doc:
+            self._postings.setdefault(term, set()).add(key)
+
+    def _drop(self, key):
+        if self._entries.pop(key, None) is None:
+            return False
+        doc = self._docs.pop(key)
+        self._total_length -= sum(doc.values())
+        for term in doc:
+            postings = self._postings[term]
+            postings.discard(key)
+            if not postings:
+                del self._postings[term]
+        return True
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in data.get("entries", [])[-self.max_entries:]:
+            self._insert(key, entry)
+
+    def _save(self):
+        # Write to a temp file first so a crash never leaves a truncated store
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": list(self._entries.items())}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
@@ -0,0 +1,178 @@
+"""On-demand CSV/Parquet/Excel exports, cached per result, and streaming exports from a cursor"""
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from agent_core.columnar import frame_from_cursor_rows
+from agent_core.fetch import DEFAULT_BATCH_SIZE, stream_to_csv
+
+ExportFormat = namedtuple("ExportFormat", "label extension mime")
+
+EXPORT_FORMATS = {
+    "csv": ExportFormat("CSV", "csv", "text/csv"),
+    "parquet": ExportFormat("Parquet", "parquet", "application/vnd.apache.parquet"),
+    "xlsx": ExportFormat("Excel", "xlsx",
+                         "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Rows per worksheet, leaving one for the header
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def format_for_path(path):
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: .{extension}")
+    return extension
+
+
+def _arrow_table(df, schema=None):
+    """Arrow table for a frame; object columns Arrow can't type are written as text"""
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        text = {column: df[column].map(lambda v: None if v is None else str(v))
+                for column in df.columns if df[column].dtype == object}
+        table = pa.Table.from_pandas(df.assign(**text), preserve_index=False)
+    if schema is not None:
+        table = table.cast(schema)
+    return table
+
+
+def encode_frame(df, fmt):
+    """Encode a result frame as bytes for a download"""
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    buffer = io.BytesIO()
+    if fmt == "parquet":
+        pq.write_table(_arrow_table(df), buffer, compression="zstd")
+    elif fmt == "xlsx":
+        if len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS:,} rows - use CSV or Parquet")
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return buffer.getvalue()
+
+
+class ExportCache:
+    """Encoded downloads keyed by (result key, format), LRU under a byte budget
+
+    Nothing is encoded until a user asks for a format, and the bytes are then
+    reused on every rerun instead of re-encoding the frame.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, fmt, df):
+        with self._lock:
+            data = self._entries.get((key, fmt))
+            if data is not None:
+                self._entries.move_to_end((key, fmt))
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = encode_frame(df, fmt)
+        if len(data) > self.max_bytes // 4:
+            return data
+        with self._lock:
+            if (key, fmt) not in self._entries:
+                self._entries[(key, fmt)] = data
+                self._bytes += len(data)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+def stream_to_parquet(cursor, path, batch_size=DEFAULT_BATCH_SIZE):
+    """Write the rest of the cursor to a Parquet file, one row group per batch"""
+    writer = None
+    written = 0
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch and writer is not None:
+                break
+            frame = frame_from_cursor_rows(cursor.description, batch)
+            if writer is None:
+                # The first batch fixes the schema; columns that are all NULL there become text
+                schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in _arrow_table(frame).schema])
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            if not batch:
+                break
+            writer.write_table(_arrow_table(frame, writer.schema))
+            written += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def stream_to_excel(cursor, path, batch_size=DEFAULT_BATCH_SIZE):
+    """Write the rest of the cursor to an .xlsx file, continuing on a new sheet every EXCEL_MAX_ROWS"""
+    workbook = Workbook(write_only=True)
+    header = [column[0] for column in cursor.description]
+    sheet, sheet_rows, written = None, EXCEL_MAX_ROWS, 0
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        for row in batch:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Result {len(workbook.worksheets) + 1}")
+                sheet.append(header)
+                sheet_rows = 0
+            sheet.append(list(row))
+            sheet_rows += 1
+        written += len(batch)
+    if sheet is None:
+        workbook.create_sheet("Result 1").append(header)
+    workbook.save(path)
+    return written
+
+
+def stream_query_to_file(db_pool, sql, path, batch_size=DEFAULT_BATCH_SIZE, params=None):
+    """Run a query and stream its full result to a CSV/Parquet/Excel file (by extension)
+
+    Rows go from the cursor to the file batch by batch - the complete result
+    is never held in memory. Returns the row count.
+    """
+    fmt = format_for_path(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            if fmt == "parquet":
+                return stream_to_parquet(cursor, path, batch_size)
+            if fmt == "xlsx":
+                return stream_to_excel(cursor, path, batch_size)
+            columns = [column[0] for column in cursor.description]
+            return stream_to_csv(cursor, path, columns, batch_size=batch_size)
+        finally:
+            cursor.close()
@@ -0,0 +1,120 @@
+"""Bounded-memory result fetching built on cursor.fetchmany"""
+import csv
+import os
+
+from agent_core.columnar import ColumnBuilder
+
+
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_MAX_ROWS = 50_000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+
+def estimate_row_bytes(row):
+    """Rough Python memory cost of a fetched row"""
+    size = 64
+    for value in row:
+        if isinstance(value, (str, bytes)):
+            size += 49 + len(value)
+        else:
+            size += 32
+    return size
+
+
+class FetchResult:
+    """Frame kept in memory plus what happened to the rest of the result"""
+
+    def __init__(self, columns, frame, truncated, approx_bytes, spill_path=None, spilled_rows=0):
+        self.columns = columns
+        self.frame = frame
+        self.truncated = truncated
+        self.approx_bytes = approx_bytes
+        self.spill_path = spill_path
+        self.spilled_rows = spilled_rows
+
+
+def fetch_bounded(cursor, max_rows=DEFAULT_MAX_ROWS, max_bytes=DEFAULT_MAX_BYTES,
+                  batch_size=DEFAULT_BATCH_SIZE, spill_path=None, timings=None, stats=None):
+    """Fetch an executed cursor in batches until the row or byte budget is hit
+
+    Batches are converted to typed columns as they arrive (see
+    ColumnBuilder), so row tuples never pile up. Once a budget is exhausted
+    fetching stops and the result is flagged truncated. When spill_path is
+    given the complete result (kept rows included) is streamed to that CSV
+    file instead, batch by batch, so memory stays flat no matter how large
+    the result is. timings (a pipeline.StageTimings) gets a frame_build stage
+    and stats (a stats.StreamingStats) is updated with every kept batch.
+    """
+    builder = ColumnBuilder(cursor.description)
+    columns = builder.columns
+    approx_bytes = 0
+    leftover = []
+    truncated = False
+
+    while not truncated:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        keep = len(batch)
+        for i, row in enumerate(batch):
+            if builder.row_count + i >= max_rows or approx_bytes >= max_bytes:
+                truncated = True
+                keep = i
+                leftover = batch[i:]
+                break
+            approx_bytes += estimate_row_bytes(row)
+        builder.append(batch[:keep])
+        if stats is not None:
+            stats.update_rows(cursor.description, batch[:keep])
+
+    if timings is not None:
+        with timings.stage("frame_build", columns=len(columns)):
+            frame = builder.to_frame()
+    else:
+        frame = builder.to_frame()
+    if not truncated or spill_path is None:
+        return FetchResult(columns, frame, truncated, approx_bytes)
+
+    spilled = stream_to_csv(cursor, spill_path, columns, prefix_frame=frame,
+                            prefix_rows=leftover, batch_size=batch_size)
+    return FetchResult(columns, frame, truncated, approx_bytes,
+                       spill_path=spill_path, spilled_rows=spilled)
+
+
+def stream_to_csv(cursor, path, columns, prefix_frame=None, prefix_rows=(),
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """Write already-fetched data and the rest of the cursor to a CSV file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        if prefix_frame is not None:
+            prefix_frame.to_csv(f, header=False, index=False)
+            written += len(prefix_frame)
+        writer.writerows(prefix_rows)
+        written += len(prefix_rows)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
+def stream_query_to_csv(db_pool, sql, path, batch_size=DEFAULT_BATCH_SIZE, params=None):
+    """Run a query and stream its full result to disk; returns the row count"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            columns = [column[0] for column in cursor.description]
+            return stream_to_csv(cursor, path, columns, batch_size=batch_size)
+        finally:
+            cursor.close()
@@ -0,0 +1,170 @@
+"""Chat history result frames kept under a memory budget and spilled to disk"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+from agent_core.result_cache import frame_nbytes
+
+
+class HistoryStore:
+    """Result DataFrames for chat messages, shared by all sessions
+
+    Every frame is written once to a compressed Parquet file when it is added
+    (pickle+gzip when Parquet can't hold its columns), so evicting it from
+    memory is just dropping the reference. Frames live in memory in LRU order
+    under a per-session and a global byte budget; an evicted frame is read back
+    from disk the next time its message is expanded. Sessions idle for longer
+    than session_ttl are removed together with their files.
+    """
+
+    def __init__(self, directory, session_budget=64 * 1024 * 1024,
+                 global_budget=512 * 1024 * 1024, session_ttl=24 * 3600):
+        self.directory = directory
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.session_ttl = session_ttl
+        self.spills = 0
+        self.loads = 0
+        self._index = {}
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._session_bytes = {}
+        self._session_seen = {}
+        self._lock = threading.Lock()
+        # Files left behind by a previous process are unreachable
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, session, df):
+        """Store a result frame and return the key to keep in the chat message"""
+        key = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.directory, session), exist_ok=True)
+        path = self._write(os.path.join(self.directory, session, key), df)
+        with self._lock:
+            self._index[key] = {"session": session, "path": path, "size": frame_nbytes(df),
+                                "attrs": dict(df.attrs)}
+            self._session_seen[session] = time.time()
+            self._admit(key, df)
+        self._expire()
+        return key
+
+    def get(self, key):
+        """The frame for a key, read back from disk if it was evicted; None if gone"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._session_seen[entry["session"]] = time.time()
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        try:
+            if entry["path"].endswith(".parquet"):
+                df = pd.read_parquet(entry["path"])
+            else:
+                df = pd.read_pickle(entry["path"], compression="gzip")
+        except (OSError, ValueError):
+            return None
+        df.attrs.update(entry["attrs"])
+        with self._lock:
+            if key in self._index:
+                self.loads += 1
+                self._admit(key, df)
+        return df
+
+    def in_memory(self, key):
+        with self._lock:
+            return key in self._memory
+
+    def discard(self, keys):
+        """Forget messages trimmed from a session's history"""
+        with self._lock:
+            entries = [self._remove(key) for key in keys]
+        for entry in entries:
+            if entry is not None:
+                _unlink(entry["path"])
+
+    def drop_session(self, session):
+        with self._lock:
+            for key in [k for k, e in self._index.items() if e["session"] == session]:
+                self._remove(key)
+            self._session_bytes.pop(session, None)
+            self._session_seen.pop(session, None)
+        shutil.rmtree(os.path.join(self.directory, session), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._session_seen),
+                "results": len(self._index),
+                "in_memory": len(self._memory),
+                "bytes": self._bytes,
+                "spills": self.spills,
+                "loads": self.loads,
+            }
+
+    def _admit(self, key, df):
+        """Put a frame in memory, then evict LRU frames until both budgets hold"""
+        entry = self._index[key]
+        session, size = entry["session"], entry["size"]
+        if key not in self._memory:
+            self._memory[key] = df
+            self._bytes += size
+            self._session_bytes[session] = self._session_bytes.get(session, 0) + size
+        self._memory.move_to_end(key)
+        while self._session_bytes[session] > self.session_budget:
+            victim = next((k for k in self._memory if self._index[k]["session"] == session), None)
+            if victim is None or victim == key:
+                break
+            self._evict(victim)
+        while self._bytes > self.global_budget and len(self._memory) > 1:
+            victim = next(iter(self._memory))
+            if victim == key:
+                break
+            self._evict(victim)
+
+    def _evict(self, key):
+        self._release(key)
+        self.spills += 1
+
+    def _release(self, key):
+        self._memory.pop(key)
+        entry = self._index[key]
+        self._bytes -= entry["size"]
+        self._session_bytes[entry["session"]] -= entry["size"]
+
+    def _remove(self, key):
+        if key not in self._index:
+            return None
+        if key in self._memory:
+            self._release(key)
+        return self._index.pop(key)
+
+    def _expire(self):
+        cutoff = time.time() - self.session_ttl
+        with self._lock:
+            idle = [s for s, seen in self._session_seen.items() if seen < cutoff]
+        for session in idle:
+            self.drop_session(session)
+
+    def _write(self, stem, df):
+        try:
+            df.to_parquet(stem + ".parquet", compression="zstd", index=False)
+            return stem + ".parquet"
+        except Exception:
+            # No pyarrow, or object columns Arrow can't type (mixed values)
+            _unlink(stem + ".parquet")
+            df.to_pickle(stem + ".pkl.gz", compression="gzip")
+            return stem + ".pkl.gz"
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
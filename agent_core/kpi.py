@@ -0,0 +1,74 @@
+"""Background-refreshed snapshot of dashboard KPIs"""
+import threading
+import time
+
+from agent_core.background import PeriodicTask
+
+
+class KpiSnapshot:
+    """Headline metrics computed by one batched query on a schedule
+
+    Streamlit reruns only read the in-memory snapshot, so dashboard
+    database load depends on the refresh interval rather than on how many
+    users are clicking around.
+    """
+
+    def __init__(self, db_pool, sql, interval=60):
+        self.db_pool = db_pool
+        self.sql = sql
+        self._values = None
+        self._taken_at = None
+        self._lock = threading.Lock()
+        self._task = PeriodicTask("kpi-snapshot", self.refresh, interval)
+        # Load synchronously once so the first page render has numbers
+        self._task.run_once()
+        self._task.start()
+
+    def refresh(self):
+        """Run the KPI query and replace the snapshot"""
+        with self.db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql)
+            columns = [column[0] for column in cursor.description]
+            row = cursor.fetchone()
+            cursor.close()
+        values = dict(zip(columns, row)) if row is not None else {}
+        with self._lock:
+            self._values = values
+            self._taken_at = time.time()
+
+    def refresh_now(self):
+        """Schedule an immediate background refresh"""
+        self._task.trigger()
+
+    def get(self, name, default=None):
+        with self._lock:
+            if not self._values:
+                return default
+            value = self._values.get(name)
+        return default if value is None else value
+
+    @property
+    def available(self):
+        with self._lock:
+            return self._values is not None
+
+    @property
+    def age_seconds(self):
+        with self._lock:
+            if self._taken_at is None:
+                return None
+            return time.time() - self._taken_at
+
+    @property
+    def last_error(self):
+        return self._task.last_error
+
+    def describe_age(self):
+        """Human-friendly snapshot age, e.g. 'updated 12s ago'"""
+        age = self.age_seconds
+        if age is None:
+            return "not loaded yet"
+        if age < 60:
+            return f"updated {age:.0f}s ago"
+        return f"updated {age / 60:.0f} min ago"
@@ -0,0 +1,208 @@
+"""Async, streaming SQL generation client with deadlines, retries and hedging"""
+import asyncio
+import random
+import re
+import threading
+import time
+
+from openai import AsyncOpenAI
+
+
+_FENCED_SQL = re.compile(r"```(?:sql|tsql)?\s*(.*?)```", re.IGNORECASE | re.DOTALL)
+
+
+def extract_sql(text):
+    """Pull the SQL out of a model answer (fenced block or bare text)"""
+    text = text.strip()
+    match = _FENCED_SQL.search(text)
+    if match:
+        return match.group(1).strip()
+    if text.startswith("```sql"):
+        text = text[6:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def approx_tokens(text):
+    """Rough token count (~4 characters per token) for prompts and answers"""
+    return len(text or "") // 4
+
+
+class SQLStreamDetector:
+    """Accumulate streamed tokens and notice when the SQL is complete
+
+    Models usually wrap the query in a ```sql fence and sometimes add an
+    explanation afterwards; we stop reading as soon as the fence closes
+    (or a statement-ending semicolon is followed by a blank line) so the
+    query can run without waiting for the rest of the answer.
+    """
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, delta):
+        self.text += delta
+        stripped = self.text.lstrip()
+        if stripped.startswith("```"):
+            return stripped.count("```") >= 2
+        end = re.search(r";\s*\n\s*\n", stripped)
+        if end is None:
+            return False
+        # Drop whatever prose followed the statement
+        self.text = stripped[:end.start() + 1]
+        return True
+
+
+class SQLGenerator:
+    """Generate SQL through an OpenAI-compatible endpoint (OpenRouter by default)
+
+    - every call streams tokens and returns once the SQL is complete
+    - a per-call deadline bounds the total time spent, retries included
+    - failed attempts are retried with jittered exponential backoff
+    - if the primary model hasn't answered after hedge_after seconds, the
+      same prompt is also sent to the fallback model and the first good
+      answer wins
+
+    The endpoint is configurable, so the whole layer can be exercised
+    against agent_core.llm_stub.StubLLMServer.
+    """
+
+    def __init__(self, base_url, api_key, model, fallback_model=None, temperature=0.1,
+                 deadline=45, hedge_after=8, max_retries=2, backoff=0.5):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.fallback_model = fallback_model
+        self.temperature = temperature
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "early_stops": 0,
+            "latency_total": 0.0,
+            "first_token_total": 0.0,
+            "first_tokens": 0,
+        }
+
+    def generate(self, prompt, question=None):
+        """Blocking wrapper for Streamlit scripts; returns (sql, model)
+
+        question is only used by router.ModelRouter, which stands in for this class.
+        """
+        return asyncio.run(self.agenerate(prompt))
+
+    async def agenerate(self, prompt):
+        """Generate SQL for a prompt within the deadline; returns (sql, model)"""
+        start = time.monotonic()
+        self._count("calls")
+        client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key,
+                             max_retries=0, timeout=self.deadline)
+        try:
+            result = await asyncio.wait_for(self._hedged(client, prompt), self.deadline)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            self._count("failures")
+            raise TimeoutError(f"No SQL from the model within {self.deadline}s")
+        except Exception:
+            self._count("failures")
+            raise
+        finally:
+            await client.close()
+        self._count("latency_total", time.monotonic() - start)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        succeeded = stats["calls"] - stats["failures"]
+        stats["avg_latency"] = stats["latency_total"] / succeeded if succeeded else 0.0
+        stats["avg_first_token"] = (
+            stats["first_token_total"] / stats["first_tokens"] if stats["first_tokens"] else 0.0
+        )
+        return stats
+
+    async def _hedged(self, client, prompt):
+        primary = asyncio.create_task(self._with_retries(client, self.model, prompt))
+        if not self.fallback_model:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            if primary.exception() is None:
+                return primary.result()
+            # Primary failed outright - go straight to the fallback
+            return await self._with_retries(client, self.fallback_model, prompt)
+
+        self._count("hedges")
+        hedge = asyncio.create_task(self._with_retries(client, self.fallback_model, prompt))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _with_retries(self, client, model, prompt):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._stream_sql(client, model, prompt)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    async def _stream_sql(self, client, model, prompt):
+        start = time.monotonic()
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.temperature,
+            stream=True,
+        )
+        detector = SQLStreamDetector()
+        first_token = True
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                if first_token and chunk.choices[0].delta.content:
+                    first_token = False
+                    self._count("first_tokens")
+                    self._count("first_token_total", time.monotonic() - start)
+                if detector.feed(chunk.choices[0].delta.content or ""):
+                    self._count("early_stops")
+                    break
+        finally:
+            await stream.close()
+
+        sql = extract_sql(detector.text)
+        if not sql:
+            raise ValueError(f"{model} returned an empty answer")
+        return sql, model
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
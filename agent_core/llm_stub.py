@@ -0,0 +1,134 @@
+"""Local OpenAI-compatible stub server for exercising the LLM layer offline"""
+import asyncio
+import json
+import threading
+import time
+
+
+class StubLLMServer:
+    """Minimal /chat/completions endpoint that streams canned answers
+
+    responses maps a substring of the prompt to the answer text (the first
+    match wins, "" is a catch-all). latency maps a model name to the delay
+    in seconds before the first token; failures maps a model name to the
+    number of requests to fail with HTTP 500 before answering normally.
+    Runs its own event loop on a daemon thread.
+    """
+
+    def __init__(self, responses, latency=None, failures=None, chunk_size=16,
+                 host="127.0.0.1", port=0):
+        self.responses = responses
+        self.latency = latency or {}
+        self.failures = dict(failures or {})
+        self.chunk_size = chunk_size
+        self.host = host
+        self.port = port
+        self.requests = []
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self):
+        threading.Thread(target=self._run, name="llm-stub", daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def answer_for(self, prompt):
+        for needle, answer in self.responses.items():
+            if needle and needle in prompt:
+                return answer
+        return self.responses.get("", "SELECT 1")
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._server.serve_forever())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            request = json.loads(body or b"{}")
+            model = request.get("model", "")
+            prompt = request.get("messages", [{}])[-1].get("content", "")
+            self.requests.append({"model": model, "time": time.time()})
+
+            await asyncio.sleep(self.latency.get(model, 0))
+            if self.failures.get(model, 0) > 0:
+                self.failures[model] -= 1
+                await self._send(writer, 500, b'{"error": {"message": "stub failure"}}',
+                                 "application/json")
+                return
+
+            answer = self.answer_for(prompt)
+            if request.get("stream"):
+                await self._stream(writer, model, answer)
+            else:
+                payload = {
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": answer}}],
+                }
+                await self._send(writer, 200, json.dumps(payload).encode(), "application/json")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, body, content_type):
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _stream(self, writer, model, answer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Connection: close\r\n\r\n")
+        for i in range(0, len(answer), self.chunk_size):
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": None,
+                             "delta": {"content": answer[i:i + self.chunk_size]}}],
+            }
+            writer.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
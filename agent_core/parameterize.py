@@ -0,0 +1,146 @@
+"""Lift literals out of generated SQL so SQL Server can reuse compiled plans"""
+from decimal import Decimal
+
+from agent_core.sql_guard import strip_comments, tokenize
+
+# ODBC SQL type codes (same values as the pyodbc.SQL_* constants)
+SQL_VARCHAR = 12
+SQL_WVARCHAR = -9
+SQL_INTEGER = 4
+SQL_BIGINT = -5
+SQL_DECIMAL = 3
+SQL_DOUBLE = 8
+
+# Declared parameter lengths are bucketed: sp_executesql caches one plan per
+# distinct parameter declaration, so varchar(2) vs varchar(3) would split it
+STRING_SIZE_BUCKETS = (255, 8000)
+
+# Literals are only lifted where they are plain predicate values; select
+# lists and GROUP BY must keep matching text (CASE ... END AS Section)
+LIFT_CLAUSES = {"WHERE", "HAVING", "ON"}
+CLAUSE_KEYWORDS = {
+    "SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "ON", "JOIN", "UNION",
+    "EXCEPT", "INTERSECT", "OFFSET", "FETCH", "WITH", "TOP", "OVER", "PARTITION",
+}
+# Inside these parentheses literals are part of the syntax, not values
+CONSTANT_CONTEXTS = {
+    "DECIMAL", "NUMERIC", "VARCHAR", "NVARCHAR", "CHAR", "NCHAR", "VARBINARY",
+    "BINARY", "FLOAT", "DATETIME2", "DATETIMEOFFSET", "TIME", "CONVERT", "TRY_CONVERT",
+}
+
+
+class ParameterizedQuery:
+    """SQL text with ? markers, its parameters and the declared input sizes"""
+
+    def __init__(self, sql, params, input_sizes, lifted):
+        self.sql = sql
+        self.params = params
+        self.input_sizes = input_sizes
+        self.lifted = lifted
+
+
+def _string_size(value):
+    for size in STRING_SIZE_BUCKETS:
+        if len(value) <= size:
+            return size
+    return 0  # varchar(max)
+
+
+def _string_value(token):
+    national = token.value[:1] in "Nn"
+    body = token.value[2:-1] if national else token.value[1:-1]
+    return body.replace("''", "'"), national
+
+
+def _number_value(text):
+    if "e" in text.lower():
+        return float(text)
+    if "." in text:
+        return Decimal(text)
+    return int(text)
+
+
+def _size_for(value, national=False):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        return (SQL_WVARCHAR if national else SQL_VARCHAR, _string_size(value), 0)
+    if isinstance(value, int):
+        return (SQL_INTEGER, 0, 0) if -2**31 <= value < 2**31 else (SQL_BIGINT, 0, 0)
+    if isinstance(value, Decimal):
+        return (SQL_DECIMAL, 38, 10)
+    if isinstance(value, float):
+        return (SQL_DOUBLE, 0, 0)
+    return None
+
+
+def parameterize(sql, params=None):
+    """Replace predicate literals with ? markers
+
+    Existing ? markers keep their values (params, in order) and lifted
+    literals are slotted in between them, so the parameter list always
+    follows textual order. Non-N string literals are declared varchar so
+    comparisons against varchar columns stay sargable.
+    """
+    sql = strip_comments(sql)
+    existing = list(params or [])
+    tokens = tokenize(sql)
+    clauses = [None]
+    constant_depths = set()
+    pieces, values, sizes = [], [], []
+    cursor = 0
+    lifted = 0
+
+    for i, token in enumerate(tokens):
+        previous = tokens[i - 1] if i else None
+        if token.value == "(":
+            clauses.append(clauses[-1])
+            if previous is not None and previous.is_word(*CONSTANT_CONTEXTS):
+                constant_depths.add(token.depth + 1)
+            continue
+        if token.value == ")":
+            constant_depths.discard(token.depth + 1)
+            clauses.pop()
+            continue
+        if token.kind == "word" and token.upper in CLAUSE_KEYWORDS:
+            clauses[-1] = token.upper
+            continue
+        if token.kind == "param":
+            if existing:
+                value = existing.pop(0)
+                values.append(value)
+                sizes.append(_size_for(value))
+            continue
+        if token.kind not in ("string", "number"):
+            continue
+        if clauses[-1] not in LIFT_CLAUSES or constant_depths & set(range(token.depth + 1)):
+            continue
+
+        if token.kind == "string":
+            value, national = _string_value(token)
+            size = _size_for(value, national)
+        else:
+            value = _number_value(token.value)
+            size = _size_for(value)
+        pieces.append(sql[cursor:token.start])
+        pieces.append("?")
+        cursor = token.start + len(token.value)
+        values.append(value)
+        sizes.append(size)
+        lifted += 1
+
+    pieces.append(sql[cursor:])
+    # Any surplus caller params (shouldn't happen) are passed through untouched
+    values += existing
+    sizes += [_size_for(v) for v in existing]
+    return ParameterizedQuery("".join(pieces), values, sizes, lifted)
+
+
+def execute_parameterized(cursor, sql, params, input_sizes=None):
+    """cursor.execute with declared parameter types where the driver supports them"""
+    if not params:
+        return cursor.execute(sql)
+    # Only declare types when every parameter has one; otherwise let the driver infer
+    if input_sizes and all(input_sizes) and hasattr(cursor, "setinputsizes"):
+        cursor.setinputsizes(input_sizes)
+    return cursor.execute(sql, params)
@@ -0,0 +1,175 @@
+"""Headless question -> SQL -> DataFrame pipeline shared by both apps and the benchmarks"""
+import time
+from contextlib import contextmanager
+
+from agent_core.fetch import DEFAULT_BATCH_SIZE, DEFAULT_MAX_BYTES, DEFAULT_MAX_ROWS, fetch_bounded
+from agent_core.llm import approx_tokens
+from agent_core.parameterize import execute_parameterized, parameterize
+from agent_core.stats import companion_frame, companion_sql
+
+
+class StageTimings(dict):
+    """Seconds spent per pipeline stage (repeated stages accumulate)"""
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        """Time a block; the yielded dict takes span attributes (kept by tracing.Trace)"""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self[name] = self.get(name, 0.0) + time.perf_counter() - start
+
+
+class SQLTranslator:
+    """Natural language to SQL: translation cache first, then the LLM
+
+    build_prompt(question) returns the prompt text; version is the prompt
+    version string (or a callable returning it) used to key the cache. With
+    an examples.ExampleStore, build_prompt(question, examples) also gets the
+    nearest max_examples (question, sql) pairs that ran before.
+    """
+
+    def __init__(self, generator, cache, build_prompt, version, examples=None, max_examples=3):
+        self.generator = generator
+        self.cache = cache
+        self.build_prompt = build_prompt
+        self._version = version
+        self.examples = examples
+        self.max_examples = max_examples
+
+    @property
+    def version(self):
+        return self._version() if callable(self._version) else self._version
+
+    def translate(self, question, timings=None):
+        timings = StageTimings() if timings is None else timings
+        version = self.version
+        with timings.stage("cache_lookup") as span:
+            cached_sql = self.cache.get(question, version) if self.cache else None
+            span["hit"] = bool(cached_sql)
+        if cached_sql:
+            return cached_sql
+        if self.examples is not None:
+            with timings.stage("examples") as span:
+                examples = self.examples.nearest(question, self.max_examples)
+                span["count"] = len(examples)
+            with timings.stage("prompt_build"):
+                prompt = self.build_prompt(question, examples)
+        else:
+            with timings.stage("prompt_build"):
+                prompt = self.build_prompt(question)
+        with timings.stage("llm") as span:
+            # Streams the answer and stops as soon as the SQL is complete
+            sql_query, model = self.generator.generate(prompt, question)
+            span.update(model=model, prompt_tokens=approx_tokens(prompt),
+                        completion_tokens=approx_tokens(sql_query))
+        sql_query = sql_query.strip()
+        if self.cache:
+            self.cache.put(question, version, sql_query)
+        return sql_query
+
+    def discard(self, question):
+        """Forget a translation that turned out not to run"""
+        if self.cache:
+            self.cache.discard(question, self.version)
+        if self.examples is not None:
+            self.examples.remove(question)
+        self._report(question, False)
+
+    def learn(self, question, sql, rows):
+        """A translation ran; with rows it is kept as a future example"""
+        if self.examples is not None and rows:
+            self.examples.add(question, sql)
+        self._report(question, True)
+
+    def _report(self, question, ok):
+        # A ModelRouter adapts to how often each model's SQL runs
+        report = getattr(self.generator, "report", None)
+        if report is not None:
+            report(question, ok)
+
+
+class QueryExecutor:
+    """Parameterize, guard, cache, execute and fetch one query on a pooled connection
+
+    job is an optional QueryJob (query_runner) providing the deadline and
+    cancellation; without one the pool's default statement timeout applies.
+    stats is an optional stats.StreamingStats filled while rows are fetched.
+    """
+
+    def __init__(self, db_pool, guard, result_cache=None, max_rows=DEFAULT_MAX_ROWS,
+                 max_bytes=DEFAULT_MAX_BYTES, batch_size=DEFAULT_BATCH_SIZE):
+        self.db_pool = db_pool
+        self.guard = guard
+        self.result_cache = result_cache
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+
+    def execute(self, sql, params=None, job=None, timings=None, stats=None):
+        timings = StageTimings() if timings is None else timings
+        with timings.stage("parameterize"):
+            # Literals become parameters so structurally identical questions share a plan
+            query = parameterize(sql, params)
+        with timings.stage("guard"):
+            checked = self.guard.check(query.sql)
+
+        statement_timeout = job.statement_timeout() if job is not None else None
+        with self.db_pool.connection(statement_timeout=statement_timeout) as conn:
+            if self.result_cache is not None:
+                with timings.stage("result_cache") as span:
+                    df = self.result_cache.get(checked.sql, conn, query.params)
+                    span["hit"] = df is not None
+                if df is not None:
+                    if stats is not None:
+                        with timings.stage("stats"):
+                            stats.update_frame(df)
+                    return df
+
+            with timings.stage("estimate"):
+                self.guard.estimate(conn, checked, query.params)
+            cursor = conn.cursor()
+            if job is not None:
+                job.attach(cursor)
+            try:
+                with timings.stage("db_execute", params=len(query.params)):
+                    execute_parameterized(cursor, checked.sql, query.params, query.input_sizes)
+                with timings.stage("fetch") as span:
+                    result = fetch_bounded(cursor, max_rows=self.max_rows, max_bytes=self.max_bytes,
+                                           batch_size=self.batch_size, timings=timings, stats=stats)
+                    span.update(rows=len(result.frame), approx_bytes=result.approx_bytes,
+                                truncated=result.truncated)
+            finally:
+                if job is not None:
+                    job.detach()
+                cursor.close()
+            df = result.frame
+            df.attrs["truncated"] = result.truncated
+            df.attrs["guard_warnings"] = checked.warnings
+            if self.result_cache is not None:
+                with timings.stage("result_cache"):
+                    self.result_cache.put(checked.sql, df, conn, query.params)
+            return df
+
+    def summarize(self, sql, columns, numeric_columns, params=None, job=None, quantiles=False):
+        """Summary statistics over the full result of sql, computed by the database
+
+        Returns (total_rows, describe()-style frame); see stats.companion_sql.
+        """
+        query = parameterize(sql, params)
+        checked = self.guard.check(query.sql, limit=False)
+        summary_sql = companion_sql(checked.sql, columns, numeric_columns, quantiles)
+        statement_timeout = job.statement_timeout() if job is not None else None
+        with self.db_pool.connection(statement_timeout=statement_timeout) as conn:
+            cursor = conn.cursor()
+            if job is not None:
+                job.attach(cursor)
+            try:
+                execute_parameterized(cursor, summary_sql, query.params, query.input_sizes)
+                row = cursor.fetchone()
+            finally:
+                if job is not None:
+                    job.detach()
+                cursor.close()
+        return companion_frame(row, columns, numeric_columns, quantiles)
@@ -0,0 +1,259 @@
+"""Compound questions as independent sub-queries, run in parallel on separate connections
+
+"Compare FDI, exports and employment for IT vs apparel in 2023" becomes
+one sub-question per measure. Each is resolved (routes or the LLM) and
+executed on its own pooled connection, and the frames are merged here.
+The first time a question is seen the plan races the single generated
+query and the loser is cancelled; PlanStats remembers who won, so later
+answers run only the winner and race again now and then.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait as wait_futures
+
+import pandas as pd
+
+from agent_core.agent import Answer
+from agent_core.pipeline import StageTimings
+from agent_core.query_runner import QueryCancelled, QueryRunner
+from agent_core.sql_cache import normalize_question
+from agent_core.stats import StreamingStats
+
+# What may stand between the measures of one list: "FDI, exports and employment"
+LIST_SEPARATOR = re.compile(r"[\s,/&+]*(?:and|as well as|plus|vs\.?|versus)?[\s,/&+]*", re.IGNORECASE)
+
+
+class SubQuestion:
+    def __init__(self, name, question):
+        self.name = name
+        self.question = question
+
+
+def split_compound(question, measures):
+    """One sub-question per measure when the question asks for a list of them, else []
+
+    measures is a list of (name, regex). The mentions have to form one list;
+    each sub-question is the question with that list replaced by one measure.
+    """
+    mentions = []
+    for name, pattern in measures:
+        match = re.search(pattern, question, re.IGNORECASE)
+        if match:
+            end = match.end()
+            while end < len(question) and question[end].isalnum():
+                end += 1
+            mentions.append((match.start(), end, name))
+    mentions.sort()
+    if len(mentions) < 2:
+        return []
+    for (_, end, _), (start, _, _) in zip(mentions, mentions[1:]):
+        if start < end or not LIST_SEPARATOR.fullmatch(question[end:start]):
+            return []
+    head, tail = question[:mentions[0][0]], question[mentions[-1][1]:]
+    return [SubQuestion(name, head + question[start:end] + tail) for start, end, name in mentions]
+
+
+def merge_frames(frames, names):
+    """Outer-join the parts on the columns they all share, or stack them with a part column"""
+    keys = [c for c in frames[0].columns if all(c in frame.columns for frame in frames[1:])]
+    merged = None
+    if keys and all(len(frame.columns) > len(keys) and not frame.duplicated(keys).any() for frame in frames):
+        try:
+            merged = frames[0]
+            for frame, name in zip(frames[1:], names[1:]):
+                merged = merged.merge(frame, on=keys, how="outer", suffixes=("", f"_{name}"))
+        except (ValueError, TypeError):
+            # Key columns of different types
+            merged = None
+    if merged is None:
+        merged = pd.concat([frame.assign(part=name) for frame, name in zip(frames, names)], ignore_index=True)
+        merged = merged[["part"] + [c for c in merged.columns if c != "part"]]
+    merged.attrs = {
+        "truncated": any(frame.attrs.get("truncated") for frame in frames),
+        "guard_warnings": [w for frame in frames for w in frame.attrs.get("guard_warnings", [])],
+    }
+    return merged
+
+
+class PlanStats:
+    """Who won the recent plan-vs-single races, per normalized question
+
+    After min_races races the winner runs alone; every rerace_after answers
+    the two race again in case the data or the load changed.
+    """
+
+    def __init__(self, min_races=2, rerace_after=20, max_questions=1000):
+        self.min_races = min_races
+        self.rerace_after = rerace_after
+        self.max_questions = max_questions
+        self._lock = threading.Lock()
+        self._questions = OrderedDict()
+
+    def mode(self, key):
+        """race, plan or single"""
+        with self._lock:
+            entry = self._questions.get(key)
+            if entry is None:
+                return "race"
+            races = entry["plan"] + entry["single"]
+            if races < self.min_races or entry["since_race"] >= self.rerace_after:
+                return "race"
+            return "plan" if entry["plan"] >= entry["single"] else "single"
+
+    def record(self, key, winner=None):
+        """Count an answer; winner is plan or single when it came from a race"""
+        with self._lock:
+            entry = self._questions.pop(key, None) or {"plan": 0, "single": 0, "since_race": 0}
+            if winner is None:
+                entry["since_race"] += 1
+            else:
+                entry[winner] += 1
+                entry["since_race"] = 0
+            self._questions[key] = entry
+            while len(self._questions) > self.max_questions:
+                self._questions.popitem(last=False)
+
+    def wins(self, key):
+        """(plan wins, races) so far"""
+        with self._lock:
+            entry = self._questions.get(key, {"plan": 0, "single": 0})
+            return entry["plan"], entry["plan"] + entry["single"]
+
+
+class QueryPlanner:
+    """Answers compound questions with parallel sub-queries for an AgentPipeline
+
+    measures is a list of (name, regex) used to split questions. With
+    race=False the plan always runs alone. Sub-queries run on the planner's
+    own QueryRunner, so max_workers bounds the extra connections it takes.
+    """
+
+    def __init__(self, measures, max_workers=8, race=True, stats=None):
+        self.measures = measures
+        self.race = race
+        self.stats = stats or PlanStats()
+        self.runner = QueryRunner(max_workers=max_workers)
+
+    def split(self, question):
+        return split_compound(question, self.measures)
+
+    def answer(self, pipeline, question, job=None, timings=None):
+        """A merged Answer for a compound question, or None to answer it as one query"""
+        parts = self.split(question)
+        if len(parts) < 2:
+            return None
+        key = normalize_question(question)
+        mode = self.stats.mode(key) if self.race else "plan"
+        if mode == "single":
+            self.stats.record(key)
+            return None
+        timings = StageTimings() if timings is None else timings
+        deadline = job.remaining() if job is not None else pipeline.deadline
+        started = time.monotonic()
+        with timings.stage("plan", parts=len(parts), mode=mode):
+            part_jobs = [self.runner.submit(self._run, pipeline, part.question, True, deadline=deadline)
+                         for part in parts]
+            single_job = None
+            if mode == "race":
+                single_job = self.runner.submit(self._run, pipeline, question, False, deadline=deadline)
+            winner = self._wait(part_jobs, single_job, job)
+
+        if winner is None:
+            for other in part_jobs + [single_job]:
+                if other is not None:
+                    other.cancel()
+            answer = Answer(question)
+            pipeline._fail(answer, job.reason, job)
+            return answer
+        if winner == "single":
+            for part_job in part_jobs:
+                part_job.cancel()
+            answer, part_timings, finished = self._result(single_job, question)
+            self._fold(timings, part_timings, "")
+            if mode == "race" and answer.ok:
+                self.stats.record(key, "single")
+                answer.note = " | ".join(filter(None, [answer.note, (
+                    f"The single query ({finished - started:.2f}s) beat the {len(parts)}-part parallel plan, "
+                    f"which was cancelled")]))
+            return answer
+
+        if single_job is not None:
+            single_job.cancel()
+        results = [self._result(part_job, part.question) for part_job, part in zip(part_jobs, parts)]
+        if not all(answer.ok for answer, _, _ in results):
+            # Only possible without a race: answer the question as one query instead
+            self.stats.record(key)
+            return None
+        finished = max(done for _, _, done in results)
+        for _, part_timings, _ in results:
+            self._fold(timings, part_timings, "plan_")
+        names = [part.name for part in parts]
+        with timings.stage("plan_merge"):
+            frame = merge_frames([answer.frame for answer, _, _ in results], names)
+        sql = "\n\n".join(f"-- {part.name}\n{answer.sql or '-- ' + answer.note}"
+                          for part, (answer, _, _) in zip(parts, results))
+        answer = Answer(question, route="plan", sql=sql, frame=frame)
+        if mode == "race":
+            self.stats.record(key, "plan")
+            beaten = "the single query was cancelled"
+        else:
+            self.stats.record(key)
+            wins, races = self.stats.wins(key)
+            beaten = f"the plan beat the single query in {wins} of {races} races"
+        answer.note = (f"Split into {len(parts)} sub-queries ({', '.join(names)}) run in parallel on separate "
+                       f"connections: {finished - started:.2f}s; {beaten}")
+        if pipeline.summarize:
+            stats = StreamingStats()
+            with timings.stage("describe"):
+                stats.update_frame(frame)
+                answer.summary = stats.to_frame()
+            if answer.truncated:
+                answer.summary_note = "Over the fetched rows of each sub-query only"
+        return answer
+
+    @staticmethod
+    def _run(job, pipeline, question, routes):
+        timings = StageTimings()
+        answer = pipeline.resolve(question, timings) if routes else pipeline.translate(question, timings)
+        if answer.ok:
+            answer = pipeline.execute(answer, job, timings)
+        return answer, timings, time.monotonic()
+
+    @staticmethod
+    def _result(job, question):
+        try:
+            return job.result(0)
+        except QueryCancelled as e:
+            status = "timeout" if e.reason == "timeout" else "cancelled"
+            return Answer(question, status=status, error=str(e)), StageTimings(), time.monotonic()
+        except Exception as e:
+            return Answer(question, status="error", error=str(e)), StageTimings(), time.monotonic()
+
+    def _wait(self, part_jobs, single_job, parent, poll=0.1):
+        """plan, single, or None when the parent job was cancelled"""
+        while True:
+            plan_done = all(part_job.done() for part_job in part_jobs)
+            plan_ok = plan_done and all(self._result(part_job, "")[0].ok for part_job in part_jobs)
+            single_done = single_job is not None and single_job.done()
+            single_ok = single_done and self._result(single_job, "")[0].ok
+            if plan_ok and single_ok:
+                plan_finished = max(self._result(part_job, "")[2] for part_job in part_jobs)
+                return "plan" if plan_finished <= self._result(single_job, "")[2] else "single"
+            if plan_ok:
+                return "plan"
+            if single_ok:
+                return "single"
+            if plan_done and (single_job is None or single_done):
+                # Both failed: the single query's error is the one to report
+                return "single" if single_job is not None else "plan"
+            if parent is not None and parent.cancelled:
+                return None
+            running = [j.future for j in part_jobs + [single_job] if j is not None and not j.done()]
+            wait_futures(running, timeout=poll, return_when=FIRST_COMPLETED)
+
+    @staticmethod
+    def _fold(timings, part_timings, prefix):
+        for name, seconds in part_timings.items():
+            timings[prefix + name] = timings.get(prefix + name, 0.0) + seconds
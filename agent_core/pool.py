@@ -0,0 +1,206 @@
+"""Thread-safe connection pool for pyodbc (or any DB-API) connections"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of database connections shared by all Streamlit sessions
+
+    Connections are opened lazily up to max_size, health-checked on borrow
+    when they have been idle for a while (or after an error), and replaced
+    transparently when the check fails. Each new connection gets the
+    configured per-statement timeout.
+    """
+
+    def __init__(self, connect, min_size=2, max_size=20, checkout_timeout=10,
+                 statement_timeout=60, health_check_sql="SELECT 1",
+                 health_check_interval=30):
+        if min_size > max_size:
+            raise ValueError("min_size cannot exceed max_size")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.statement_timeout = statement_timeout
+        self.health_check_sql = health_check_sql
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (connection, last_released, suspect)
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "connect_failures": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+            "opened": 0,
+        }
+
+        # Warm up; raises if the database is unreachable
+        for _ in range(max(min_size, 1)):
+            with self._cond:
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            self._idle.append((conn, time.monotonic(), False))
+
+    @contextmanager
+    def connection(self, timeout=None, statement_timeout=None):
+        """Borrow a connection for the duration of a with-block
+
+        statement_timeout overrides the driver query timeout for this
+        checkout only (e.g. the time left before a query's deadline).
+        """
+        conn = self.acquire(timeout)
+        if statement_timeout is not None:
+            self._set_timeout(conn, statement_timeout)
+        failed = False
+        try:
+            yield conn
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if statement_timeout is not None:
+                self._set_timeout(conn, self.statement_timeout)
+            self.release(conn, suspect=failed)
+
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, waiting up to the checkout timeout"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn, last_released, suspect = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {timeout}s "
+                            f"({self.max_size} in use)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif suspect or time.monotonic() - last_released > self.health_check_interval:
+                if not self._is_healthy(conn):
+                    # Broken connection: drop it and try again (reconnects)
+                    with self._cond:
+                        self._metrics["health_check_failures"] += 1
+                    self._discard(conn)
+                    continue
+
+            with self._cond:
+                self._in_use += 1
+                self._metrics["checkouts"] += 1
+                if waited:
+                    self._metrics["waits"] += 1
+                    self._metrics["wait_seconds"] += time.monotonic() - start
+            return conn
+
+    def release(self, conn, suspect=False, broken=False):
+        """Return a connection to the pool (or close it when broken)"""
+        with self._cond:
+            self._in_use -= 1
+        if broken:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic(), suspect))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def metrics(self):
+        with self._cond:
+            metrics = dict(self._metrics)
+            metrics.update({
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+            })
+        return metrics
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._metrics["connect_failures"] += 1
+            raise
+        self._set_timeout(conn, self.statement_timeout)
+        with self._cond:
+            self._metrics["opened"] += 1
+        return conn
+
+    @staticmethod
+    def _set_timeout(conn, seconds):
+        try:
+            # pyodbc: per-statement query timeout in seconds
+            conn.timeout = int(seconds)
+        except (AttributeError, TypeError):
+            pass
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_check_sql)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._close(conn)
+        with self._cond:
+            self._size -= 1
+            self._metrics["discarded"] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,158 @@
+"""Run database work off the Streamlit script thread with deadlines and cancellation"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class QueryCancelled(Exception):
+    """The statement was cancelled by the user or hit its deadline"""
+
+    def __init__(self, reason):
+        super().__init__("Query timed out" if reason == "timeout" else "Query cancelled")
+        self.reason = reason
+
+
+class QueryJob:
+    """Handle for one submitted query
+
+    The worker registers its cursor with attach(); cancel() then calls
+    cursor.cancel(), which sends an attention signal so SQL Server stops the
+    statement and the connection can go back to the pool.
+    """
+
+    def __init__(self, job_id, deadline):
+        self.id = job_id
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.reason = None
+        self.future = None
+        self._cursor = None
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def remaining(self):
+        return max(0.0, self.deadline - (time.monotonic() - self.submitted))
+
+    def statement_timeout(self):
+        """Whole seconds left, for the driver-level query timeout (0 means none in ODBC)"""
+        return max(1, int(self.remaining() + 0.999))
+
+    def attach(self, cursor):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled(self.reason)
+            self._cursor = cursor
+
+    def detach(self):
+        with self._lock:
+            self._cursor = None
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self.reason is not None or self.done():
+                return False
+            self.reason = reason
+            cursor = self._cursor
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+        return True
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+def wait(job, poll=0.2, on_tick=None):
+    """Block until the job finishes, calling on_tick(elapsed) between polls
+
+    Works for anything with result(timeout) and a monotonic submitted time,
+    such as service.RemoteQuery.
+    """
+    while True:
+        try:
+            return job.result(timeout=poll)
+        except FutureTimeout:
+            if on_tick:
+                on_tick(time.monotonic() - job.submitted)
+
+
+class QueryRunner:
+    """Thread pool for queries; every job gets a deadline enforced twice
+
+    The worker passes job.statement_timeout() to the driver, and a watchdog
+    timer cancels the statement a little after the deadline in case the
+    driver ignores the timeout.
+    """
+
+    def __init__(self, max_workers=8, default_deadline=60, grace=2.0):
+        self.default_deadline = default_deadline
+        self.grace = grace
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "timed_out": 0}
+
+    def submit(self, func, *args, deadline=None):
+        """Run func(job, *args) on a worker thread and return the QueryJob"""
+        job = QueryJob(next(self._ids), deadline or self.default_deadline)
+        watchdog = threading.Timer(job.deadline + self.grace, job.cancel, args=("timeout",))
+        watchdog.daemon = True
+        with self._lock:
+            self._jobs[job.id] = job
+            self._stats["submitted"] += 1
+        job.future = self._executor.submit(self._run, job, watchdog, func, args)
+        watchdog.start()
+        return job
+
+    def wait(self, job, poll=0.2, on_tick=None):
+        return wait(job, poll, on_tick)
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        return job.cancel() if job else False
+
+    def running(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.done()]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["running"] = len(self.running())
+        return stats
+
+    def _run(self, job, watchdog, func, args):
+        outcome = "failed"
+        try:
+            if job.cancelled:
+                raise QueryCancelled(job.reason)
+            result = func(job, *args)
+            outcome = "completed"
+            return result
+        except QueryCancelled as e:
+            outcome = "timed_out" if e.reason == "timeout" else "cancelled"
+            raise
+        except Exception as e:
+            # The driver reports a cancelled statement as an ordinary error
+            if job.cancelled:
+                outcome = "timed_out" if job.reason == "timeout" else "cancelled"
+                raise QueryCancelled(job.reason) from e
+            if "timeout" in str(e).lower() or "HYT00" in str(e):
+                outcome = "timed_out"
+            raise
+        finally:
+            watchdog.cancel()
+            job.detach()
+            with self._lock:
+                self._stats[outcome] += 1
+                self._jobs.pop(job.id, None)
@@ -0,0 +1,171 @@
+"""Result-set cache for executed SQL with table-level invalidation"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside string literals and drop trailing semicolons"""
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def referenced_tables(sql, tables):
+    """Return the known tables mentioned in the SQL text"""
+    return sorted(
+        table for table in tables
+        if re.search(rf"(?<![\w]){re.escape(table)}(?![\w])", sql, re.IGNORECASE)
+    )
+
+
+def frame_nbytes(df):
+    """Approximate in-memory size of a DataFrame"""
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class ResultCache:
+    """Thread-safe LRU cache of query results with a memory cap and per-entry TTL
+
+    Every entry remembers a cheap "change marker" for each table it read
+    (for example row count and MAX(CreatedDate)). On lookup the markers are
+    re-read - at most once per marker_ttl_seconds per table - and entries
+    whose tables changed are dropped instead of served.
+    """
+
+    def __init__(self, table_markers, max_bytes=256 * 1024 * 1024,
+                 ttl_seconds=600, marker_ttl_seconds=5):
+        self.table_markers = table_markers
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.marker_ttl_seconds = marker_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._markers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(sql, params=None):
+        key = normalize_sql(sql)
+        if params:
+            key += "\0" + repr(tuple(params))
+        return key
+
+    def get(self, sql, conn, params=None):
+        """Return a cached DataFrame for the SQL (and bound parameters) or None"""
+        key = self.make_key(sql, params)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            self._count_miss()
+            return None
+
+        if time.time() - entry["created"] > self.ttl_seconds:
+            self._drop(key)
+            self._count_miss()
+            return None
+
+        if self._read_markers(entry["markers"].keys(), conn) != entry["markers"]:
+            self._drop(key, invalidated=True)
+            self._count_miss()
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return entry["data"]
+
+    def put(self, sql, df, conn, params=None):
+        """Cache a result unless it is too large or its tables can't be tracked"""
+        if df is None:
+            return
+        size = frame_nbytes(df)
+        # A single result should never be able to flush most of the cache
+        if size == 0 or size > self.max_bytes // 4:
+            return
+
+        tables = referenced_tables(sql, self.table_markers)
+        if not tables:
+            # Nothing would ever invalidate it
+            return
+        key = self.make_key(sql, params)
+        markers = self._read_markers(tables, conn)
+        if any(marker is None for marker in markers.values()):
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old["size"]
+            self._entries[key] = {
+                "data": df,
+                "size": size,
+                "markers": markers,
+                "created": time.time(),
+            }
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["size"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._markers.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _drop(self, key, invalidated=False):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry["size"]
+                if invalidated:
+                    self.invalidations += 1
+
+    def _read_markers(self, tables, conn):
+        """Current change marker per table; None when it can't be read"""
+        markers = {}
+        now = time.time()
+        for table in tables:
+            with self._lock:
+                cached = self._markers.get(table)
+            if cached is not None and now - cached[1] <= self.marker_ttl_seconds:
+                markers[table] = cached[0]
+                continue
+            try:
+                cursor = conn.cursor()
+                cursor.execute(self.table_markers[table])
+                marker = tuple(str(value) for value in cursor.fetchone())
+                cursor.close()
+            except Exception:
+                markers[table] = None
+                continue
+            with self._lock:
+                self._markers[table] = (marker, now)
+            markers[table] = marker
+        return markers
@@ -0,0 +1,168 @@
+"""Route SQL generation between a fast and a strong model by question complexity and model health"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from agent_core.sql_cache import normalize_question
+
+# Words that imply an aggregation, grouping, ranking or comparison in the SQL
+AGGREGATION_PATTERNS = [
+    r"\b(total|sum|overall)\b",
+    r"\b(average|avg|mean|median)\b",
+    r"\b(count|how many|number of)\b",
+    r"\b(max(imum)?|min(imum)?|highest|lowest|most|least|top \d+|rank(ing)?)\b",
+    r"\b(by|per|each) \w+",
+    r"\b(trend|monthly|yearly|annually|over time|growth)\b",
+    r"\b(compare|comparison|vs\.?|versus)\b",
+    r"\b(ratio|percent(age)?|share|proportion)\b",
+]
+
+
+class Complexity:
+    def __init__(self, tables, aggregations, complex):
+        self.tables = tables
+        self.aggregations = aggregations
+        self.complex = complex
+
+    @property
+    def tier(self):
+        return "strong" if self.complex else "fast"
+
+
+class ComplexityClassifier:
+    """Estimates locally how hard a question is to translate
+
+    table_patterns maps each table to a regex for the words that imply it.
+    A question is complex when it implies min_tables tables (joins) or
+    min_aggregations kinds of aggregation.
+    """
+
+    def __init__(self, table_patterns, min_tables=2, min_aggregations=2):
+        self.table_patterns = {table: re.compile(pattern, re.IGNORECASE)
+                               for table, pattern in table_patterns.items()}
+        self.aggregations = [re.compile(pattern, re.IGNORECASE) for pattern in AGGREGATION_PATTERNS]
+        self.min_tables = min_tables
+        self.min_aggregations = min_aggregations
+
+    def classify(self, question):
+        tables = [table for table, pattern in self.table_patterns.items() if pattern.search(question)]
+        aggregations = sum(1 for pattern in self.aggregations if pattern.search(question))
+        return Complexity(tables, aggregations,
+                          len(tables) >= self.min_tables or aggregations >= self.min_aggregations)
+
+
+class ModelHealth:
+    """Exponentially weighted latency and error rate of one tier"""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.calls = 0
+        self.errors = 0
+        self.latency = None
+        self.error_rate = 0.0
+
+    def observe_latency(self, seconds):
+        self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+
+    def observe_outcome(self, ok):
+        self.calls += 1
+        self.errors += 0 if ok else 1
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def to_dict(self):
+        return {"calls": self.calls, "errors": self.errors, "error_rate": self.error_rate,
+                "latency": self.latency or 0.0}
+
+
+class ModelRouter:
+    """Drop-in for SQLGenerator that picks a tier per question
+
+    fast and strong are SQLGenerators. Simple questions go to fast and
+    complex ones to strong, unless the chosen tier is doing clearly worse:
+    its error rate is over max_error_rate and above the other tier's, or
+    (for simple questions) the strong tier has become the faster one. Errors
+    are failed generations plus SQL the translator reports as not running.
+    Every probe_every diverted questions one goes to its own tier anyway,
+    so a tier that recovers is noticed.
+    """
+
+    TIERS = ("fast", "strong")
+
+    def __init__(self, fast, strong, classifier, max_error_rate=0.3, min_calls=5, probe_every=10):
+        self.generators = {"fast": fast, "strong": strong}
+        self.classifier = classifier
+        self.max_error_rate = max_error_rate
+        self.min_calls = min_calls
+        self.probe_every = probe_every
+        self.health = {tier: ModelHealth() for tier in self.TIERS}
+        self._routed = {tier: 0 for tier in self.TIERS}
+        self._diverted = {tier: 0 for tier in self.TIERS}
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose(self, question):
+        """(tier, Complexity) for a question"""
+        complexity = self.classifier.classify(question)
+        preferred = complexity.tier
+        other = "strong" if preferred == "fast" else "fast"
+        with self._lock:
+            mine, theirs = self.health[preferred], self.health[other]
+            worse = mine.calls >= self.min_calls and (
+                mine.error_rate > self.max_error_rate and mine.error_rate > theirs.error_rate)
+            slower = (preferred == "fast" and mine.latency is not None and theirs.latency is not None
+                      and theirs.latency < mine.latency and theirs.error_rate <= mine.error_rate)
+            tier = preferred
+            if worse or slower:
+                self._diverted[preferred] += 1
+                if self._diverted[preferred] % self.probe_every:
+                    tier = other
+            self._routed[tier] += 1
+        return tier, complexity
+
+    def generate(self, prompt, question=None):
+        """Generate with the tier chosen for question (the strong tier when it isn't given)"""
+        tier = self.choose(question)[0] if question else "strong"
+        start = time.monotonic()
+        try:
+            result = self.generators[tier].generate(prompt)
+        except Exception:
+            with self._lock:
+                self.health[tier].observe_outcome(False)
+            raise
+        with self._lock:
+            self.health[tier].observe_latency(time.monotonic() - start)
+            if question:
+                # The outcome arrives with report() once the SQL has run
+                self._pending[normalize_question(question)] = tier
+                while len(self._pending) > 1000:
+                    self._pending.popitem(last=False)
+            else:
+                self.health[tier].observe_outcome(True)
+        return result
+
+    def report(self, question, ok):
+        """Whether the SQL generated for question ran"""
+        with self._lock:
+            tier = self._pending.pop(normalize_question(question), None)
+            if tier is not None:
+                self.health[tier].observe_outcome(ok)
+
+    def stats(self):
+        """The tiers' SQLGenerator stats combined, plus routing and per-tier health"""
+        combined = {}
+        for generator in self.generators.values():
+            for name, value in generator.stats().items():
+                if not name.startswith("avg_"):
+                    combined[name] = combined.get(name, 0) + value
+        succeeded = combined["calls"] - combined["failures"]
+        combined["avg_latency"] = combined["latency_total"] / succeeded if succeeded else 0.0
+        combined["avg_first_token"] = (
+            combined["first_token_total"] / combined["first_tokens"] if combined["first_tokens"] else 0.0
+        )
+        with self._lock:
+            combined["routed"] = dict(self._routed)
+            combined["diverted"] = dict(self._diverted)
+            combined["tiers"] = {tier: dict(self.health[tier].to_dict(), model=self.generators[tier].model)
+                                 for tier in self.TIERS}
+        return combined
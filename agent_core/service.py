@@ -0,0 +1,436 @@
+"""Headless HTTP service answering questions for several agents, and its client
+
+    POST /v1/<app>/ask   {"question": ..., "tenant": ..., "request_id": ..., "deadline": ...}
+    POST /v1/cancel      {"request_id": ...}
+    GET  /v1/stats
+    GET  /v1/health
+
+Answers are JSON; the result frame travels as base64-encoded Parquet and the
+summary statistics in pandas "split" orientation.
+"""
+import asyncio
+import base64
+import io
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+
+from agent_core.agent import Answer
+from agent_core.export import encode_frame
+from agent_core.query_runner import QueryCancelled, QueryRunner
+from agent_core.sql_cache import normalize_question
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def answer_to_dict(answer):
+    frame = None
+    if answer.frame is not None:
+        frame = base64.b64encode(encode_frame(answer.frame, "parquet")).decode("ascii")
+    return {
+        "question": answer.question,
+        "status": answer.status,
+        "error": answer.error,
+        "route": answer.route,
+        "sql": answer.sql,
+        "params": list(answer.params) if answer.params else None,
+        "note": answer.note,
+        "truncated": answer.truncated,
+        "warnings": answer.warnings,
+        "frame": frame,
+        "summary": json.loads(answer.summary.to_json(orient="split")) if answer.summary is not None else None,
+        "summary_note": answer.summary_note,
+    }
+
+
+def answer_from_dict(data):
+    frame = summary = None
+    if data.get("frame") is not None:
+        frame = pd.read_parquet(io.BytesIO(base64.b64decode(data["frame"])))
+        frame.attrs["truncated"] = data.get("truncated", False)
+        frame.attrs["guard_warnings"] = data.get("warnings", [])
+    if data.get("summary") is not None:
+        split = data["summary"]
+        summary = pd.DataFrame(split["data"], index=split["index"], columns=split["columns"], dtype=float)
+    return Answer(data["question"], status=data["status"], error=data.get("error"),
+                  route=data.get("route", "llm"), sql=data.get("sql"), params=data.get("params"),
+                  frame=frame, note=data.get("note", ""), summary=summary,
+                  summary_note=data.get("summary_note", ""))
+
+
+class _Rejected(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Flight:
+    """One question being answered, shared by every request that asked it meanwhile"""
+
+    def __init__(self, key, tenant):
+        self.key = key
+        self.tenant = tenant
+        self.waiters = 0
+        self.job = None
+        self.abandoned = False
+        self.result = asyncio.get_running_loop().create_future()
+
+
+class QueryService:
+    """Asyncio HTTP front end running agent pipelines on a QueryRunner
+
+    pipelines maps an app name to its agent.AgentPipeline. At most workers
+    answers run at once and at most max_queue more wait for a worker; beyond
+    that requests get 503 with Retry-After. Each tenant may run
+    tenant_concurrency answers at once and have tenant_queue admitted in
+    total (429 beyond). A question already in flight for the same app is not
+    run again: the new request waits for the running answer. Runs its own
+    event loop on a daemon thread.
+    """
+
+    def __init__(self, pipelines, host="127.0.0.1", port=8765, workers=8, max_queue=32,
+                 tenant_concurrency=2, tenant_queue=8, tracer=None):
+        self.pipelines = pipelines
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_queue = max_queue
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_queue = tenant_queue
+        self.tracer = tracer
+        self.runner = QueryRunner(max_workers=workers)
+        self._flights = {}
+        self._requests = {}
+        self._tenants = {}
+        self._slots = None
+        self._queued = 0
+        self._running = 0
+        self._avg_seconds = 5.0
+        self._stats = {"requests": 0, "coalesced": 0, "rejected_busy": 0, "rejected_tenant": 0,
+                       "completed": 0, "cancelled": 0}
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        threading.Thread(target=self._run, name="agent-service", daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    def serve_forever(self):
+        """Run in the calling thread until interrupted"""
+        self._run()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        """Called on the event loop thread (GET /v1/stats)"""
+        return {
+            **self._stats,
+            "running": self._running,
+            "queued": self._queued,
+            "in_flight": len(self._flights),
+            "tenants": {tenant: count for tenant, (_, count) in self._tenants.items() if count},
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "apps": sorted(self.pipelines),
+        }
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._server.serve_forever())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1")
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                method, path, _ = request_line.split(" ", 2)
+                length = int(headers.get("content-length", 0))
+                if length < 0:
+                    raise ValueError("negative Content-Length")
+                body = await reader.readexactly(length)
+                request = json.loads(body or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("body must be a JSON object")
+                status, payload = await self._dispatch(method, path.split("?")[0].rstrip("/"),
+                                                       request, headers)
+                extra = {}
+            except _Rejected as e:
+                status, payload = e.status, json.dumps({"error": str(e)}).encode()
+                extra = {"Retry-After": str(e.retry_after)} if e.retry_after else {}
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                status, payload, extra = 400, json.dumps({"error": f"Bad request: {e}"}).encode(), {}
+            await self._send(writer, status, payload, extra)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, body, extra_headers):
+        headers = "".join(f"{name}: {value}\r\n" for name, value in extra_headers.items())
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n{headers}Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _dispatch(self, method, path, request, headers):
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["v1", "health"]:
+            return 200, b'{"status": "ok"}'
+        if method == "GET" and parts == ["v1", "stats"]:
+            return 200, json.dumps(self.stats()).encode()
+        if method == "POST" and parts == ["v1", "cancel"]:
+            return 200, json.dumps({"cancelled": self._cancel(request["request_id"])}).encode()
+        if method == "POST" and len(parts) == 3 and parts[0] == "v1" and parts[2] == "ask":
+            if parts[1] not in self.pipelines:
+                raise _Rejected(404, f"Unknown app: {parts[1]}")
+            tenant = request.get("tenant") or headers.get("x-tenant") or "default"
+            if not isinstance(tenant, str):
+                raise ValueError("tenant must be a string")
+            return 200, await self._ask(parts[1], request, tenant)
+        raise _Rejected(404, f"No route for {method} {path}")
+
+    async def _ask(self, app, request, tenant):
+        question = request["question"]
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("question must be a non-empty string")
+        question = question.strip()
+        deadline = request.get("deadline")
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                     or deadline <= 0):
+            raise ValueError("deadline must be a positive number of seconds")
+        self._stats["requests"] += 1
+        key = (app, normalize_question(question))
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._admit(key, tenant)
+            asyncio.ensure_future(self._answer(flight, app, question, tenant, deadline))
+        else:
+            self._stats["coalesced"] += 1
+        request_id = request.get("request_id") or uuid.uuid4().hex
+        cancelled = self._loop.create_future()
+        flight.waiters += 1
+        self._requests[request_id] = (flight, cancelled)
+        try:
+            await asyncio.wait([flight.result, cancelled], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._requests.pop(request_id, None)
+            flight.waiters -= 1
+        if flight.result.done():
+            return flight.result.result()
+        self._stats["cancelled"] += 1
+        return json.dumps(answer_to_dict(Answer(question, "cancelled", "Query cancelled"))).encode()
+
+    def _admit(self, key, tenant):
+        """Reserve a queue place for a new flight or refuse with 503/429"""
+        if self._queued >= self.max_queue:
+            self._stats["rejected_busy"] += 1
+            backlog = (self._queued + self._running) / self.workers
+            raise _Rejected(503, "Service busy, try again shortly",
+                            retry_after=max(1, math.ceil(backlog * self._avg_seconds)))
+        semaphore, admitted = self._tenants.get(tenant, (None, 0))
+        if admitted >= self.tenant_queue:
+            self._stats["rejected_tenant"] += 1
+            raise _Rejected(429, f"Tenant {tenant} has {admitted} questions in progress",
+                            retry_after=max(1, math.ceil(self._avg_seconds)))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.tenant_concurrency)
+        self._tenants[tenant] = (semaphore, admitted + 1)
+        self._queued += 1
+        flight = _Flight(key, tenant)
+        self._flights[key] = flight
+        return flight
+
+    def _cancel(self, request_id):
+        """Drop one waiter; the answer itself stops when nobody waits for it anymore"""
+        entry = self._requests.get(request_id)
+        if entry is None:
+            return False
+        flight, cancelled = entry
+        if not cancelled.done():
+            cancelled.set_result(True)
+        if flight.waiters <= 1:
+            flight.abandoned = True
+            if flight.job is not None:
+                flight.job.cancel()
+            # A queued flight may not reach _answer's cleanup for a while; asking again
+            # in the meantime must start a new flight, not join this one
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        return True
+
+    async def _answer(self, flight, app, question, tenant, deadline):
+        pipeline = self.pipelines[app]
+        deadline = min(deadline or pipeline.deadline, pipeline.deadline)
+        semaphore = self._tenants[tenant][0]
+        started = None
+        try:
+            async with semaphore:
+                async with self._slots:
+                    self._queued -= 1
+                    self._running += 1
+                    started = time.monotonic()
+                    try:
+                        if flight.abandoned:
+                            payload = json.dumps(answer_to_dict(
+                                Answer(question, "cancelled", "Query cancelled"))).encode()
+                        else:
+                            flight.job = self.runner.submit(self._work, pipeline, question, tenant,
+                                                            deadline=deadline)
+                            payload = await asyncio.wrap_future(flight.job.future)
+                    finally:
+                        self._running -= 1
+        except Exception as e:
+            if started is None:
+                self._queued -= 1
+            if isinstance(e, QueryCancelled):
+                answer = Answer(question, e.reason if e.reason == "timeout" else "cancelled", str(e))
+            else:
+                answer = Answer(question, "error", str(e))
+            payload = json.dumps(answer_to_dict(answer)).encode()
+        finally:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            semaphore, admitted = self._tenants[tenant]
+            self._tenants[tenant] = (semaphore, admitted - 1)
+        if started is not None:
+            self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * (time.monotonic() - started)
+        self._stats["completed"] += 1
+        flight.result.set_result(payload)
+
+    def _work(self, job, pipeline, question, tenant):
+        """Worker thread: answer and encode once for every waiting request"""
+        trace = self.tracer.start(pipeline.name, tenant, question) if self.tracer else None
+        answer = pipeline.answer(question, job=job, trace=trace)
+        if trace is not None:
+            trace.annotate(route=answer.route)
+            trace.finish(answer.status, answer.error)
+        return json.dumps(answer_to_dict(answer), default=str).encode()
+
+
+class ServiceBusy(Exception):
+    """The service refused the question (503 queue full, 429 tenant limit)"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RemoteQuery:
+    """A question submitted to the service, with the QueryJob interface the apps wait on"""
+
+    def __init__(self, client, request_id, deadline):
+        self.id = request_id
+        self.deadline = deadline
+        self.submitted = time.monotonic()
+        self.future = Future()
+        self._client = client
+
+    def cancel(self):
+        if self.future.done():
+            return False
+        try:
+            return self._client.cancel(self.id)
+        except OSError:
+            return False
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class ServiceClient:
+    """Blocking client for QueryService; submit() runs the request on a background thread"""
+
+    def __init__(self, base_url, tenant="default", timeout=300, max_workers=16):
+        self.base_url = base_url.rstrip("/")
+        self.tenant = tenant
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="service-client")
+
+    def ask(self, app, question, tenant=None, request_id=None, deadline=None):
+        """Answer for question; raises ServiceBusy when the service sheds the request"""
+        data = self._call("POST", f"/v1/{app}/ask", {
+            "question": question, "tenant": tenant or self.tenant,
+            "request_id": request_id, "deadline": deadline,
+        })
+        return answer_from_dict(data)
+
+    def submit(self, app, question, tenant=None, deadline=None):
+        handle = RemoteQuery(self, uuid.uuid4().hex, deadline or self.timeout)
+
+        def run():
+            try:
+                handle.future.set_result(self.ask(app, question, tenant, handle.id, deadline))
+            except BaseException as e:
+                handle.future.set_exception(e)
+
+        self._executor.submit(run)
+        return handle
+
+    def cancel(self, request_id):
+        return self._call("POST", "/v1/cancel", {"request_id": request_id})["cancelled"]
+
+    def stats(self):
+        return self._call("GET", "/v1/stats")
+
+    def _call(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            if e.code in (429, 503):
+                retry_after = e.headers.get("Retry-After")
+                raise ServiceBusy(e.code, message, int(retry_after) if retry_after else None) from None
+            raise RuntimeError(f"Service error {e.code}: {message}") from None
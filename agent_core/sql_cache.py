@@ -0,0 +1,129 @@
+"""Persistent natural language -> SQL translation cache"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_question(question):
+    """Normalize a question so trivial variations share one cache entry"""
+    text = question.strip().lower()
+    text = re.sub(r"[^\w\s']", " ", text)
+    return " ".join(text.split())
+
+
+def fingerprint(*parts):
+    """Short stable hash of the schema/prompt text used to version cache keys"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class TranslationCache:
+    """Thread-safe LRU + TTL cache of generated SQL, persisted to a JSON file
+
+    One instance is meant to be shared by every Streamlit session through
+    st.cache_resource. Keys combine the normalized question with a version
+    fingerprint of the schema and prompt, so editing either one naturally
+    invalidates old translations.
+    """
+
+    def __init__(self, path, max_entries=500, ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(question, version):
+        return f"{version}:{normalize_question(question)}"
+
+    def get(self, question, version):
+        """Return cached SQL for the question or None"""
+        key = self.make_key(question, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created"] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["sql"]
+
+    def put(self, question, version, sql):
+        """Store a translation and persist the cache"""
+        if not sql:
+            return
+        key = self.make_key(question, version)
+        with self._lock:
+            self._entries[key] = {
+                "question": question,
+                "sql": sql,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def discard(self, question, version):
+        """Drop a translation, e.g. after the SQL failed to execute"""
+        key = self.make_key(question, version)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if now - entry.get("created", 0) <= self.ttl_seconds:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        # Write to a temp file first so a crash never leaves a truncated cache
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": list(self._entries.items())}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
@@ -0,0 +1,245 @@
+"""Pre-execution checks for generated SQL: read-only, row-limited and affordable"""
+import re
+import xml.etree.ElementTree as ET
+
+# Statements (or statement fragments) that must never come out of the LLM
+WRITE_KEYWORDS = {
+    "INSERT", "UPDATE", "DELETE", "MERGE", "DROP", "ALTER", "CREATE", "TRUNCATE",
+    "EXEC", "EXECUTE", "GRANT", "REVOKE", "DENY", "BACKUP", "RESTORE", "SHUTDOWN",
+    "DBCC", "INTO", "OPENROWSET", "OPENQUERY", "OPENDATASOURCE", "BULK", "WAITFOR",
+    "KILL", "USE", "SET", "DECLARE", "RECONFIGURE", "COMMIT", "ROLLBACK", "BEGIN",
+}
+SET_OPERATORS = {"UNION", "EXCEPT", "INTERSECT"}
+
+_TOKEN = re.compile(
+    r"(?P<space>\s+)"
+    r"|(?P<comment>--[^\n]*|/\*.*?\*/)"
+    r"|(?P<string>N?'(?:[^']|'')*')"
+    r"|(?P<ident>\[(?:[^\]]|\]\])*\]|\"(?:[^\"]|\"\")*\")"
+    r"|(?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+    r"|(?P<word>[@#]{0,2}[A-Za-z_][\w@$#]*)"
+    r"|(?P<param>\?)"
+    r"|(?P<punct>.)",
+    re.DOTALL,
+)
+_SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+
+class GuardError(Exception):
+    """The query was rejected before reaching the database"""
+
+
+class Token:
+    __slots__ = ("kind", "value", "start", "depth")
+
+    def __init__(self, kind, value, start, depth):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.depth = depth
+
+    @property
+    def upper(self):
+        return self.value.upper()
+
+    def is_word(self, *words):
+        return self.kind == "word" and self.value.upper() in words
+
+
+def tokenize(sql):
+    """Split SQL into tokens, tracking parenthesis depth; comments are dropped"""
+    tokens = []
+    depth = 0
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind in ("space", "comment"):
+            continue
+        if value == ")":
+            depth -= 1
+        tokens.append(Token(kind, value, match.start(), depth))
+        if value == "(":
+            depth += 1
+    if depth != 0:
+        raise GuardError("Unbalanced parentheses in generated SQL")
+    return tokens
+
+
+def strip_comments(sql):
+    return _TOKEN.sub(lambda m: " " if m.lastgroup == "comment" else m.group(), sql)
+
+
+class GuardResult:
+    def __init__(self, sql, limited=False, warnings=None, estimated_cost=None,
+                 estimated_rows=None):
+        self.sql = sql
+        self.limited = limited
+        self.warnings = warnings or []
+        self.estimated_cost = estimated_cost
+        self.estimated_rows = estimated_rows
+
+
+class SQLGuard:
+    """Rejects anything but a single read-only query and caps its result size
+
+    check() works on the token stream, so keywords inside strings, comments
+    or bracketed identifiers never trip it. A missing row limit is added as
+    TOP (n) on the outer SELECT, or as OFFSET/FETCH for set operations.
+    estimate() asks SQL Server for the estimated plan (SHOWPLAN_XML) and
+    blocks or warns above the configured cost / row estimates.
+    dialect="sqlite" uses LIMIT instead and skips the plan check.
+    """
+
+    def __init__(self, max_rows=50_000, max_cost=None, warn_cost=None,
+                 max_estimated_rows=None, dialect="tsql"):
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.warn_cost = warn_cost
+        self.max_estimated_rows = max_estimated_rows
+        self.dialect = dialect
+        self.rejected = 0
+        self.limited = 0
+        self.blocked_by_cost = 0
+
+    def check(self, sql, limit=True):
+        """Validate the query and return a GuardResult with the SQL to execute"""
+        try:
+            sql = self._validate(sql)
+        except GuardError:
+            self.rejected += 1
+            raise
+        if not limit:
+            return GuardResult(sql)
+        limited_sql = self._apply_limit(sql, tokenize(sql), self.max_rows + 1)
+        if limited_sql != sql:
+            self.limited += 1
+        return GuardResult(limited_sql, limited=limited_sql != sql)
+
+    def estimate(self, conn, result, params=None):
+        """Fill in plan estimates and enforce the cost/row thresholds"""
+        if self.dialect != "tsql" or not (self.max_cost or self.warn_cost or self.max_estimated_rows):
+            return result
+        try:
+            cost, rows = self._showplan(conn, result.sql, params)
+        except GuardError:
+            raise
+        except Exception as e:
+            # Missing SHOWPLAN permission shouldn't stop the query
+            result.warnings.append(f"Cost check unavailable: {e}")
+            return result
+        result.estimated_cost, result.estimated_rows = cost, rows
+        if self.max_cost and cost is not None and cost > self.max_cost:
+            self.blocked_by_cost += 1
+            raise GuardError(f"Estimated query cost {cost:,.1f} exceeds the limit of {self.max_cost:,.0f}; "
+                             "add filters or aggregate the data")
+        if self.max_estimated_rows and rows is not None and rows > self.max_estimated_rows:
+            self.blocked_by_cost += 1
+            raise GuardError(f"Query is estimated to read {rows:,.0f} rows "
+                             f"(limit {self.max_estimated_rows:,.0f}); add filters or aggregate the data")
+        if self.warn_cost and cost is not None and cost > self.warn_cost:
+            result.warnings.append(f"Expensive query: estimated cost {cost:,.1f}")
+        return result
+
+    def stats(self):
+        return {"rejected": self.rejected, "limited": self.limited,
+                "blocked_by_cost": self.blocked_by_cost}
+
+    def _validate(self, sql):
+        sql = strip_comments(sql or "").strip()
+        while sql.endswith(";"):
+            sql = sql[:-1].rstrip()
+        if not sql:
+            raise GuardError("Empty query")
+        tokens = tokenize(sql)
+        if any(t.value == ";" for t in tokens):
+            raise GuardError("Only a single statement can be executed")
+        if not tokens[0].is_word("SELECT", "WITH"):
+            raise GuardError(f"Only SELECT queries are allowed (got {tokens[0].upper})")
+        for token in tokens:
+            if token.kind != "word":
+                continue
+            word = token.upper
+            if word in WRITE_KEYWORDS:
+                raise GuardError(f"Read-only mode: '{word}' is not allowed")
+            if word.startswith(("XP_", "SP_")):
+                raise GuardError(f"Read-only mode: procedure '{token.value}' is not allowed")
+        return sql
+
+    def _apply_limit(self, sql, tokens, n):
+        top = [t for t in tokens if t.depth == 0]
+        if self.dialect == "sqlite":
+            if any(t.is_word("LIMIT") for t in top):
+                return sql
+            return f"{sql}\nLIMIT {n}"
+
+        has_set_operator = any(t.is_word(*SET_OPERATORS) for t in top)
+        if any(t.is_word("OFFSET") for t in top):
+            if any(t.is_word("FETCH") for t in top):
+                return sql
+            return f"{sql}\nFETCH NEXT {n} ROWS ONLY"
+        if has_set_operator:
+            # TOP would only bind to the first SELECT of a UNION
+            if any(t.is_word("ORDER") for t in top):
+                return f"{sql}\nOFFSET 0 ROWS FETCH NEXT {n} ROWS ONLY"
+            return f"{sql}\nORDER BY (SELECT NULL) OFFSET 0 ROWS FETCH NEXT {n} ROWS ONLY"
+
+        # The outer SELECT is the first depth-0 SELECT (after any CTEs)
+        index = next(i for i, t in enumerate(tokens) if t.depth == 0 and t.is_word("SELECT"))
+        position = index + 1
+        while position < len(tokens) and tokens[position].is_word("DISTINCT", "ALL"):
+            position += 1
+        if position < len(tokens) and tokens[position].is_word("TOP"):
+            return self._clamp_top(sql, tokens, position + 1, n)
+        insert_at = tokens[position - 1].start + len(tokens[position - 1].value)
+        return f"{sql[:insert_at]} TOP ({n}){sql[insert_at:]}"
+
+    @staticmethod
+    def _clamp_top(sql, tokens, position, n):
+        # TOP 10 / TOP (10) stay; TOP (@x), TOP 5 PERCENT and oversized limits are capped
+        if tokens[position].value == "(":
+            close = next(j for j in range(position + 1, len(tokens))
+                         if tokens[j].value == ")" and tokens[j].depth == tokens[position].depth)
+            expression, end = tokens[position + 1:close], close + 1
+        else:
+            expression, end = tokens[position:position + 1], position + 1
+        percent = end < len(tokens) and tokens[end].is_word("PERCENT")
+        if (not percent and len(expression) == 1 and expression[0].value.isdigit()
+                and int(expression[0].value) <= n):
+            return sql
+        end += 1 if percent else 0
+        stop = tokens[end].start if end < len(tokens) else len(sql)
+        return f"{sql[:tokens[position].start]}({n}) {sql[stop:]}"
+
+    @staticmethod
+    def _showplan(conn, sql, params):
+        cursor = conn.cursor()
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            row = cursor.fetchone()
+            while cursor.nextset():
+                pass
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+            cursor.close()
+        if not row:
+            return None, None
+        return parse_showplan(row[0])
+
+
+def parse_showplan(plan_xml):
+    """(estimated subtree cost, estimated rows) of the first statement in a SHOWPLAN_XML document"""
+    root = ET.fromstring(plan_xml)
+    statement = root.find(f".//{_SHOWPLAN_NS}StmtSimple")
+    if statement is None:
+        return None, None
+    cost = statement.get("StatementSubTreeCost")
+    rows = statement.get("StatementEstRows")
+    # Rows read matter as much as rows returned: take the largest estimate in the plan
+    read = [float(op.get("EstimatedRowsRead") or op.get("EstimateRows"))
+            for op in statement.iter(f"{_SHOWPLAN_NS}RelOp") if op.get("EstimateRows")]
+    estimated_rows = max(read + ([float(rows)] if rows else []), default=None)
+    return (float(cost) if cost else None), estimated_rows
@@ -0,0 +1,248 @@
+"""Streaming summary statistics with mergeable sketches, and a SQL pushdown companion query
+
+StreamingStats is fed batches while a result is fetched and produces the
+same table as DataFrame.describe(): exact count/mean/std/min/max and
+quantiles from a DDSketch (relative error bounded by alpha). Two stats
+objects for parts of a result can be merged. companion_sql() builds one
+aggregate query over the full (unlimited) result so the numbers cover every
+row even when only the first page was fetched.
+"""
+import decimal
+import math
+
+import numpy as np
+import pandas as pd
+
+from agent_core.columnar import _kind_for
+from agent_core.sql_guard import tokenize
+
+QUANTILES = (0.25, 0.5, 0.75)
+SUMMARY_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+NUMERIC_KINDS = {"int", "float", "decimal", "infer"}
+
+
+class QuantileSketch:
+    """DDSketch: log-spaced buckets, so any quantile is within alpha relative error
+
+    Buckets are plain counts, so sketches of different batches merge by addition.
+    """
+
+    def __init__(self, alpha=0.01, min_value=1e-9):
+        self.alpha = alpha
+        self.min_value = min_value
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def update(self, values):
+        """Add a float array (NaNs must already be removed)"""
+        magnitude = np.abs(values)
+        small = magnitude < self.min_value
+        self.zeros += int(small.sum())
+        for store, mask in ((self.positive, (values > 0) & ~small), (self.negative, (values < 0) & ~small)):
+            if mask.any():
+                keys = np.ceil(np.log(magnitude[mask]) / self._log_gamma).astype(np.int64)
+                for key, n in zip(*np.unique(keys, return_counts=True)):
+                    store[int(key)] = store.get(int(key), 0) + int(n)
+        self.count += len(values)
+
+    def merge(self, other):
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, n in other_store.items():
+                store[key] = store.get(key, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        # Most negative values first: largest magnitude keys of the negative store
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+
+class ColumnSummary:
+    """Count, mean/variance (Welford, merged with Chan's formula), min, max and a quantile sketch"""
+
+    def __init__(self, alpha=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(alpha)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        other = ColumnSummary(self.sketch.alpha)
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min, other.max = float(values.min()), float(values.max())
+        other.sketch.update(values)
+        self.merge(other)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def describe(self):
+        if not self.count:
+            return [0] + [math.nan] * (len(SUMMARY_INDEX) - 1)
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+        # Sketch estimates are clamped to the exact range
+        quantiles = [min(max(self.sketch.quantile(q), self.min), self.max) for q in QUANTILES]
+        return [self.count, self.mean, std, self.min, *quantiles, self.max]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+
+class StreamingStats:
+    """Per-column summaries of the numeric columns of a result, built batch by batch"""
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.columns = None
+        self.rows = 0
+        self._summaries = {}
+
+    def update_rows(self, description, rows):
+        """Add a batch of DB-API row tuples (the fetch_bounded hook)"""
+        if self.columns is None:
+            self.columns = [column[0] for column in description]
+            self._summaries = {i: ColumnSummary(self.alpha) for i, column in enumerate(description)
+                               if _kind_for(column[1]) in NUMERIC_KINDS}
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        for i in list(self._summaries):
+            values = columns[i]
+            sample = next((v for v in values if v is not None), None)
+            if sample is not None and not _is_number(sample):
+                # Typeless driver column that turned out not to be numeric
+                del self._summaries[i]
+                continue
+            try:
+                self._summaries[i].update(np.array(values, dtype=np.float64))
+            except (TypeError, ValueError):
+                del self._summaries[i]
+        self.rows += len(rows)
+
+    def update_frame(self, df):
+        """Add an already-built frame (cached results, rollup cube answers)"""
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self._summaries = {i: ColumnSummary(self.alpha) for i in range(len(df.columns))
+                               if pd.api.types.is_numeric_dtype(df.dtypes.iloc[i])
+                               and not pd.api.types.is_bool_dtype(df.dtypes.iloc[i])}
+        for i, summary in self._summaries.items():
+            summary.update(df.iloc[:, i].to_numpy(dtype=np.float64, na_value=np.nan))
+        self.rows += len(df)
+
+    def merge(self, other):
+        """Fold in the stats of another part of the same result (same columns)"""
+        if other.columns is None:
+            return
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self._summaries = {i: ColumnSummary(self.alpha) for i in other._summaries}
+        for i in list(self._summaries):
+            if i in other._summaries:
+                self._summaries[i].merge(other._summaries[i])
+            else:
+                del self._summaries[i]
+        self.rows += other.rows
+
+    @property
+    def numeric_columns(self):
+        return [self.columns[i] for i in sorted(self._summaries)]
+
+    def to_frame(self):
+        """describe()-style table: one column per numeric result column"""
+        return pd.DataFrame({self.columns[i]: self._summaries[i].describe() for i in sorted(self._summaries)},
+                            index=SUMMARY_INDEX)
+
+
+def companion_sql(sql, columns, numeric_columns, quantiles=False):
+    """One aggregate query computing the summary over every row of sql
+
+    The result is wrapped as a derived table with positional column aliases
+    (so unnamed or duplicate columns are fine); CTEs stay in front and a
+    top-level ORDER BY without TOP/OFFSET is dropped because it is not
+    allowed there. quantiles uses APPROX_PERCENTILE_CONT (SQL Server 2022+).
+    """
+    sql = sql.strip().rstrip(";").strip()
+    tokens = tokenize(sql)
+    index = next(i for i, t in enumerate(tokens) if t.depth == 0 and t.is_word("SELECT"))
+    prefix, body = sql[:tokens[index].start], sql[tokens[index].start:]
+    top = [t for t in tokens[index:] if t.depth == 0]
+    position = 1
+    while position < len(top) and top[position].is_word("DISTINCT", "ALL"):
+        position += 1
+    limited = (position < len(top) and top[position].is_word("TOP")) or any(t.is_word("OFFSET") for t in top)
+    order = [t for t in top if t.is_word("ORDER")]
+    if order and not limited:
+        body = sql[tokens[index].start:order[-1].start].rstrip()
+
+    aliases = [f"c{i}" for i in range(len(columns))]
+    selected = ["COUNT_BIG(*) AS [rows]"]
+    for i, name in enumerate(columns):
+        if name not in numeric_columns:
+            continue
+        value = f"CAST(q.[c{i}] AS float)"
+        selected += [f"COUNT(q.[c{i}]) AS [c{i}_count]", f"AVG({value}) AS [c{i}_mean]",
+                     f"STDEV({value}) AS [c{i}_std]", f"MIN({value}) AS [c{i}_min]"]
+        if quantiles:
+            selected += [f"APPROX_PERCENTILE_CONT({q}) WITHIN GROUP (ORDER BY {value}) AS [c{i}_p{int(q * 100)}]"
+                         for q in QUANTILES]
+        selected.append(f"MAX({value}) AS [c{i}_max]")
+    return (f"{prefix}SELECT {', '.join(selected)}\nFROM ({body}) AS q ({', '.join(aliases)})")
+
+
+def companion_frame(row, columns, numeric_columns, quantiles=False):
+    """Turn the companion query's single row into (total_rows, describe()-style table)
+
+    Without server-side quantiles those rows are NaN; fill them from a sketch.
+    """
+    values = iter(row)
+    total_rows = next(values)
+    data = {}
+    for name in columns:
+        if name not in numeric_columns:
+            continue
+        count, mean, std, low = (next(values) for _ in range(4))
+        middle = [next(values) for _ in QUANTILES] if quantiles else [None] * len(QUANTILES)
+        high = next(values)
+        data[name] = [count, mean, std, low, *middle, high]
+    frame = pd.DataFrame(data, index=SUMMARY_INDEX).astype(float)
+    return total_rows, frame
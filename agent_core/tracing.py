@@ -0,0 +1,198 @@
+"""Per-question stage spans, an in-memory ring buffer and Prometheus/JSONL export"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from agent_core.pipeline import StageTimings
+from agent_core.sql_cache import fingerprint, normalize_question
+
+# Histogram buckets (seconds) for the Prometheus export
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Span:
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name, start, duration, attrs):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.attrs = attrs
+
+    def to_dict(self):
+        return {"name": self.name, "start_ms": round(self.start * 1000, 3),
+                "duration_ms": round(self.duration * 1000, 3), **self.attrs}
+
+
+class Trace(StageTimings):
+    """StageTimings that also keeps every span with its offset and attributes
+
+    Can be handed to SQLTranslator/QueryExecutor in place of StageTimings and
+    crosses threads safely (the worker thread adds the DB spans).
+    """
+
+    def __init__(self, tracer, app, session, question):
+        super().__init__()
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.app = app
+        self.session = session
+        self.question_hash = fingerprint(normalize_question(question))
+        self.started_at = time.time()
+        self.status = None
+        self.error = None
+        self.elapsed = None
+        self.spans = []
+        self.attrs = {}
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self[name] = self.get(name, 0.0) + duration
+                self.spans.append(Span(name, start - self._t0, duration, attrs))
+
+    def annotate(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, status="ok", error=None):
+        """Close the trace and hand it to the tracer (idempotent)"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            self.status = status
+            self.error = str(error) if error else None
+            self.elapsed = time.perf_counter() - self._t0
+        self.tracer.record(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "app": self.app,
+            "session": self.session,
+            "question_hash": self.question_hash,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "status": self.status,
+            "error": self.error,
+            "elapsed_ms": round(self.elapsed * 1000, 3),
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.items()},
+            "attrs": self.attrs,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class Tracer:
+    """Ring buffer of finished traces plus cumulative per-stage histograms
+
+    When export_dir is set every finished trace is appended to
+    traces-YYYYMMDD.jsonl there and metrics.prom (Prometheus text format,
+    e.g. for the node_exporter textfile collector) is rewritten.
+    """
+
+    def __init__(self, capacity=500, export_dir=None):
+        self.export_dir = export_dir
+        self._traces = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._outcomes = {}
+
+    def start(self, app, session, question):
+        return Trace(self, app, session, question)
+
+    def record(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+            key = (trace.app, trace.status)
+            self._outcomes[key] = self._outcomes.get(key, 0) + 1
+            for name, seconds in list(trace.items()) + [("total", trace.elapsed)]:
+                histogram = self._histograms.setdefault((trace.app, name), [[0] * len(BUCKETS), 0, 0.0])
+                for i, bound in enumerate(BUCKETS):
+                    if seconds <= bound:
+                        histogram[0][i] += 1
+                histogram[1] += 1
+                histogram[2] += seconds
+        if self.export_dir:
+            try:
+                self._export(trace)
+            except OSError:
+                pass
+
+    def recent(self, limit=50):
+        with self._lock:
+            return list(self._traces)[-limit:][::-1]
+
+    def stage_summary(self):
+        """{stage: (count, p50_ms, p95_ms, max_ms)} over the traces in the buffer"""
+        samples = {}
+        for trace in self.recent(limit=len(self._traces) or 1):
+            for name, seconds in list(trace.items()) + [("total", trace.elapsed)]:
+                samples.setdefault(name, []).append(seconds * 1000)
+        summary = {}
+        for name, values in samples.items():
+            values.sort()
+            summary[name] = (len(values), values[len(values) // 2],
+                             values[min(len(values) - 1, int(len(values) * 0.95))], values[-1])
+        return summary
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP agent_stage_seconds Time spent per question pipeline stage",
+            "# TYPE agent_stage_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+            outcomes = dict(self._outcomes)
+        for (app, stage), (buckets, count, total) in sorted(histograms.items()):
+            labels = f'app="{app}",stage="{stage}"'
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                lines.append(f'agent_stage_seconds_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'agent_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"agent_stage_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"agent_stage_seconds_count{{{labels}}} {count}")
+        lines += ["# HELP agent_questions_total Questions processed by outcome",
+                  "# TYPE agent_questions_total counter"]
+        for (app, status), count in sorted(outcomes.items()):
+            lines.append(f'agent_questions_total{{app="{app}",status="{status}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        _atomic_write(path, self.prometheus_text())
+        return path
+
+    def write_jsonl(self, path):
+        """Dump the whole ring buffer as JSON lines"""
+        traces = self.recent(limit=len(self._traces) or 1)[::-1]
+        _atomic_write(path, "".join(json.dumps(t.to_dict()) + "\n" for t in traces))
+        return path
+
+    def _export(self, trace):
+        os.makedirs(self.export_dir, exist_ok=True)
+        day = time.strftime("%Y%m%d", time.localtime(trace.started_at))
+        with open(os.path.join(self.export_dir, f"traces-{day}.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace.to_dict()) + "\n")
+        self.write_prometheus(os.path.join(self.export_dir, "metrics.prom"))
+
+
+def _atomic_write(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,60 @@
+"""Serve the Library and BOI question pipelines over HTTP
+
+    python agent_service.py --port 8765
+    AGENT_SERVICE_URL=http://127.0.0.1:8765 streamlit run Library_ai_agent.py
+
+See agent_core/service.py for the endpoints. Apps whose database can't be
+reached are left out and reported on startup.
+"""
+import argparse
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(REPO_DIR, "BOI_AI_Agent"))
+
+from agent_core.service import QueryService
+from agent_core.tracing import Tracer
+import boi_agent
+import library_agent
+
+AGENTS = {
+    "library": (library_agent.connect_database, library_agent.LibraryAgent),
+    "boi": (boi_agent.connect_database, boi_agent.BOIAgent),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--apps", default=",".join(AGENTS), help="comma-separated apps to serve")
+    parser.add_argument("--workers", type=int, default=16, help="answers running at once")
+    parser.add_argument("--max-queue", type=int, default=64, help="answers waiting for a worker")
+    parser.add_argument("--tenant-concurrency", type=int, default=2)
+    parser.add_argument("--tenant-queue", type=int, default=8)
+    args = parser.parse_args()
+
+    pipelines = {}
+    for app in args.apps.split(","):
+        connect, agent_class = AGENTS[app]
+        try:
+            pipelines[app] = agent_class(connect()).pipeline
+        except Exception as e:
+            print(f"Not serving {app}: {e}")
+    if not pipelines:
+        return 1
+    tracer = Tracer(capacity=1000, export_dir=os.path.join(REPO_DIR, ".cache", "service_traces"))
+    service = QueryService(pipelines, host=args.host, port=args.port, workers=args.workers,
+                           max_queue=args.max_queue, tenant_concurrency=args.tenant_concurrency,
+                           tenant_queue=args.tenant_queue, tracer=tracer)
+    print(f"Serving {', '.join(sorted(pipelines))} on http://{args.host}:{args.port}")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Deterministic SQLite stand-ins for the Library and BOI databases"""
+import random
+import sqlite3
+from datetime import date, timedelta
+
+LIBRARY_DDL = """
+CREATE TABLE Authors (AuthorID INTEGER PRIMARY KEY, FirstName TEXT, LastName TEXT, BirthDate TEXT,
+                      Nationality TEXT, Email TEXT, CreatedDate TEXT);
+CREATE TABLE Categories (CategoryID INTEGER PRIMARY KEY, CategoryName TEXT, Description TEXT,
+                         CreatedDate TEXT);
+CREATE TABLE Books (BookID INTEGER PRIMARY KEY, Title TEXT, ISBN TEXT, AuthorID INTEGER,
+                    CategoryID INTEGER, PublicationYear INTEGER, Publisher TEXT, TotalCopies INTEGER,
+                    AvailableCopies INTEGER, Price REAL, CreatedDate TEXT);
+CREATE TABLE Members (MemberID INTEGER PRIMARY KEY, FirstName TEXT, LastName TEXT, Email TEXT,
+                      Phone TEXT, Address TEXT, JoinDate TEXT, MembershipType TEXT, IsActive INTEGER,
+                      CreatedDate TEXT);
+CREATE TABLE BorrowingRecords (RecordID INTEGER PRIMARY KEY, MemberID INTEGER, BookID INTEGER,
+                               BorrowDate TEXT, DueDate TEXT, ReturnDate TEXT, Fine REAL,
+                               Status TEXT, CreatedDate TEXT);
+CREATE INDEX IX_Borrowing_Member ON BorrowingRecords (MemberID);
+CREATE INDEX IX_Borrowing_Book ON BorrowingRecords (BookID);
+"""
+
+BOI_DDL = """
+CREATE TABLE General_Project_Detail (Reference_Number TEXT, Project_Type TEXT, Project_Category INTEGER,
+                                     Project_Name TEXT, Project_Status TEXT, Product_Description TEXT,
+                                     NewSector TEXT, Project_Category_N INTEGER, Project_Type_N TEXT,
+                                     Approval_Date TEXT, DraftedOn TEXT,
+                                     PRIMARY KEY (Reference_Number, Project_Type, Project_Category));
+CREATE TABLE ShareHolders_Country (Reference_Number TEXT, Project_Type TEXT, Project_Category INTEGER,
+    Country_Code1 TEXT, Country_Code2 TEXT, Country_Code3 TEXT, Country_Code4 TEXT, Country_Code5 TEXT,
+    Country_Code6 TEXT, Country_Code7 TEXT, Country_Code8 TEXT, Country_Code9 TEXT, Country_Code10 TEXT,
+    Country_Code11 TEXT, Country_Code12 TEXT, Country_Code13 TEXT, Country_Code14 TEXT, Country_Code15 TEXT);
+CREATE TABLE ANNUAT (REFNO TEXT, PRJTYPE TEXT, PRJCAT INTEGER, YEAR TEXT, EXPVLUANU REAL,
+                     EMPVLUANU INTEGER, FORINVANU REAL);
+CREATE INDEX IX_ANNUAT_Project ON ANNUAT (REFNO, PRJTYPE, PRJCAT);
+CREATE INDEX IX_SC_Project ON ShareHolders_Country (Reference_Number, Project_Type, Project_Category);
+"""
+
+CATEGORIES = ["Fiction", "Science", "History", "Technology", "Children", "Biography", "Art", "Travel"]
+MEMBERSHIP_TYPES = ["Standard", "Premium", "Student", "Senior"]
+SECTORS = ["Manufacturing", "Apparel", "Infrastructure", "Knowledge Services", "Tourism & Leisure",
+           "Utilities", "Services", "Agriculture"]
+STATUSES = ["A1", "B1", "C1", "C2", "C3", "D1", "D2", "E1"]
+PROJECT_CATEGORIES = [21, 24, 61, 62, 63, 64, 71, 72, 74]
+COUNTRIES = ["IN", "CN", "JP", "US", "GB", "SG", "HK", "DE", "FR", "NL", "AU", "MY", "LK"]
+
+
+def _day(rng, start, span_days):
+    return (start + timedelta(days=rng.randrange(span_days))).isoformat()
+
+
+def build_library_db(path, scale=1.0, seed=7):
+    """Create the library schema with scale * (20k members, 5k books, 100k loans)"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(LIBRARY_DDL)
+    start = date(2015, 1, 1)
+    n_authors, n_books = int(800 * scale) or 1, int(5000 * scale) or 1
+    n_members, n_loans = int(20000 * scale) or 1, int(100000 * scale) or 1
+    conn.executemany("INSERT INTO Categories VALUES (?, ?, ?, ?)",
+                     [(i + 1, name, f"{name} books", "2015-01-01") for i, name in enumerate(CATEGORIES)])
+    conn.executemany("INSERT INTO Authors VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        (i, f"Author{i}", f"Last{i % 97}", _day(rng, date(1940, 1, 1), 20000),
+         rng.choice(COUNTRIES), f"author{i}@example.org", _day(rng, start, 3000))
+        for i in range(1, n_authors + 1)])
+    conn.executemany("INSERT INTO Books VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (i, f"Book title {i}", f"978{i:010d}", rng.randint(1, n_authors), rng.randint(1, len(CATEGORIES)),
+         rng.randint(1950, 2024), f"Publisher {i % 40}", copies, rng.randint(0, copies),
+         round(rng.uniform(5, 120), 2), _day(rng, start, 3000))
+        for i in range(1, n_books + 1) for copies in [rng.randint(1, 12)]])
+    conn.executemany("INSERT INTO Members VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (i, f"First{i}", f"Member{i % 503}", f"member{i}@example.org", f"07{i:08d}",
+         f"{i} Library Road", _day(rng, start, 3000), rng.choice(MEMBERSHIP_TYPES),
+         int(rng.random() < 0.8), _day(rng, start, 3000))
+        for i in range(1, n_members + 1)])
+    loans = []
+    for i in range(1, n_loans + 1):
+        borrowed = start + timedelta(days=rng.randrange(3300))
+        due = borrowed + timedelta(days=14)
+        returned = borrowed + timedelta(days=rng.randint(1, 40)) if rng.random() < 0.9 else None
+        late = returned is not None and returned > due
+        loans.append((i, rng.randint(1, n_members), rng.randint(1, n_books), borrowed.isoformat(),
+                      due.isoformat(), returned.isoformat() if returned else None,
+                      round((returned - due).days * 0.5, 2) if late else 0.0,
+                      "Returned" if returned else "Borrowed", borrowed.isoformat()))
+    conn.executemany("INSERT INTO BorrowingRecords VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", loans)
+    conn.commit()
+    conn.close()
+
+
+def build_boi_db(path, scale=1.0, seed=11, years=range(2000, 2026)):
+    """Create the BOI schema with scale * 5k projects and one ANNUAT row per project-year"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(BOI_DDL)
+    n_projects = int(5000 * scale) or 1
+    projects, holders, annual = [], [], []
+    for i in range(1, n_projects + 1):
+        key = (f"P{i:06d}", "GENN", rng.choice(PROJECT_CATEGORIES))
+        first_year = rng.choice(list(years))
+        projects.append(key + (f"Project {i}", rng.choice(STATUSES), f"Product {i % 300}",
+                               rng.choice(SECTORS), key[2], "GENN", f"{first_year}-06-01",
+                               f"{first_year}-01-15"))
+        countries = rng.sample(COUNTRIES, rng.randint(1, 4))
+        holders.append(key + tuple(countries + [None] * (15 - len(countries))))
+        for year in years:
+            if year >= first_year:
+                annual.append(key + (str(year), round(rng.uniform(0, 5e6), 2), rng.randint(0, 900),
+                                     round(rng.uniform(0, 2e6), 2)))
+    conn.executemany(f"INSERT INTO General_Project_Detail VALUES ({', '.join('?' * 11)})", projects)
+    conn.executemany(f"INSERT INTO ShareHolders_Country VALUES ({', '.join('?' * 18)})", holders)
+    conn.executemany("INSERT INTO ANNUAT VALUES (?, ?, ?, ?, ?, ?, ?)", annual)
+    conn.commit()
+    conn.close()
@@ -0,0 +1,223 @@
+"""Offline end-to-end latency benchmark for the Library and BOI question pipelines
+
+Drives the same building blocks the apps use (prompt build, SQLTranslator
+with the streaming SQLGenerator, QueryExecutor with the guard and bounded
+fetch, the chart builders and CSV encoding) against a stub LLM that replays
+recorded SQL and SQLite copies of both schemas. Reports per-stage p50/p95/p99,
+peak memory and throughput per scenario and compares them to a stored baseline.
+
+    python benchmarks/run_benchmarks.py                     # compare to baseline
+    python benchmarks/run_benchmarks.py --save-baseline     # record a new baseline
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+BOI_DIR = os.path.join(REPO_DIR, "BOI_AI_Agent")
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BOI_DIR)
+
+from agent_core.charts import category_chart, financial_charts
+from agent_core.llm import SQLGenerator
+from agent_core.llm_stub import StubLLMServer
+from agent_core.pipeline import QueryExecutor, SQLTranslator, StageTimings
+from agent_core.pool import ConnectionPool
+from agent_core.sql_guard import SQLGuard
+from agent_core.stats import StreamingStats
+from boi_agent import SQL_PROMPT_TEMPLATE as BOI_PROMPT_TEMPLATE
+from fixtures import build_boi_db, build_library_db
+from library_agent import build_prompt as library_prompt
+from schema_index import SchemaIndex
+
+STAGES = ["prompt_build", "llm", "parameterize", "guard", "db_execute", "fetch",
+          "describe", "visualization", "csv_encode", "total"]
+PERCENTILES = (50, 95, 99)
+MAX_RESULT_ROWS = 50_000
+MAX_RESULT_BYTES = 100 * 1024 * 1024
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "baseline.json")
+
+
+def prompt_builders():
+    """The apps' real prompt construction, one callable per app"""
+    schema_index = SchemaIndex.from_directory(BOI_DIR)
+    return {
+        "library": library_prompt,
+        "boi": lambda q: BOI_PROMPT_TEMPLATE.format(schema=schema_index.context_for(q).text, question=q),
+    }
+
+
+def percentiles(values):
+    return {f"p{p}": float(np.percentile(values, p)) * 1000 for p in PERCENTILES}
+
+
+def run_once(app, scenario, translator, executor, timings):
+    started = time.perf_counter()
+    sql = translator.translate(scenario["question"], timings)
+    stats = StreamingStats()
+    df = executor.execute(sql, timings=timings, stats=stats)
+    with timings.stage("describe"):
+        stats.to_frame()
+    with timings.stage("visualization"):
+        if app == "library":
+            category_chart(df, f"Analysis: {scenario['question'][:50]}...")
+        else:
+            financial_charts(df)
+    with timings.stage("csv_encode"):
+        df.to_csv(index=False)
+    timings["total"] = time.perf_counter() - started
+    return len(df)
+
+
+def bench_scenario(app, scenario, translator, executor, iterations, warmup):
+    for _ in range(warmup):
+        run_once(app, scenario, translator, executor, StageTimings())
+    samples = {stage: [] for stage in STAGES}
+    rows = 0
+    for _ in range(iterations):
+        timings = StageTimings()
+        rows = run_once(app, scenario, translator, executor, timings)
+        for stage in STAGES:
+            samples[stage].append(timings.get(stage, 0.0))
+    # Peak memory is measured on a separate pass; tracemalloc would skew the timings
+    tracemalloc.start()
+    run_once(app, scenario, translator, executor, StageTimings())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = sum(samples["total"])
+    return {
+        "rows": rows,
+        "stages": {stage: percentiles(values) for stage, values in samples.items()},
+        "peak_mb": peak / 1e6,
+        "throughput_qps": iterations / total if total else 0.0,
+    }
+
+
+def run(args):
+    with open(args.scenarios, encoding="utf-8") as f:
+        scenarios = [s for s in json.load(f) if not args.only or args.only in s["name"]]
+    builders = prompt_builders()
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    databases = {"library": os.path.join(workdir, "library.db"), "boi": os.path.join(workdir, "boi.db")}
+    print(f"Building SQLite fixtures (scale {args.scale}) in {workdir} ...")
+    build_library_db(databases["library"], args.scale)
+    build_boi_db(databases["boi"], args.scale)
+
+    results = {}
+    responses = {s["question"]: s["sql"] for s in scenarios}
+    with StubLLMServer(responses, chunk_size=args.chunk_size) as server:
+        for app in ("library", "boi"):
+            app_scenarios = [s for s in scenarios if s["app"] == app]
+            if not app_scenarios:
+                continue
+            path = databases[app]
+            pool = ConnectionPool(lambda path=path: sqlite3.connect(path, check_same_thread=False),
+                                  min_size=1, max_size=4, health_check_sql="SELECT 1")
+            generator = SQLGenerator(server.base_url, "stub", "stub-model", hedge_after=None)
+            # No translation or result cache: every iteration pays for every stage
+            translator = SQLTranslator(generator, None, builders[app], "bench")
+            executor = QueryExecutor(pool, SQLGuard(max_rows=MAX_RESULT_ROWS, dialect="sqlite"),
+                                     max_rows=MAX_RESULT_ROWS, max_bytes=MAX_RESULT_BYTES)
+            for scenario in app_scenarios:
+                result = bench_scenario(app, scenario, translator, executor,
+                                        args.iterations, args.warmup)
+                results[scenario["name"]] = result
+                stage = result["stages"]["total"]
+                print(f"  {scenario['name']:<24} rows={result['rows']:>6} "
+                      f"p50={stage['p50']:8.1f}ms p95={stage['p95']:8.1f}ms p99={stage['p99']:8.1f}ms "
+                      f"peak={result['peak_mb']:7.1f}MB {result['throughput_qps']:6.1f} q/s")
+            pool.close_all()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "iterations": args.iterations,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenarios": results,
+    }
+
+
+def compare(current, baseline, tolerance, min_ms):
+    """Print stage-by-stage p50/p95 diffs; returns the list of regressions"""
+    regressions = []
+    if baseline["meta"].get("scale") != current["meta"]["scale"]:
+        print(f"\nWarning: baseline was recorded at scale {baseline['meta'].get('scale')}, "
+              f"this run used {current['meta']['scale']}")
+    print(f"\nComparison with baseline from {baseline['meta'].get('created', '?')} "
+          f"(tolerance {tolerance:.0%}, ignoring < {min_ms}ms changes)")
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"  {name}: new scenario")
+            continue
+        print(f"  {name}")
+        for stage in STAGES:
+            now, then = result["stages"][stage], before["stages"].get(stage)
+            if then is None:
+                continue
+            for key in ("p50", "p95"):
+                delta = now[key] - then[key]
+                ratio = delta / then[key] if then[key] else 0.0
+                regressed = delta > min_ms and ratio > tolerance
+                if regressed:
+                    regressions.append((name, stage, key, then[key], now[key]))
+                if regressed or (abs(delta) > min_ms and abs(ratio) > tolerance):
+                    marker = "REGRESSION" if regressed else "improved"
+                    print(f"    {stage:<14} {key}: {then[key]:8.1f}ms -> {now[key]:8.1f}ms "
+                          f"({ratio:+.0%}) {marker}")
+        memory_delta = result["peak_mb"] - before["peak_mb"]
+        if before["peak_mb"] and memory_delta / before["peak_mb"] > tolerance and memory_delta > 1:
+            regressions.append((name, "peak_mb", "", before["peak_mb"], result["peak_mb"]))
+            print(f"    peak memory: {before['peak_mb']:.1f}MB -> {result['peak_mb']:.1f}MB REGRESSION")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--scale", type=float, default=1.0, help="fixture size multiplier")
+    parser.add_argument("--chunk-size", type=int, default=16, help="stub LLM stream chunk size")
+    parser.add_argument("--only", help="run scenarios whose name contains this text")
+    parser.add_argument("--scenarios", default=os.path.join(BENCH_DIR, "scenarios.json"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-ms", type=float, default=2.0)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    current = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet - run with --save-baseline to record one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance, args.min_ms)
+    print(f"\n{len(regressions)} regression(s)")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
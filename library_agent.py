@@ -0,0 +1,183 @@
+"""Library question pipeline configuration, shared by the Streamlit app and the agent service"""
+import os
+
+from agent_core.agent import AgentPipeline
+from agent_core.examples import ExampleStore, format_examples
+from agent_core.llm import SQLGenerator
+from agent_core.pipeline import QueryExecutor, SQLTranslator
+from agent_core.pool import ConnectionPool
+from agent_core.result_cache import ResultCache
+from agent_core.router import ComplexityClassifier, ModelRouter
+from agent_core.sql_cache import TranslationCache, fingerprint
+from agent_core.sql_guard import SQLGuard
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# Database configuration
+CONNECTION_STRING = (
+    "DRIVER={ODBC Driver 18 for SQL Server};"
+    "SERVER=localhost\\SQLEXPRESS;"
+    "DATABASE=LibraryManagementDB;"
+    "Trusted_Connection=yes;"
+    "Encrypt=no;"
+    "TrustServerCertificate=yes;"
+)
+
+LLM_BASE_URL = "https://openrouter.ai/api/v1"
+LLM_API_KEY = "sk-or-v1-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"  # Replace with your key
+LLM_DEADLINE = 45
+
+# Every query has to finish within this many seconds (enforced by the driver and a watchdog)
+QUERY_DEADLINE = 60
+# A whole answer, SQL generation included
+ANSWER_DEADLINE = QUERY_DEADLINE + LLM_DEADLINE
+
+# Result size budgets - larger results are truncated (and can be saved to disk)
+MAX_RESULT_ROWS = 50_000
+MAX_RESULT_BYTES = 100 * 1024 * 1024
+FETCH_BATCH_SIZE = 2000
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports")
+
+# Nearest stored question -> SQL pairs that ran, added to each LLM prompt
+FEW_SHOT_EXAMPLES = 3
+
+# Cheap per-table change markers used to invalidate cached results
+TABLE_CHANGE_MARKERS = {
+    "Authors": "SELECT COUNT_BIG(*), MAX(CreatedDate) FROM Authors",
+    "Categories": "SELECT COUNT_BIG(*), MAX(CreatedDate) FROM Categories",
+    "Books": "SELECT COUNT_BIG(*), MAX(CreatedDate), SUM(AvailableCopies) FROM Books",
+    "Members": "SELECT COUNT_BIG(*), MAX(CreatedDate), SUM(CAST(IsActive AS int)) FROM Members",
+    "BorrowingRecords": "SELECT COUNT_BIG(*), MAX(CreatedDate), MAX(ReturnDate) FROM BorrowingRecords",
+}
+
+# Estimated plan cost (SQL Server cost units) above which queries are blocked / flagged
+MAX_QUERY_COST = 500
+WARN_QUERY_COST = 50
+MAX_ESTIMATED_ROWS = 20_000_000
+
+# Database schema
+DATABASE_SCHEMA = """
+DATABASE SCHEMA - LibraryManagementDB:
+
+1. Authors(AuthorID, FirstName, LastName, BirthDate, Nationality, Email, CreatedDate)
+2. Categories(CategoryID, CategoryName, Description, CreatedDate)  
+3. Books(BookID, Title, ISBN, AuthorID, CategoryID, PublicationYear, Publisher, TotalCopies, AvailableCopies, Price, CreatedDate)
+4. Members(MemberID, FirstName, LastName, Email, Phone, Address, JoinDate, MembershipType, IsActive, CreatedDate)
+5. BorrowingRecords(RecordID, MemberID, BookID, BorrowDate, DueDate, ReturnDate, Fine, Status, CreatedDate)
+
+RELATIONSHIPS:
+- Books.AuthorID → Authors.AuthorID
+- Books.CategoryID → Categories.CategoryID  
+- BorrowingRecords.MemberID → Members.MemberID
+- BorrowingRecords.BookID → Books.BookID
+"""
+
+SQL_MODEL = "deepseek/deepseek-chat:free"
+# Raced against SQL_MODEL when it is slow to answer
+FALLBACK_SQL_MODEL = "qwen/qwen-2.5-coder-32b-instruct:free"
+# Simple questions (one table, at most one aggregation) go to this faster, smaller model
+FAST_SQL_MODEL = "google/gemini-2.0-flash-exp:free"
+# Words implying each table, for the router's local complexity estimate
+ROUTER_TABLES = {
+    "Books": r"\bbooks?\b|\btitles?\b|isbn|copies",
+    "Authors": r"\bauthors?\b|\bwriters?\b",
+    "Categories": r"categor|\bgenres?\b",
+    "Members": r"\bmembers?\b|\bpatrons?\b|demographic|\bborrowers?\b",
+    "BorrowingRecords": r"borrow|\bloans?\b|overdue|\bfines?\b|\breturn|checkout",
+}
+
+SQL_PROMPT_TEMPLATE = """You are an expert SQL Server assistant for library management analytics.
+    Convert the following question into a SQL Server query.
+
+    {schema}
+
+    IMPORTANT RULES:
+    1. Use SQL Server syntax
+    2. Use proper JOINs when needed
+    3. Use GETDATE() for current date
+    4. Return ONLY the SQL query
+    5. Focus on analytics and insights for directors/policy makers
+
+    Question: {question}
+
+    SQL Query:"""
+
+# Bumps automatically whenever the schema, prompt or model changes
+PROMPT_VERSION = fingerprint(DATABASE_SCHEMA, SQL_PROMPT_TEMPLATE, SQL_MODEL, FAST_SQL_MODEL)
+
+# Offered in the sidebar and included in batch runs
+SAMPLE_QUESTIONS = [
+    "Show me monthly borrowing trends",
+    "Which books are most popular?",
+    "What's the average fine amount?",
+    "Show member demographics",
+    "List overdue books with member details",
+]
+
+
+def connect_database():
+    """Connection pool for LibraryManagementDB"""
+    # Imported here so the configuration can be read where pyodbc isn't installed (benchmarks)
+    import pyodbc
+
+    return ConnectionPool(
+        lambda: pyodbc.connect(CONNECTION_STRING, autocommit=True),
+        min_size=2,
+        max_size=20,
+        checkout_timeout=10,
+        statement_timeout=QUERY_DEADLINE,
+    )
+
+
+def make_generator():
+    """Streaming SQL generation, routed to a fast or a strong model by question complexity"""
+    fast = SQLGenerator(
+        base_url=LLM_BASE_URL,
+        api_key=LLM_API_KEY,
+        model=FAST_SQL_MODEL,
+        fallback_model=SQL_MODEL,
+        temperature=0.0,
+        deadline=LLM_DEADLINE,
+        hedge_after=4,
+        max_retries=2,
+    )
+    strong = SQLGenerator(
+        base_url=LLM_BASE_URL,
+        api_key=LLM_API_KEY,
+        model=SQL_MODEL,
+        fallback_model=FALLBACK_SQL_MODEL,
+        deadline=LLM_DEADLINE,
+        hedge_after=8,
+        max_retries=2,
+    )
+    return ModelRouter(fast, strong, ComplexityClassifier(ROUTER_TABLES))
+
+
+def make_guard():
+    """Read-only, row-limited, cost-checked execution of generated SQL"""
+    return SQLGuard(max_rows=MAX_RESULT_ROWS, max_cost=MAX_QUERY_COST,
+                    warn_cost=WARN_QUERY_COST, max_estimated_rows=MAX_ESTIMATED_ROWS)
+
+
+def build_prompt(question, examples=()):
+    return SQL_PROMPT_TEMPLATE.format(schema=DATABASE_SCHEMA + format_examples(examples), question=question)
+
+
+class LibraryAgent:
+    """The Library pipeline and the caches it is built from, one per process"""
+
+    name = "library"
+
+    def __init__(self, db_pool, generator=None, guard=None, cache_dir=CACHE_DIR):
+        self.db_pool = db_pool
+        self.generator = generator or make_generator()
+        self.guard = guard or make_guard()
+        self.translation_cache = TranslationCache(os.path.join(cache_dir, "library_sql_cache.json"))
+        self.result_cache = ResultCache(TABLE_CHANGE_MARKERS)
+        self.examples = ExampleStore(os.path.join(cache_dir, "library_examples.json"))
+        self.translator = SQLTranslator(self.generator, self.translation_cache, build_prompt, PROMPT_VERSION,
+                                        examples=self.examples, max_examples=FEW_SHOT_EXAMPLES)
+        self.executor = QueryExecutor(db_pool, self.guard, self.result_cache,
+                                      max_rows=MAX_RESULT_ROWS, max_bytes=MAX_RESULT_BYTES,
+                                      batch_size=FETCH_BATCH_SIZE)
+        self.pipeline = AgentPipeline(self.name, self.translator, self.executor, deadline=ANSWER_DEADLINE)
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOI_DIR = os.path.join(REPO_DIR, "BOI_AI_Agent")
+
+# The BOI modules import their siblings directly
+for path in (REPO_DIR, BOI_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from rollup_cube import CubeRouter, RollupCube  # noqa: E402
+
+
+class FrameCube:
+    """A loaded rollup cube without the database or the background refresh"""
+
+    ready = True
+    query = RollupCube.query
+
+    def __init__(self, base):
+        self.base = base
+        self.by_country = None
+
+
+@pytest.fixture
+def cube_router():
+    base = pd.DataFrame({
+        "YEAR": ["2023", "2023", "2023", "2024"],
+        "NewSector": ["IT", "Apparel", "Tourism", "IT"],
+        "Project_Status": ["E1", "E1", "E1", "E1"],
+        "Project_Category": [61, 71, 61, 61],
+        "FORINVANU": [10.0, 20.0, 40.0, 80.0],
+        "EXPVLUANU": [1.0, 2.0, 4.0, 8.0],
+        "EMPVLUANU": [100, 200, 400, 800],
+        "Projects": [1, 1, 1, 1],
+    })
+    return CubeRouter(FrameCube(base), {"valid_statuses": ["E1"]})
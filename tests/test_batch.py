@@ -0,0 +1,40 @@
+import sqlite3
+
+import pytest
+
+from agent_core.agent import AgentPipeline
+from agent_core.batch import BatchItem, BatchRunner
+from agent_core.pipeline import QueryExecutor
+from agent_core.pool import ConnectionPool
+from agent_core.sql_guard import SQLGuard
+
+
+class BrokenTranslator:
+    def translate(self, question, timings=None):
+        raise RuntimeError("translator is down")
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    path = str(tmp_path / "t.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE t (a TEXT, b REAL)")
+        connection.executemany("INSERT INTO t VALUES (?, ?)", [("x", 1.0), ("y", 2.0), ("x", 3.0)])
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), min_size=1, max_size=2)
+    executor = QueryExecutor(pool, SQLGuard(max_rows=100, dialect="sqlite"), max_rows=100)
+    return AgentPipeline("lib", BrokenTranslator(), executor, deadline=10)
+
+
+def test_every_item_finishes(pipeline):
+    items = [
+        BatchItem("lib", "totals", sql="SELECT a, SUM(b) AS s FROM t GROUP BY a"),
+        BatchItem("missing", "an app that isn't loaded"),
+        BatchItem("lib", "a question the translator fails on"),
+    ]
+    finished = []
+    results = BatchRunner({"lib": pipeline}, llm_concurrency=2, query_concurrency=2).run(
+        items, on_result=finished.append)
+    assert [result.answer.status for result in results] == ["ok", "error", "error"]
+    assert len(results[0].answer.frame) == 2
+    assert "missing" in results[1].answer.error
+    assert len(finished) == len(items)
@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+from country_index import INDEX_TABLE, rewrite_country_filters
+
+COUNTRY_COLUMNS = [f"Country_Code{i}" for i in range(1, 16)]
+# (reference, type, category, application level, countries)
+SHAREHOLDER_ROWS = [
+    ("P1", "GENN", 61, 1, ["JP"]),
+    ("P1", "GENN", 61, 2, ["US", "GB"]),
+    ("P2", "GENN", 71, None, ["JP", "US"]),
+    ("P3", "GENN", 71, 1, ["GB"]),
+]
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    # The rewrite names the side table dbo.<table>, as on SQL Server
+    connection.execute("ATTACH DATABASE ':memory:' AS dbo")
+    connection.execute("CREATE TABLE ShareHolders_Country (Reference_Number, Project_Type, Project_Category, "
+                       "Application_Level, Investment, " + ", ".join(COUNTRY_COLUMNS) + ")")
+    connection.execute(f"CREATE TABLE dbo.{INDEX_TABLE} (Reference_Number, Project_Type, Project_Category, "
+                       "Application_Level, Country_Code, Position)")
+    for number, (reference, kind, category, level, countries) in enumerate(SHAREHOLDER_ROWS, 1):
+        codes = countries + [None] * (15 - len(countries))
+        connection.execute("INSERT INTO ShareHolders_Country VALUES (" + ", ".join("?" * 20) + ")",
+                           [reference, kind, category, level, number * 10] + codes)
+        connection.executemany(f"INSERT INTO dbo.{INDEX_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                               [(reference, kind, category, level, code, position)
+                                for position, code in enumerate(countries, 1)])
+    yield connection
+    connection.close()
+
+
+@pytest.mark.parametrize("country", ["JP", "US", "GB", "DE"])
+def test_rewrite_matches_the_original_with_several_rows_per_project(connection, country):
+    sql = ("SELECT COUNT(*), COALESCE(SUM(S.Investment), 0) FROM ShareHolders_Country S WHERE '"
+           + country + "' IN (" + ", ".join(f"S.{column}" for column in COUNTRY_COLUMNS) + ")")
+    rewritten = rewrite_country_filters(sql)
+    assert "EXISTS" in rewritten
+    assert connection.execute(rewritten).fetchall() == connection.execute(sql).fetchall()
@@ -0,0 +1,42 @@
+from agent_core.agent import AgentPipeline, RoutedAnswer
+from agent_core.planner import QueryPlanner
+from conftest import BOI_DIR
+from report_templates import TemplateRegistry
+from rollup_cube import MEASURE_RULES, MEASURES
+
+QUESTION = "compare FDI, exports and employment for the IT sector vs. apparel in 2023"
+
+
+class NoTranslator:
+    def translate(self, question, timings=None):
+        raise AssertionError(f"translated {question!r}")
+
+
+def boi_pipeline(cube_router):
+    templates = TemplateRegistry.from_directory(BOI_DIR)
+
+    def template_route(question):
+        match = templates.match(question)
+        return match and RoutedAnswer("template", sql=match.sql, params=match.params)
+
+    def cube_route(question):
+        answer = cube_router.match(question)
+        return answer and RoutedAnswer("cube", frame=answer.frame)
+
+    planner = QueryPlanner([(MEASURES[m], pattern) for m, pattern in MEASURE_RULES], race=False)
+    return AgentPipeline("boi", NoTranslator(), None, routes=[("template", template_route), ("cube", cube_route)],
+                         planner=planner)
+
+
+def test_compound_question_is_planned_before_the_routes(cube_router):
+    answer = boi_pipeline(cube_router).answer(QUESTION)
+    assert answer.ok, answer.error
+    assert answer.route == "plan"
+    frame = answer.frame.set_index("NewSector")
+    assert frame.loc["IT", ["Foreign_Investment", "Exports", "Employment"]].tolist() == [10.0, 1.0, 100]
+    assert frame.loc["Apparel", ["Foreign_Investment", "Exports", "Employment"]].tolist() == [20.0, 2.0, 200]
+
+
+def test_single_measure_question_uses_the_routes(cube_router):
+    answer = boi_pipeline(cube_router).answer("FDI for the IT sector vs. apparel in 2023")
+    assert answer.route == "cube"
@@ -0,0 +1,91 @@
+import re
+
+import pytest
+
+from conftest import BOI_DIR
+from report_templates import ReportTemplate, TemplateRegistry
+
+SECTION_CASE = [
+    "WHEN G.Project_Category IN (61,62,63,64) THEN 'Section 16'",
+    "WHEN G.Project_Category IN (21,71,72,74) THEN 'Section 17'",
+]
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return TemplateRegistry.from_directory(BOI_DIR)
+
+
+def where_clause(sql):
+    start = re.search(r"\bWHERE\b", sql).end()
+    group = re.search(r"\bGROUP\s+BY\b", sql)
+    return sql[start:group.start() if group else len(sql)]
+
+
+@pytest.mark.parametrize("name", ["project_counts_by_section", "sector_breakdown", "sector_summary_pivot"])
+@pytest.mark.parametrize("section, categories", [("16", "61,62,63,64"), ("17", "21,71,72,74")])
+def test_section_filters_the_where_clause(registry, name, section, categories):
+    sql, params = registry.templates[name].render(section=section)
+    assert f"AND G.Project_Category IN ({categories})" in where_clause(sql)
+    for case in SECTION_CASE:
+        assert case in sql
+    assert sql.count("?") == len(params)
+
+
+def test_section_keeps_parameter_order(registry):
+    sql, params = registry.templates["project_counts_by_section"].render(country="JP", section="17")
+    assert sql.count("?") == len(params) == 1
+    assert where_clause(sql).index("? IN (") < where_clause(sql).index("G.Project_Category IN (21,71,72,74)")
+
+
+@pytest.mark.parametrize("question, name", [
+    ("Show section 16 project counts", "project_counts_by_section"),
+    ("Pipeline project counts by section", "project_counts_by_section"),
+    ("Sector breakdown of commercial projects", "sector_breakdown"),
+    ("Sector breakdown of projects for section 17", "sector_breakdown"),
+    ("Total FDI inflow from Japan up to 2023", "fdi_inflow"),
+    ("Exports and employment in 2024", "exports_and_employment"),
+])
+def test_match(registry, question, name):
+    assert registry.match(question).name == name
+
+
+@pytest.mark.parametrize("question", [
+    "fdi by sector in 2023",
+    "FDI inflow by year",
+    "Exports and employment by country in 2023",
+    "compare FDI, exports and employment for the IT sector vs. apparel in 2023",
+    "Section 16 project counts for tourism",
+])
+def test_unsupported_breakdowns_and_sectors_do_not_match(registry, question):
+    assert registry.match(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "sector breakdown of pipeline projects",
+    "project counts by section in 2023",
+    "how many projects in section 16 were approved in 2020",
+])
+def test_filters_without_a_slot_do_not_match(registry, question):
+    assert registry.match(question) is None
+
+
+@pytest.fixture
+def bare_registry():
+    # No country predicate and no section categories to bind
+    sql = "SELECT SUM(A.FORINVANU) AS Total_FDI FROM ANNUAT A WHERE A.YEAR <= '2025'"
+    return TemplateRegistry({"fdi_inflow": ReportTemplate("fdi_inflow", sql, {})})
+
+
+@pytest.mark.parametrize("question", [
+    "Total FDI inflow from Japan",
+    "Total FDI inflow for section 17",
+    "Total commercial FDI inflow",
+])
+def test_country_section_and_status_without_a_slot_do_not_match(bare_registry, question):
+    assert bare_registry.match(question) is None
+
+
+def test_year_with_a_slot_matches(bare_registry):
+    match = bare_registry.match("Total FDI inflow up to 2023")
+    assert match.params == ["2023"]
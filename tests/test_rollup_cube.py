@@ -0,0 +1,33 @@
+import pytest
+
+
+def test_several_sectors_are_grouped(cube_router):
+    answer = cube_router.match("Foreign investment for the IT sector vs. apparel in 2023")
+    frame = answer.frame.set_index("NewSector")
+    assert frame["Foreign_Investment"].to_dict() == {"Apparel": 20.0, "IT": 10.0}
+
+
+def test_one_sector_is_filtered(cube_router):
+    answer = cube_router.match("Foreign investment for apparel in 2023")
+    assert "NewSector" not in answer.frame.columns
+    assert answer.frame["Foreign_Investment"].tolist() == [20.0]
+
+
+@pytest.mark.parametrize("question, total", [
+    ("How much foreign investment came in 2023 and is it growing?", 70.0),
+    ("exports for 2023 - was it good?", 7.0),
+])
+def test_the_pronoun_it_is_not_the_it_sector(cube_router, question, total):
+    answer = cube_router.match(question)
+    assert answer.frame.iloc[0].drop("Projects").tolist() == [total]
+    assert "sector" not in answer.description
+
+
+def test_several_years_are_declined(cube_router):
+    assert cube_router.match("Foreign investment in 2023 and 2024") is None
+
+
+@pytest.mark.parametrize("question", ["Foreign investment in 2023", "Foreign investment by year"])
+def test_project_counts_are_integers(cube_router, question):
+    frame = cube_router.match(question).frame
+    assert frame["Projects"].dtype == "int64"
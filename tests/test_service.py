@@ -0,0 +1,104 @@
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from agent_core.agent import Answer
+from agent_core.service import QueryService, ServiceClient
+
+
+@pytest.fixture(scope="module")
+def service():
+    # Bad requests are refused before the pipeline is used
+    with QueryService({"lib": None}, port=0, workers=1) as service:
+        yield service
+
+
+def post(service, path, body):
+    request = urllib.request.Request(service.base_url + path, data=body, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/v1/lib/ask", b"not json"),
+    ("/v1/lib/ask", b'["question"]'),
+    ("/v1/lib/ask", b'"question"'),
+    ("/v1/lib/ask", b"{}"),
+    ("/v1/lib/ask", b'{"question": 42}'),
+    ("/v1/lib/ask", b'{"question": ["a", "b"]}'),
+    ("/v1/lib/ask", b'{"question": "  "}'),
+    ("/v1/lib/ask", b'{"question": "q", "deadline": "5"}'),
+    ("/v1/lib/ask", b'{"question": "q", "tenant": ["a"]}'),
+    ("/v1/cancel", b'{"request_id": ["a"]}'),
+])
+def test_bad_requests_get_400(service, path, body):
+    status, payload = post(service, path, body)
+    assert status == 400
+    assert payload["error"].startswith("Bad request")
+
+
+@pytest.mark.parametrize("raw", [
+    b"GARBAGE\r\n\r\n",
+    b"\r\n\r\n",
+    b"POST /v1/lib/ask HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+    b"POST /v1/lib/ask HTTP/1.1\r\nContent-Length: -5\r\n\r\n",
+])
+def test_malformed_request_lines_and_headers_get_400(service, raw):
+    with socket.create_connection(("127.0.0.1", service.port), timeout=10) as connection:
+        connection.sendall(raw)
+        response = connection.makefile("rb").read()
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+
+def test_service_keeps_serving_after_bad_requests(service):
+    post(service, "/v1/lib/ask", b"[]")
+    with urllib.request.urlopen(service.base_url + "/v1/health", timeout=10) as response:
+        assert json.loads(response.read()) == {"status": "ok"}
+
+
+class GatedPipeline:
+    """Answers at once, except "blocker", which holds its worker until the gate opens"""
+
+    name = "lib"
+    deadline = 10
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    def answer(self, question, job=None, trace=None):
+        if question == "blocker":
+            self.gate.wait(10)
+        return Answer(question, route="test")
+
+
+def wait_for(condition, timeout=10):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_asking_again_after_cancel_starts_a_new_answer():
+    pipeline = GatedPipeline()
+    with QueryService({"lib": pipeline}, port=0, workers=1) as service:
+        client = ServiceClient(service.base_url, timeout=20)
+        blocker = client.submit("lib", "blocker")
+        wait_for(lambda: client.stats()["running"] == 1)
+        queued = client.submit("lib", "slow question")
+        wait_for(lambda: client.stats()["queued"] == 1)
+        assert queued.cancel()
+        assert queued.result(10).status == "cancelled"
+
+        again = client.submit("lib", "slow question")
+        wait_for(lambda: client.stats()["queued"] == 2)
+        pipeline.gate.set()
+        assert again.result(10).status == "ok"
+        assert blocker.result(10).status == "ok"